@@ -0,0 +1,123 @@
+"""
+Benchmark of decoding scanned invoice pages, from the PDF to the polished
+(rotated, binarized) page that is cropped for OCR.
+
+Compares the old decode path, through a PIL image and a color OpenCV image:
+
+  extract_image bytes -> io.BytesIO -> PIL.Image.open -> np.array
+    -> cv2.cvtColor(RGB2BGR) -> cv2.rotate -> cv2.cvtColor(2GRAY)
+    -> cv2.threshold
+
+with the current one (see sysco_source.page_image and polish_image):
+
+  extract_image bytes -> np.frombuffer (a view) -> cv2.imdecode(GRAYSCALE)
+    -> cv2.rotate -> cv2.threshold (in place)
+
+recording per page the wall time and the peak memory allocated
+(tracemalloc sees NumPy and OpenCV arrays), and how many pixels of the two
+polished pages differ. Only a few should: the old path's grayscale weights
+were applied to swapped color channels.
+
+Needs PyMuPDF, OpenCV and Pillow. Run from the repository root:
+
+  python -m benchmarks.page_decode "inputs\\invoices\\processed_invoices\\<invoice>.pdf" --pages 10
+"""
+
+
+
+import numpy as np
+import argparse
+import cv2
+import fitz
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "sysco"))
+import sysco_source as ss
+
+
+
+def pil_decode(doc, page_num):
+  # the old path, kept here only to compare with
+  img = doc[page_num].get_images(full = True)[0]
+  image_bytes = doc.extract_image(img[0])["image"]
+  img_pil = Image.open(io.BytesIO(image_bytes))
+
+  # (grayscale scans have to be made RGB first for the old path to run)
+  img_cv = cv2.cvtColor((np.array(img_pil.convert("RGB"))), cv2.COLOR_RGB2BGR)
+  img_rotated = cv2.rotate(img_cv, cv2.ROTATE_90_COUNTERCLOCKWISE)
+  img_gray = cv2.cvtColor(img_rotated, cv2.COLOR_RGB2GRAY)
+  _, polished = cv2.threshold(img_gray, 150, 255, cv2.THRESH_BINARY)
+
+  return polished
+
+
+
+def array_decode(doc, page_num):
+  return ss.polish_image(ss.page_image(doc, page_num))
+
+
+
+def measure(decode, doc, page_num):
+  """
+  Decodes one page twice, once timed and once traced.
+
+  :return: (polished page, seconds, peak MB)
+  """
+  start = time.perf_counter()
+  page = decode(doc, page_num)
+  seconds = time.perf_counter() - start
+
+  tracemalloc.start()
+  try:
+    decode(doc, page_num)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+  finally:
+    tracemalloc.stop()
+
+  return page, seconds, peak
+
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.splitlines()[1])
+  parser.add_argument("pdf", help = "a scanned invoice '.pdf'")
+  parser.add_argument(
+    "--pages", type = int, default = 10, help = "number of pages to decode")
+  args = parser.parse_args()
+
+  with fitz.open(args.pdf) as doc:
+    n_pages = min(args.pages, len(doc))
+    totals = {"pil": np.zeros(2), "array": np.zeros(2)}
+
+    for page_num in range(n_pages):
+      old, *old_stats = measure(pil_decode, doc, page_num)
+      new, *new_stats = measure(array_decode, doc, page_num)
+      totals["pil"] += old_stats
+      totals["array"] += new_stats
+
+      differ = np.count_nonzero(old != new) / old.size * 100 \
+        if old.shape == new.shape else 100.0
+      print(
+        f"page {page_num + 1:>3} {old.shape[1]}x{old.shape[0]}  "
+        f"pil {old_stats[0]:.3f} s {old_stats[1]:7.1f} MB peak  "
+        f"array {new_stats[0]:.3f} s {new_stats[1]:7.1f} MB peak  "
+        f"({differ:.2f}% pixels differ)")
+
+  print("")
+  for name, (seconds, peak) in totals.items():
+    print(
+      f"{name:<6} {seconds / n_pages:.3f} s/page  "
+      f"{peak / n_pages:7.1f} MB peak/page")
+
+  return
+
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,190 @@
+"""
+Benchmarks of the stages that don't need OCR, on synthetic data.
+
+For every scale asked for, a synthetic dataset (see synthetic_data.py) is
+written into a temporary folder and each stage is run on it:
+
+  - master_load: parsing the master csv into the typed master list
+  - code_index: indexing the master's vendor codes, for the invoice codes
+    misread by one digit (see master.code_index)
+  - update_pricing: applying the invoice prices to the master list, with
+    that index
+  - master_save: writing the updated master list back to its csv
+  - reading_inventory: reading the layout of the counted inventory
+  - schema_save: saving that layout
+  - deliverable_creation: resolving every item and writing the printable
+    inventory sheet
+
+recording each stage's wall time, peak memory and the size of what it
+wrote. Caches are not used, so every run measures the real work.
+
+Peak memory is measured with tracemalloc in a second run of each stage,
+since tracing allocations slows the stage down; --no-memory skips it.
+
+Run from the repository root:
+
+  python -m benchmarks.run_benchmarks --scales 1000 10000 100000 --sections 200
+
+A stage whose time grows much faster than its scale (10x the items taking
+100x as long) is doing something quadratic.
+"""
+
+
+
+import pandas as pd
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import synthetic_data as sd
+from master import code_index as ci
+from master import deliverable_creation as create
+from master import master_list as ml
+from master import reading_inventory as ri
+from master import schema_store as ss
+from master import update_pricing as up
+
+
+
+RESULT_COLUMNS = [
+  "STAGE", "ITEMS", "SECTIONS", "SECONDS", "PEAK_MB", "OUTPUT_BYTES"
+]
+
+
+
+def measure(stage, memory = True):
+  """
+  Runs stage() and measures it.
+
+  :param stage: A function taking no arguments, returning (result, path of
+                what it wrote or None).
+  :param memory: If False, peak memory isn't measured.
+  :return: (result, seconds, peak MB or None, output bytes or None)
+  """
+  gc.collect()
+  start = time.perf_counter()
+  result, output = stage()
+  seconds = time.perf_counter() - start
+
+  peak = None
+  if memory:
+    gc.collect()
+    tracemalloc.start()
+    try:
+      stage()
+      peak = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+      tracemalloc.stop()
+
+  size = os.path.getsize(output) if output and os.path.exists(output) else None
+
+  return result, seconds, peak, size
+
+
+
+def run_scale(n_items, n_sections, directory, memory = True, invoice_rows = None):
+  """
+  Benchmarks every stage at one scale.
+
+  :return: A list of result rows, see RESULT_COLUMNS.
+  """
+  data = sd.write_dataset(directory, n_items, n_sections, invoice_rows)
+  out = lambda name: os.path.join(directory, name)
+
+  rows = []
+  def record(name, stage):
+    result, seconds, peak, size = measure(stage, memory)
+    rows.append([name, n_items, n_sections, seconds, peak, size])
+    print(
+      f"  {name:<22} {seconds:9.3f} s"
+      + (f" {peak:9.1f} MB" if peak is not None else "")
+      + (f" {size:>12,} B" if size is not None else ""))
+    return result
+
+  master = record(
+    "master_load", lambda: (ml.load_master(data["master"], use_cache = False), None))
+
+  new_pricing = pd.read_csv(data["invoice"], dtype = {"VENDOR_CODE": int})
+  # built once per master, as InventoryPipeline.update_master does
+  code_index = record("code_index", lambda: (ci.CodeIndex.from_master(master), None))
+  updated = record(
+    "update_pricing",
+    lambda: (up.apply_pricing(master.copy(), new_pricing, code_index), None))
+
+  record(
+    "master_save",
+    lambda: (ml.save_master(updated, out("saved_master.csv"), use_cache = False),
+      out("saved_master.csv")))
+
+  reader = ri.InventoryReader(section_areas = data["sections"], use_cache = False)
+  layout = record("reading_inventory", lambda: (reader.read(data["inventory"]), None))
+
+  record(
+    "schema_save",
+    lambda: (ss.write_schema(layout.schema, out("schema.sqlite")), out("schema.sqlite")))
+
+  def deliverable():
+    resolved = create.resolve_items(layout.schema, create.master_code_index(updated))
+    jobs = create.deliverable_jobs(
+      resolved, layout.schema.sections, out("printable_inventory_sheet.xlsx"))
+    return create.write_deliverables(jobs), out("printable_inventory_sheet.xlsx")
+
+  record("deliverable_creation", deliverable)
+
+  return rows
+
+
+
+def run_benchmarks(scales, n_sections, memory = True, invoice_rows = None):
+  """
+  Benchmarks every stage at every scale.
+
+  :param scales: Numbers of items to benchmark with.
+  :param n_sections: Number of inventory sections.
+  :param memory: If False, peak memory isn't measured.
+  :param invoice_rows: Invoice lines per run (default: 1% of the items).
+  :return: A DataFrame with RESULT_COLUMNS.
+  """
+  rows = []
+  for n_items in scales:
+    print(f"{n_items:,} items, {n_sections} sections")
+    with tempfile.TemporaryDirectory() as directory:
+      rows += run_scale(n_items, n_sections, directory, memory, invoice_rows)
+
+  return pd.DataFrame(rows, columns = RESULT_COLUMNS)
+
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.splitlines()[1])
+  parser.add_argument(
+    "--scales", type = int, nargs = "+", default = [1_000, 10_000, 100_000],
+    help = "numbers of items to benchmark with")
+  parser.add_argument(
+    "--sections", type = int, default = 200, help = "number of inventory sections")
+  parser.add_argument(
+    "--invoice-rows", type = int, default = None,
+    help = "invoice lines per run (default: 1%% of the items)")
+  parser.add_argument(
+    "--no-memory", action = "store_true", help = "don't measure peak memory")
+  parser.add_argument(
+    "--output", default = None, help = "also save the results to this '.csv'")
+  args = parser.parse_args()
+
+  results = run_benchmarks(
+    args.scales, args.sections, not args.no_memory, args.invoice_rows)
+  print("")
+  print(results.to_string(index = False))
+
+  if args.output:
+    results.to_csv(args.output, index = False)
+
+  return
+
+
+
+if __name__ == "__main__":
+  main()
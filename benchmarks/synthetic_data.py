@@ -0,0 +1,245 @@
+"""
+Synthetic data for benchmarking the stages that don't need OCR.
+
+Generates, at any scale, data shaped like the real thing:
+
+  - a master inventory list, written like the hand edited csv (accounting
+    text prices, text dates, units spelled several ways, pack sizes)
+  - the layout of an old inventory (hundreds of sections, items from the
+    master list, some in several sections, some without a vendor code) with
+    counts, and that inventory written as a counted printable sheet
+  - the prices read from invoices, like reading_sysco_invoice's csv, with
+    some vendor codes not yet in the master list and some master codes
+    misread by one digit
+
+Everything is drawn from a seeded generator, so the same arguments always
+give the same data.
+"""
+
+
+
+import pandas as pd
+import numpy as np
+import os
+
+from master import deliverable_creation as create
+from master import master_list as ml
+from master import schema_store as ss
+from master import sheet_writer as sw
+
+
+
+VENDORS = ["SYSCO"] * 8 + ["STAN SETAS", "VANEERDEN"]
+BRANDS = [
+  "HEINZ", "LAND O LAKES", "TYSON FOODS", "BARILLA ITALIAN PASTA", "SYSCO CLASSIC",
+  "SYSCO IMPERIAL", "KRAFT", "HORMEL", "ARGO", "DEL MONTE"
+]
+WORDS = [
+  "APPLE", "BUTTER", "CHICKEN", "BREAST", "SAUCE", "TOMATO", "DICED", "FROZEN",
+  "FRESH", "CHEESE", "CHEDDAR", "SHREDDED", "BEEF", "GROUND", "BUN", "BRIOCHE",
+  "RICE", "PASTA", "PENNE", "OIL", "OLIVE", "SALT", "KOSHER", "PEPPER", "SUGAR",
+  "FLOUR", "CREAM", "SOUR", "LETTUCE", "ROMAINE", "ONION", "RED", "GARLIC"
+]
+# units as they are spelled in the sheets, see units.UNIT_ALIASES
+UNITS = ["CASE"] * 6 + ["cs", "LB", "lbs", "EACH", "ea", "half"]
+PER_PACKS = [
+  "5 LB", "10 LB", "2.5 LB", "1 GAL", "32 OZ", "1.5 OZ", "100 CT", "12 CT",
+  "1 DZ", "#10", "750 ML", None
+]
+ACCOUNTS = ["KITCHEN"] * 7 + ["BAKERY", "SNACK BAR"]
+
+
+
+def item_descriptions(rng, n):
+  # two to four random words per item
+  lengths = rng.integers(2, 5, size = n)
+  words = rng.choice(WORDS, size = (n, 4))
+  return [" ".join(row[:length]) for row, length in zip(words, lengths)]
+
+
+
+def synthetic_master(n_items, seed = 0):
+  """
+  A master inventory list as it is written to the csv.
+
+  :param n_items: Number of items.
+  :param seed: Seed of the random generator.
+  :return: A DataFrame with master_list.MASTER_COLUMNS.
+  """
+  rng = np.random.default_rng(seed)
+
+  prices = rng.gamma(2.0, 20.0, size = n_items).round(2)
+  dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(
+    rng.integers(0, 300, size = n_items), unit = "D")
+
+  master = pd.DataFrame({
+    "ITEM_DESC": item_descriptions(rng, n_items),
+    "VENDOR": rng.choice(VENDORS, size = n_items),
+    "BRAND": rng.choice(BRANDS, size = n_items),
+    # unique 7 digit codes, like Sysco's
+    "VENDOR_CODE": rng.choice(
+      np.arange(1_000_000, 9_999_999), size = n_items, replace = False),
+    "UNIT": rng.choice(UNITS, size = n_items),
+    "PACK": rng.choice([1, 2, 4, 6, 12, 24, np.nan], size = n_items),
+    "PER_PACK": rng.choice(np.array(PER_PACKS, dtype = object), size = n_items),
+    "PRICE": [f"${p:,.2f} " for p in prices],
+    "LAST_UPDATE": dates.strftime("%m/%d/%Y"),
+    "ACCOUNT": rng.choice(ACCOUNTS, size = n_items),
+    "FLAG": None,
+  }, columns = ml.MASTER_COLUMNS)
+
+  return master
+
+
+
+def section_names(n_sections):
+  return [f"STORAGE AREA {i:03d}" for i in range(1, n_sections + 1)]
+
+
+
+def synthetic_layout(master, n_sections, n_items = None, seed = 0):
+  """
+  The layout of a counted inventory built from a master list.
+
+  About 90% of its rows are master list items (5% of them also in a second
+  section), the rest have no vendor code. About 60% of the rows are
+  counted.
+
+  :param master: A master list, see synthetic_master.
+  :param n_sections: Number of sections.
+  :param n_items: Number of rows (default: one per master item).
+  :param seed: Seed of the random generator.
+  :return: An InventorySchema.
+  """
+  rng = np.random.default_rng(seed + 1)
+  n_items = n_items or len(master)
+  sections = section_names(n_sections)
+
+  n_coded = int(n_items * 0.9)
+  n_repeats = int(n_coded * 0.05)
+  picked = master.sample(n = min(n_coded, len(master)), random_state = seed)
+  picked = pd.concat([picked, picked.sample(n = n_repeats, random_state = seed + 1)])
+
+  n_misc = n_items - len(picked)
+  coded = pd.DataFrame({
+    "VENDOR": picked["VENDOR"].to_numpy(),
+    "VENDOR_CODE": picked["VENDOR_CODE"].to_numpy(),
+    "ITEM_DESC": picked["ITEM_DESC"].to_numpy(),
+    "UNIT": picked["UNIT"].to_numpy(),
+    "PRICE": ml.parse_price_dollars(picked["PRICE"]).to_numpy(),
+  })
+  misc = pd.DataFrame({
+    "VENDOR": rng.choice(["", "STAN SETAS", "MSU"], size = n_misc),
+    "VENDOR_CODE": pd.NA,
+    "ITEM_DESC": item_descriptions(rng, n_misc),
+    "UNIT": rng.choice(UNITS, size = n_misc),
+    "PRICE": rng.gamma(2.0, 10.0, size = n_misc).round(2),
+  })
+
+  items = pd.concat([coded, misc], ignore_index = True)
+  items = items.sample(frac = 1, random_state = seed).reset_index(drop = True)
+  items["VENDOR"] = items["VENDOR"].replace("", None)
+  items["SECTION"] = np.sort(rng.integers(0, n_sections, size = len(items)))
+  items["SECTION"] = np.array(sections, dtype = object)[items["SECTION"]]
+  items["ORDER"] = items.groupby("SECTION").cumcount() + 1
+  items["QUANTITY"] = np.where(
+    rng.random(len(items)) < 0.6, rng.integers(0, 40, size = len(items)), np.nan)
+  items["VENDOR_CODE"] = items["VENDOR_CODE"].astype("Int64")
+
+  return ss.InventorySchema(sections, items[ss.LAYOUT_COLUMNS])
+
+
+
+def synthetic_invoice_prices(
+  master, n_rows, new_fraction = 0.05, misread_fraction = 0.02, seed = 0):
+  """
+  Prices as read from invoices (see reading_sysco_invoice.read_invoices),
+  mostly for master items, some for vendor codes not in the master list,
+  and some for master codes with a digit misread.
+
+  :param master: A master list, see synthetic_master.
+  :param n_rows: Number of invoice lines.
+  :param new_fraction: Share of lines whose vendor code is new.
+  :param misread_fraction: Share of lines whose vendor code is a master 
+                           code with one digit changed, at about that 
+                           item's price (see master.code_index).
+  :param seed: Seed of the random generator.
+  :return: A DataFrame with VENDOR_CODE, PRICE, LAST_UPDATE, ACCOUNT, PAGE.
+  """
+  rng = np.random.default_rng(seed + 2)
+
+  n_new = int(n_rows * new_fraction)
+  n_misread = int(n_rows * misread_fraction)
+  n_known = n_rows - n_new - n_misread
+  codes = master["VENDOR_CODE"].to_numpy()
+  known = rng.choice(codes, size = n_known)
+  new = rng.choice(np.arange(10_000_000, 19_999_999), size = n_new, replace = False)
+
+  # one digit of a master code read as another one
+  source = rng.integers(0, len(master), size = n_misread)
+  place = 10 ** rng.integers(0, 7, size = n_misread)
+  digit = codes[source] // place % 10
+  misread = codes[source] \
+    + ((digit + rng.integers(1, 10, size = n_misread)) % 10 - digit) * place
+  misread_prices = ml.parse_price_dollars(master["PRICE"]).to_numpy()[source] \
+    * rng.uniform(0.95, 1.1, size = n_misread)
+
+  return pd.DataFrame({
+    "VENDOR_CODE": np.concatenate([known, new, misread]),
+    "PRICE": np.concatenate([
+      rng.gamma(2.0, 20.0, size = n_known + n_new), misread_prices]).round(2),
+    "LAST_UPDATE": "2025-10-22",
+    "ACCOUNT": rng.choice(ACCOUNTS, size = n_rows),
+    "PAGE": rng.integers(1, max(n_rows // 25, 1) + 1, size = n_rows),
+  })
+
+
+
+def write_inventory_workbook(path, schema):
+  # the layout written as a counted printable sheet, like a real count
+  items = schema.items.assign(
+    **{
+      "VENDOR/BRAND": schema.items["VENDOR"].fillna(""),
+      "VENDOR_CODE": schema.items["VENDOR_CODE"].astype(object).where(
+        schema.items["VENDOR_CODE"].notna(), ""),
+      "PACK": "", "PER_PACK": "",
+    })
+  sections = [
+    (section, section_items[create.DELIVERABLE_COLUMNS])
+    for section, section_items in ss.InventorySchema(
+      schema.sections, items).section_items()]
+  sw.write_inventory_sheet(path, sections)
+
+  return
+
+
+
+def write_dataset(directory, n_items, n_sections, invoice_rows = None, seed = 0):
+  """
+  Writes a full synthetic dataset into directory: master_inventory_list.csv,
+  inventory.xlsx (a counted printable sheet) and sysco_info.csv.
+
+  :param directory: Folder to write into (created if needed).
+  :param n_items: Number of master list items (and inventory rows).
+  :param n_sections: Number of inventory sections.
+  :param invoice_rows: Number of invoice lines (default: 1% of n_items).
+  :param seed: Seed of the random generator.
+  :return: A dict of the paths written, and the section names.
+  """
+  os.makedirs(directory, exist_ok = True)
+  invoice_rows = invoice_rows or max(n_items // 100, 10)
+
+  master = synthetic_master(n_items, seed)
+  schema = synthetic_layout(master, n_sections, seed = seed)
+  prices = synthetic_invoice_prices(master, invoice_rows, seed = seed)
+
+  paths = {
+    "master": os.path.join(directory, "master_inventory_list.csv"),
+    "inventory": os.path.join(directory, "inventory.xlsx"),
+    "invoice": os.path.join(directory, "sysco_info.csv"),
+  }
+  master.to_csv(paths["master"], index = False)
+  write_inventory_workbook(paths["inventory"], schema)
+  prices.to_csv(paths["invoice"])
+
+  return {**paths, "sections": schema.sections}
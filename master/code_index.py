@@ -0,0 +1,124 @@
+"""
+Index of the known vendor codes, for the codes OCR misreads by one digit.
+
+A Sysco item code read off an invoice with one digit wrong doesn't match any
+row of the master list, so it used to be added as a new item flagged "Needs
+Review", to be looked up by hand. Here every known code is indexed under its
+seven "masked" keys, the code with one of its digits set to 0: two codes a
+single digit apart share the key of that digit, so the known codes one digit
+away from a code are found with a binary search per digit, without comparing
+it with every known code.
+
+A code is only taken for a known one if the invoice's price is close to that
+code's price in the master list and no other known code one digit away fits
+the price too.
+"""
+
+
+
+import pandas as pd
+import numpy as np
+
+
+
+# Sysco item codes have seven digits (see sysco_source.icup_regex)
+CODE_DIGITS = 7
+
+# a known code's price may be at most this many times the invoice's price,
+# or the invoice's at most this many times its price
+MAX_PRICE_RATIO = 1.5
+
+
+
+class CodeIndex:
+  """
+  The known vendor codes of a master list with their prices, indexed by
+  their masked keys (see the module's docstring).
+  """
+
+  def __init__(self, codes, prices_cents):
+    """
+    :param codes: Known vendor codes (integers).
+    :param prices_cents: Their prices in integer cents, NaN if unknown. A
+                         code seen several times keeps its first price.
+    """
+    codes = np.asarray(codes, dtype = np.int64)
+    prices = np.asarray(prices_cents, dtype = np.float64)
+    self.codes, first = np.unique(codes, return_index = True)
+    self.prices = prices[first]
+
+    self.places = 10 ** np.arange(CODE_DIGITS, dtype = np.int64)
+    self.keys = []
+    for place in self.places:
+      masked = self.codes - self.codes // place % 10 * place
+      order = np.argsort(masked, kind = "stable")
+      self.keys.append((masked[order], order))
+
+
+  @classmethod
+  def from_master(cls, master):
+    """
+    The index of the Sysco codes of a typed master list, but for the rows
+    still flagged "Needs Review" (they may be misreads themselves). Other
+    vendors' codes are never read off a Sysco invoice.
+
+    :param master: The typed master list, see master_list.load_master.
+    :return: The CodeIndex.
+    """
+    known = master[
+      (master["VENDOR"] == "SYSCO").to_numpy(bool)
+      & (master["FLAG"] != "Needs Review").to_numpy(bool)
+      & (master["VENDOR_CODE"] < 10 ** CODE_DIGITS).to_numpy(bool)]
+
+    return cls(
+      known["VENDOR_CODE"].to_numpy(np.int64),
+      known["PRICE_CENTS"].astype("Float64").to_numpy(np.float64, na_value = np.nan))
+
+
+  def __len__(self):
+    return len(self.codes)
+
+
+  def __contains__(self, code):
+    i = self.codes.searchsorted(code)
+    return i < len(self.codes) and self.codes[i] == code
+
+
+  def neighbours(self, code):
+    """
+    Where the known codes exactly one digit away from a code are.
+
+    :param code: A vendor code.
+    :return: An array of their indices into self.codes.
+    """
+    found = []
+    for place, (keys, order) in zip(self.places, self.keys):
+      key = code - code // place % 10 * place
+      start, end = keys.searchsorted(key), keys.searchsorted(key, "right")
+      found.extend(i for i in order[start:end] if self.codes[i] != code)
+
+    return np.array(found, dtype = np.int64)
+
+
+  def snap(self, code, price_cents):
+    """
+    The known code an unknown code was most likely misread from.
+
+    :param code: A vendor code read from an invoice.
+    :param price_cents: The price it was read with, in integer cents (or
+                        <NA>, then no code fits it).
+    :return: The known code one digit away whose price fits the invoice's,
+             or None if the code is known, or there isn't exactly one.
+    """
+    code = int(code)
+    if code in self or pd.isna(price_cents) or price_cents <= 0:
+      return None
+
+    candidates = self.neighbours(code)
+    prices = self.prices[candidates]
+    # comparisons with NaN prices are False, codes without one never fit
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+      ratio = np.maximum(prices / price_cents, price_cents / prices)
+    plausible = candidates[ratio <= MAX_PRICE_RATIO]
+
+    return int(self.codes[plausible[0]]) if len(plausible) == 1 else None
@@ -0,0 +1,322 @@
+"""
+History of counted inventories.
+
+Every counted inventory workbook (the ones in inputs\\inventories and
+processed_inventories, both the printable sheet and the older "Kitchen
+Inventory" workbooks) holds the count and price of every item on the day it
+was counted. This module reads all of them, in parallel, into one columnar
+table (master\\history\\inventory_counts.parquet) with a row per item per
+count, indexed by the date of the count, and precomputes what each month
+held:
+
+  - monthly_sections.parquet: per month and section, items, items counted
+    and value
+  - monthly_items.parquet: per month and item, count and value
+
+so month over month questions (how much was on hand, what was used) are
+answered from the small monthly tables without opening any workbook again.
+A month's figures come from the latest count taken in that month.
+
+Workbooks are recognized by their contents, so importing again only reads
+workbooks that haven't been imported yet, including ones that were renamed
+when they were archived (a workbook is dated from the names of all of its
+copies). Sheets nothing was counted on, like a printable sheet waiting to
+be filled in, are skipped.
+"""
+
+
+
+import pandas as pd
+import os
+import re
+
+from master import master_list as ml
+from master import reading_inventory as ri
+from master import schema_diff as sd
+from master import units
+from master import valuation as vl
+from master.master_list import atomic_write
+
+
+
+HISTORY_DIR = "master\\history\\"
+COUNTS_FILE = "inventory_counts.parquet"
+MONTHLY_SECTIONS_FILE = "monthly_sections.parquet"
+MONTHLY_ITEMS_FILE = "monthly_items.parquet"
+
+# columns of the counts table, one row per item per counted workbook
+COUNT_COLUMNS = [
+  "COUNT_DATE", "MONTH", "SOURCE", "SOURCE_SHA256", "SECTION", "ORDER",
+  "ITEM_KEY", "VENDOR", "VENDOR_CODE", "ITEM_DESC", "UNIT", "PRICE_CENTS",
+  "QUANTITY", "VALUE_CENTS"
+]
+
+MONTH_NAMES = [
+  "JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV",
+  "DEC"
+]
+
+
+
+def count_date(paths):
+  """
+  When a workbook was counted, from the names of its copies: the month in
+  one of them ("... Sep 2025 ...", taken as the last day of that month),
+  else the earliest timestamp a copy was archived under (see
+  schema_diff.snapshot_time), else when the oldest copy was last saved.
+
+  :param paths: The paths of the workbook's copies (same contents).
+  :return: A Timestamp.
+  """
+  names = [os.path.basename(path) for path in paths]
+
+  for name in names:
+    match = re.search(
+      r"\b(" + "|".join(MONTH_NAMES) + r")[A-Z]*\W*(\d{4})\b", name.upper())
+    if match:
+      month = MONTH_NAMES.index(match.group(1)) + 1
+      return pd.Timestamp(int(match.group(2)), month, 1) + pd.offsets.MonthEnd(0)
+
+  archived = [when for when in map(sd.snapshot_time, names) if when is not None]
+  if archived:
+    return min(archived)
+
+  return pd.Timestamp(min(map(os.path.getmtime, paths)), unit = "s").floor("s")
+
+
+
+def layout_counts(layout, digest, paths = None):
+  """
+  The counts table rows (see COUNT_COLUMNS) of one read workbook.
+
+  :param layout: The InventoryLayout read from the workbook.
+  :param digest: The workbook's content hash.
+  :param paths: Every copy of the workbook, dated by count_date (default:
+                just the one read).
+  :return: A DataFrame with COUNT_COLUMNS.
+  """
+  items = layout.schema.items
+  items = items[items["SECTION"].isin(layout.schema.sections)]
+  when = count_date(paths or [layout.source])
+
+  counts = pd.DataFrame({
+    "COUNT_DATE": when,
+    "MONTH": when.strftime("%Y-%m"),
+    "SOURCE": os.path.basename(layout.source),
+    "SOURCE_SHA256": digest,
+    "SECTION": items["SECTION"],
+    "ORDER": items["ORDER"],
+    "ITEM_KEY": sd.item_keys(items),
+    "VENDOR": items["VENDOR"],
+    "VENDOR_CODE": items["VENDOR_CODE"],
+    "ITEM_DESC": items["ITEM_DESC"],
+    "UNIT": units.normalize_units(items["UNIT"]),
+    "PRICE_CENTS": ml.parse_price_cents(items["PRICE"]),
+    "QUANTITY": pd.to_numeric(items["QUANTITY"], errors = "coerce"),
+    "VALUE_CENTS": vl.line_values(items["PRICE"], items["QUANTITY"]),
+  }, columns = COUNT_COLUMNS)
+
+  return counts.reset_index(drop = True)
+
+
+
+def to_count_schema(counts):
+  # one set of column types, however the rows were put together
+  counts = counts.reindex(columns = COUNT_COLUMNS)
+  counts["COUNT_DATE"] = pd.to_datetime(counts["COUNT_DATE"])
+
+  return counts.astype({
+    "MONTH": "string", "SOURCE": "string", "SOURCE_SHA256": "string",
+    "SECTION": "category", "ORDER": "int64", "ITEM_KEY": "string",
+    "VENDOR": "string", "VENDOR_CODE": "Int64", "ITEM_DESC": "string",
+    "UNIT": "string", "PRICE_CENTS": "Int64", "QUANTITY": "float64",
+    "VALUE_CENTS": "float64",
+  })
+
+
+
+def load_counts(history_dir = HISTORY_DIR):
+  """
+  Loads every imported count.
+
+  :param history_dir: The history directory.
+  :return: A DataFrame with COUNT_COLUMNS other than COUNT_DATE, indexed
+           (and sorted) by COUNT_DATE. Empty if nothing was imported yet.
+  """
+  path = os.path.join(history_dir, COUNTS_FILE)
+  if os.path.exists(path):
+    counts = pd.read_parquet(path)
+  else:
+    counts = to_count_schema(pd.DataFrame(columns = COUNT_COLUMNS))
+
+  return counts.set_index("COUNT_DATE").sort_index(kind = "stable")
+
+
+
+def monthly_aggregates(counts):
+  """
+  What each month held, from the latest count taken in that month.
+
+  :param counts: The counts table, see load_counts.
+  :return: (sections, items) DataFrames. sections has MONTH, SECTION, ITEMS,
+           COUNTED and VALUE_CENTS, items has MONTH, ITEM_KEY, VENDOR_CODE,
+           ITEM_DESC, UNIT, PRICE_CENTS, QUANTITY and VALUE_CENTS (an item
+           kept in several sections is summed).
+  """
+  counts = counts.reset_index()
+  latest = counts.groupby("MONTH")["COUNT_DATE"].transform("max")
+  month = counts[counts["COUNT_DATE"] == latest]
+
+  sections = month.groupby(["MONTH", "SECTION"], sort = True, observed = True).agg(
+    ITEMS = ("ITEM_KEY", "size"),
+    COUNTED = ("QUANTITY", "count"),
+    VALUE_CENTS = ("VALUE_CENTS", "sum"),
+  ).reset_index()
+
+  items = month.groupby(["MONTH", "ITEM_KEY"], sort = True).agg(
+    VENDOR_CODE = ("VENDOR_CODE", "first"),
+    ITEM_DESC = ("ITEM_DESC", "first"),
+    UNIT = ("UNIT", "first"),
+    PRICE_CENTS = ("PRICE_CENTS", "last"),
+    QUANTITY = ("QUANTITY", lambda q: q.sum(min_count = 1)),
+    VALUE_CENTS = ("VALUE_CENTS", "sum"),
+  ).reset_index()
+
+  return sections, items
+
+
+
+def write_history(counts, history_dir = HISTORY_DIR):
+  # the counts table and its monthly aggregates, each replaced in one step
+  os.makedirs(history_dir, exist_ok = True)
+
+  sections, items = monthly_aggregates(counts)
+  tables = [
+    (COUNTS_FILE, to_count_schema(counts.reset_index())),
+    (MONTHLY_SECTIONS_FILE, sections),
+    (MONTHLY_ITEMS_FILE, items),
+  ]
+  for name, table in tables:
+    atomic_write(
+      os.path.join(history_dir, name),
+      lambda temp, table = table: table.to_parquet(temp, index = False))
+
+  return
+
+
+
+def import_counts(
+  folders = ri.INVENTORY_FOLDERS, history_dir = HISTORY_DIR, max_workers = None):
+  """
+  Bulk mode: reads every counted workbook in folders that hasn't been
+  imported yet, in parallel, and adds its counts to the history.
+
+  :param folders: Folders to look for '.xlsx' workbooks in.
+  :param history_dir: The history directory.
+  :param max_workers: Number of worker processes (default: one per CPU).
+  :return: The updated counts table, see load_counts.
+  """
+  counts = load_counts(history_dir)
+  known = set(counts["SOURCE_SHA256"])
+
+  # a workbook is only read once, however many copies of it there are, and
+  # dated from all of them
+  copies = {}
+  for path in ri.find_inventories(folders):
+    digest = ml.file_digest(path)
+    if digest not in known:
+      copies.setdefault(digest, []).append(path)
+
+  if not copies:
+    print("No new counted inventories to import")
+    return counts
+
+  new_paths = {paths[0]: digest for digest, paths in copies.items()}
+  layouts = ri.InventoryReader().read_many(list(new_paths), max_workers = max_workers)
+
+  imported = []
+  for layout in layouts:
+    if layout.error:
+      print(f"Could not read {layout.source}: {layout.error}")
+      continue
+    digest = new_paths[layout.source]
+    layout_rows = layout_counts(layout, digest, copies[digest])
+    # a sheet printed to be counted, but never filled in
+    if not layout_rows["QUANTITY"].notna().any():
+      print(f"Skipped {layout.source}: nothing was counted on it")
+      continue
+    imported.append(layout_rows)
+    print(f"Imported {layout.source}")
+
+  if not imported:
+    return counts
+
+  counts = pd.concat(
+    [counts.reset_index(), *imported], ignore_index = True)
+  counts = to_count_schema(counts).set_index("COUNT_DATE").sort_index(kind = "stable")
+  write_history(counts, history_dir)
+
+  return counts
+
+
+
+def monthly_value(history_dir = HISTORY_DIR):
+  """
+  Month over month value of the inventory.
+
+  :param history_dir: The history directory.
+  :return: A DataFrame indexed by MONTH with ITEMS, COUNTED, VALUE_CENTS,
+           CHANGE_CENTS (since the previous month with a count) and
+           CHANGE_PCT.
+  """
+  sections = pd.read_parquet(os.path.join(history_dir, MONTHLY_SECTIONS_FILE))
+
+  months = sections.groupby("MONTH", sort = True)[
+    ["ITEMS", "COUNTED", "VALUE_CENTS"]].sum()
+  months["CHANGE_CENTS"] = months["VALUE_CENTS"].diff()
+  months["CHANGE_PCT"] = months["VALUE_CENTS"].pct_change(fill_method = None) * 100
+
+  return months
+
+
+
+def usage(month, previous = None, history_dir = HISTORY_DIR):
+  """
+  How much of every item went between two counts: what was on hand at the
+  previous month's count less what is on hand at this month's. Purchases in
+  between aren't part of the history, so this is the change in stock, and
+  an item restocked beyond what was used shows negative usage.
+
+  :param month: The month to report on, as "YYYY-MM".
+  :param previous: The month to compare with (default: the latest month
+                   with a count before month).
+  :param history_dir: The history directory.
+  :return: A DataFrame indexed by ITEM_KEY with VENDOR_CODE, ITEM_DESC,
+           UNIT, ON_HAND_BEFORE, ON_HAND, USED and USED_VALUE_CENTS, most
+           used (by value) first.
+  """
+  items = pd.read_parquet(os.path.join(history_dir, MONTHLY_ITEMS_FILE))
+
+  if previous is None:
+    earlier = sorted(m for m in items["MONTH"].unique() if m < month)
+    if not earlier:
+      raise ValueError(f"No count before {month} to compare with")
+    previous = earlier[-1]
+
+  before = items[items["MONTH"] == previous].set_index("ITEM_KEY")
+  after = items[items["MONTH"] == month].set_index("ITEM_KEY")
+  if after.empty:
+    raise ValueError(f"No count in {month}")
+
+  info = after[["VENDOR_CODE", "ITEM_DESC", "UNIT"]].combine_first(
+    before[["VENDOR_CODE", "ITEM_DESC", "UNIT"]])
+
+  report = info.assign(
+    ON_HAND_BEFORE = before["QUANTITY"].reindex(info.index).fillna(0),
+    ON_HAND = after["QUANTITY"].reindex(info.index).fillna(0))
+  report["USED"] = report["ON_HAND_BEFORE"] - report["ON_HAND"]
+  report["USED_VALUE_CENTS"] = \
+    before["VALUE_CENTS"].reindex(info.index).fillna(0) \
+    - after["VALUE_CENTS"].reindex(info.index).fillna(0)
+
+  return report.sort_values("USED_VALUE_CENTS", ascending = False)
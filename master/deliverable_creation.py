@@ -8,31 +8,19 @@
 
 
 import pandas as pd
-import json
-import numpy as np
-import openpyxl as pyxl
-import re
 import os
+import re
 import shutil
 import datetime
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-
-def check_unit_type(unit_type):
-  # unit_type is a string denoting
-  if isinstance(unit_type, str):
-    unit_type = unit_type.strip()
-    if unit_type in ["cs", "CS", "case"]:
-      unit_type = "CASE"
-    elif unit_type in ["lb", "lbs", "LBS"]:
-      unit_type = "LB"
-    elif unit_type in ["ea", "each","Each"]:
-      unit_type = "EACH"
-    elif unit_type in ["half"]:
-      unit_type = "HALF"
-
-  return unit_type
-
+from master import master_list as ml
+from master import render_cache as rc
+from master import schema_store as ss
+from master import sheet_writer as sw
+from master import units
 
 
 
@@ -95,360 +83,230 @@ def move_and_archive_document(filename, origin_dir, destination_dir, remove = Fa
     return
 
 
+# columns of the resolved deliverable rows, in order
+DELIVERABLE_COLUMNS = [
+  "VENDOR/BRAND", "VENDOR_CODE", "ITEM_DESC", "UNIT", "PACK", "PER_PACK",
+  "PRICE", "QUANTITY"
+]
+
+
+
+def master_code_index(master_list):
+  # the master list keyed by vendor code, one (the first) row per code
+  return master_list.drop_duplicates("VENDOR_CODE").set_index("VENDOR_CODE")
+
+
+
+def resolve_items(schema, master_index):
+  """
+  Resolves the information printed for every item of the old inventory in a
+  single join per source, rather than searching the master list per item.
+
+  Each item takes its information from the first of:
+    - the master list, for SYSCO items whose vendor code is in it
+    - the old inventory's first sighting of that vendor code
+    - "ITEM INFORMATION NOT FOUND", for any other SYSCO item with a code
+    - the old inventory's first sighting of that vendor and description
+
+  :param schema: The InventorySchema of the old inventory.
+  :param master_index: The master list indexed by VENDOR_CODE, see
+                       master_code_index.
+  :return: A DataFrame with the item's SECTION, DELIVERABLE_COLUMNS and the
+           item's master list ACCOUNT, one row per item, in sheet order.
+  """
+  vcode_info = schema.vendor_code_info()
+  misc_info = schema.misc_item_info()
+
+  items = schema.items[schema.items["SECTION"].isin(schema.sections)]
+  items = items.reset_index(drop = True)
+  vendor = items["VENDOR"].fillna("").astype(object)
+  vcode = items["VENDOR_CODE"]
+  misc_keys = pd.MultiIndex.from_arrays([vendor, items["ITEM_DESC"]])
+
+  # one lookup of every item in each source
+  master = master_index.reindex(vcode)
+  old = vcode_info.reindex(vcode)
+  misc = misc_info.reindex(misc_keys)
+  for info in [master, old, misc]:
+    info.index = items.index
+
+  # which source each item uses
+  valid_master_key = (vendor == "SYSCO") & vcode.notna()
+  in_master = valid_master_key & vcode.isin(master_index.index)
+  in_old = valid_master_key & ~in_master & vcode.isin(vcode_info.index)
+  not_found = valid_master_key & ~in_master & ~in_old
+  in_misc = ~valid_master_key & misc_keys.isin(misc_info.index)
+
+  def pick(default, *choices):
+    # value from the first source (mask, values) that applies to each item
+    out = pd.Series(default, index = items.index, dtype = object)
+    for mask, values in reversed(choices):
+      values = values if isinstance(values, pd.Series) else \
+        pd.Series(values, index = items.index, dtype = object)
+      out = values.astype(object).where(mask, out)
+    return out
+
+  price_cents = master["PRICE_CENTS"].astype("Float64") / 100
+
+  resolved = pd.DataFrame({
+    "VENDOR/BRAND": pick(
+      vendor.replace("?", ""),
+      (in_master, master["VENDOR"].astype(str) + "/" + master["BRAND"].astype(str)),
+      (in_old | not_found, vendor)),
+    "VENDOR_CODE": pick(
+      "", (in_master | in_old, vcode.astype(object))),
+    "ITEM_DESC": pick(
+      items["ITEM_DESC"],
+      (in_master, master["ITEM_DESC"]),
+      (in_old, old["ITEM_DESC"]),
+      (not_found, "ITEM INFORMATION NOT FOUND " + vcode.astype(str))),
+    "UNIT": pick(
+      "",
+      (in_master, master["UNIT"]),
+      (in_old, units.normalize_units(old["UNIT"])),
+      (in_misc, units.normalize_units(misc["UNIT"]))),
+    "PACK": pick("", (in_master, master["PACK"])),
+    "PER_PACK": pick("", (in_master, master["PER_PACK"])),
+    "PRICE": pick(
+      "",
+      (in_master, price_cents.astype(object).where(price_cents.notna(), "")),
+      (in_old, old["PRICE"]),
+      (in_misc, misc["PRICE"])),
+    "QUANTITY": "",
+  }, columns = DELIVERABLE_COLUMNS)
+
+  resolved.insert(0, "SECTION", items["SECTION"])
+  # the account (KITCHEN, BAKERY, ...) of items found in the master list
+  resolved["ACCOUNT"] = master["ACCOUNT"].astype(object).where(in_master)
+
+  return resolved
+
+
+
+def section_rows(resolved, sections):
+  # (section, its resolved items) for every section, in sheet order
+  grouped = dict(tuple(resolved.groupby("SECTION", sort = False)))
+  empty = resolved.iloc[0:0]
+  return [
+    (section, grouped.get(section, empty)[DELIVERABLE_COLUMNS])
+    for section in sections]
+
+
+
+# the printable inventory sheet, and one workbook per section / per account
+# written into these folders
+DELIVERABLE_PATH = "deliverables\\printable_inventory_sheet.xlsx"
+SECTION_FOLDER = "deliverables\\sections\\"
+ACCOUNT_FOLDER = "deliverables\\accounts\\"
+
+# account of the items that are not in the master list
+UNASSIGNED_ACCOUNT = "UNASSIGNED"
+
+
+
+def workbook_name(name):
+  # a section or account name as a file name
+  return "".join([re.sub(r'[\\/:*?"<>|]', "_", name), ".xlsx"])
+
+
+
+def deliverable_jobs(
+  deliverable, sections, deliverable_path, by_section = False, by_account = False):
+  """
+  Splits the resolved items into the workbooks to write: the printable sheet
+  with every section (the roll-up), and optionally one workbook per section
+  and / or one per account, holding only that account's items.
 
+  :param deliverable: The resolved items, see resolve_items.
+  :param sections: The section names, in sheet order.
+  :param deliverable_path: Path of the printable sheet with every section.
+  :return: A list of (path, sections) pairs, see sheet_writer.write_inventory_sheet.
+  """
+  jobs = [(deliverable_path, section_rows(deliverable, sections))]
 
+  if by_section:
+    for section, items in section_rows(deliverable, sections):
+      if len(items):
+        jobs.append((
+          os.path.join(SECTION_FOLDER, workbook_name(section)), [(section, items)]))
 
+  if by_account:
+    accounts = deliverable["ACCOUNT"].fillna(UNASSIGNED_ACCOUNT)
+    for account in sorted(accounts.unique()):
+      account_sections = section_rows(deliverable[accounts == account], sections)
+      jobs.append((
+        os.path.join(ACCOUNT_FOLDER, workbook_name(account)),
+        [(section, items) for section, items in account_sections if len(items)]))
 
-def main():
-
-
-  with open("master\\schemas\\sections_order_info.json") as file:
-    all_sections_info = json.load(file)
-  with open("master\\schemas\\vcode_locs.json") as file:
-    vcode_list = json.load(file)
-  with open("master\\schemas\\misc_item_locs.json") as file:
-    misc_list = json.load(file)
-
-
-  master_list = pd.read_csv("master\\archive\\master_inventory_list.csv")
-
-  deliverable_path = "deliverables\\printable_inventory_sheet.xlsx"
-
-
-  deliverable = []
-
-  all_sections_info
-
-  for key in all_sections_info:
-    section = all_sections_info[key]
-    deliverable.append({
-      "VENDOR/BRAND": key, 
-      "ITEM_DESC": key,
-      "UNIT": "",
-      "PACK": "",
-      "PER_PACK": "",
-      "PRICE": "",
-      "QUANTITY": ""
-    })
-
-    for item_info in section:
-      master_key, misc_key = item_info
-      # analyze vcode
-      vendor, vcode = master_key.split(",", maxsplit=1)
-      vendor = vendor.strip()
-      vcode = vcode.strip()
-
-      
-      valid_master_key = vendor == "SYSCO" and vcode != "NAN"
-
-      # sanitize vcode
-      vcode = re.sub(r'\D', '', vcode)
-      while len(vcode) < 7:
-        # add leading zeros until such is not the case
-        vcode = "".join(["0", vcode])
-
-      # try to convert to int
-      try:
-        vcode = int(vcode)
-      except Exception as e:
-        # couldn't sanitize, forcing NAN
-        vcode = "NAN"
-        print(f"coudln't turn vcode {vcode} into an int: {e}")
-
-      
-      
-
-      # check to see if master key already exists in master
-      if valid_master_key and int(vcode) in master_list["VENDOR_CODE"].values:
-        # get item information from master inventory list
-        info = master_list[master_list['VENDOR_CODE'].values == int(vcode)]
-        info["UNIT_TYPE"].values[0] = check_unit_type(info["UNIT_TYPE"].values[0])
-        # there are some items in master_list without information
-        # if this is the case for this item, instead
-        # get and use info from vcode_locs to the best of our ability
-        deliverable.append({
-          "VENDOR/BRAND": "".join(
-            [str(info["VENDOR"].values[0]), 
-            "/", 
-            str(info["BRAND"].values[0])]),
-          "VENDOR_CODE": vcode, 
-          "ITEM_DESC": info["ITEM"].values[0], 
-          "UNIT": info["UNIT_TYPE"].values[0],
-          "PACK": info["SUBUNIT"].values[0], 
-          "PER_PACK": info["SUBUNIT_SIZE"].values[0], 
-          "PRICE": info["UNIT_PRICE"].values[0], 
-          "QUANTITY": ""
-        })
-
-      elif valid_master_key and master_key in vcode_list:
-        # use item info from vcode_locs.json
-        info = vcode_list[master_key]
-        info["UNITS"][0] = check_unit_type(info["UNITS"][0])
-        
-        deliverable.append({
-          "VENDOR/BRAND": vendor,
-          "VENDOR_CODE": vcode,
-          "ITEM_DESC": info["ITEM_DESC"][0], 
-          "UNIT": info["UNITS"][0],
-          "PACK": "", 
-          "PER_PACK": "", 
-          "PRICE": info["PRICES"][0],
-          "QUANTITY": ""
-        })
-          
-        # error, valid key but no information found with key
-      elif valid_master_key:
-        deliverable.append({
-          "VENDOR/BRAND": vendor,
-          "VENDOR_CODE": "",
-          "ITEM_DESC": f"ITEM INFORMATION NOT FOUND {vcode}", 
-          "UNIT": "",
-          "PACK": "", 
-          "PER_PACK": "", 
-          "PRICE": "",
-          "QUANTITY": ""
-        })
-
-
-
-      # master key not valid, using misc_key now
-      else:
-        # use the item information in misc_item_locs.json
-        vendor, item_desc = misc_key.split(",", maxsplit = 1)
-        item_desc = item_desc.strip()
-        if vendor in ["NAN", "?"]:
-          vendor = ""
-        
-        if misc_key in misc_list:
-          
-          info = misc_list[misc_key]
-          info["UNITS"][0] = check_unit_type(info["UNITS"][0])
-
-          deliverable.append({
-            "VENDOR/BRAND": vendor,
-            "VENDOR_CODE": "",
-            "ITEM_DESC": item_desc, 
-            "UNIT": info["UNITS"][0],
-            "PACK": "", 
-            "PER_PACK": "", 
-            "PRICE": info["PRICES"][0] ,
-            "QUANTITY": ""
-          })
-
-        else:
-          deliverable.append({
-            "VENDOR/BRAND": vendor,
-            "VENDOR_CODE": "",
-            "ITEM_DESC": item_desc, 
-            "UNIT": "",
-            "PACK": "", 
-            "PER_PACK": "", 
-            "PRICE": "",
-            "QUANTITY": ""
-          })
-          
-
-
-
-
-
-
-
-
-
-
-
-  deliverable = pd.DataFrame(
-    deliverable, 
-    columns = [
-      "VENDOR/BRAND", "VENDOR_CODE", "ITEM_DESC", "UNIT", 
-      "PACK", "PER_PACK", "PRICE", "QUANTITY"]
-  )
-  deliverable["EST_PRICE"] = 0
-  deliverable["TOTAL_EST_VALUE"] = np.nan
-
-  deliverable.to_excel(deliverable_path)
-
-  # read in the file and do the excel formatting
-  printed = pyxl.load_workbook(deliverable_path)
-
-  ws = printed.active
-
-
-  ## ADDING 10 BLANK ROWS AT BOTTOM OF SECTIONS
-  n_blanks = 10
-
-  total_rows = []
-  for i, row in enumerate(ws.iter_rows(min_row = 2), start = 2):
-    for cell in row:
-      if "TOTAL:" in str(cell.value):
-        total_rows.append(i)
-        break
-
-  for i in reversed(total_rows):
-    ws.insert_rows(i, amount = n_blanks)
-
-
-  ## CREATING ESTIMATED PRICE COLUMN AS PRODUCT OF QUANTITY AND PRICE
-  header_row = 1
-  headers = {cell.value: idx + 1 for idx, cell in enumerate(ws[header_row])}
-
-  price_col = pyxl.utils.get_column_letter(headers["PRICE"])
-  qty_col = pyxl.utils.get_column_letter(headers["QUANTITY"])
-  est_col = pyxl.utils.get_column_letter(headers["EST_PRICE"])
-
-  for row in range(header_row + 1, ws.max_row + 1):
-    ws[f"{est_col}{row}"] = f"={price_col}{row}*{qty_col}{row}"
-
-
-  ## TEXT WRAPPING FOR VENDOR/BRAND AND ITEM_DESC
-  wrap_alignment = pyxl.styles.Alignment(wrap_text = True, vertical = "center")
-
-  for col in ws.iter_cols():
-    for cell in col:
-      cell.alignment = wrap_alignment
-
-  for cell in ws[1]:
-    cell.alignment = wrap_alignment
-
-
-  ## CENTER ALIGNMENT FOR VENDOR_CODE, UNIT, PACK, PER_PACK
-  center_alignment = pyxl.styles.Alignment(
-    horizontal = "center", vertical = "center")
-  for col_name in ["VENDOR_CODE", "UNIT","PACK","PER_PACK"]:
-    col_letter = pyxl.utils.get_column_letter(headers[col_name])
-    for cell in ws[col_letter]:
-      cell.alignment = center_alignment
-
-
-  ## FREEZE TOP ROW AND PRINT HEADER ROW ON EACH PAGE
-  ws.freeze_panes = "A2"
-  ws.print_title_rows = "1:1"
-
-
-  ## BOLD & ENLARGE FONT & HIGHLIGHT & MERGE SECTION HEADERS
-
-  section_fill = pyxl.styles.PatternFill(
-    start_color = "CCE5FF", end_color = "CCE5FF", fill_type = "solid"
-  )
-  section_font = pyxl.styles.Font(bold = True, size = 24)
-  vender_col = headers['VENDOR/BRAND']
-
-  for i, row in enumerate(ws.iter_rows(min_row = 2, max_col = ws.max_column), start = 2):
-    cell = ws.cell(row = i, column = vender_col)
-    if cell.value in all_sections_info.keys():
-      # merge all 8 rows
-      ws.merge_cells(f"B{i}:J{i}") 
-
-      # format first leftmost visible cell in merged range
-      merged_cell = ws.cell(row = i, column = 2)
-      merged_cell.font = section_font
-      merged_cell.fill = section_fill
-      merged_cell.alignment = pyxl.styles.Alignment(
-        horizontal = "center", vertical = "center"
-      )
-
-
-
-  ## HIGHLIGHT ROWS CONTAINING TOTAL:
-  ## MERGE ROWS CONTAINING TOTAL:
-  ## ADD NEW COLUMN TOTAL EST VALUE WITH SECTION SUMS
-  total_fill = pyxl.styles.PatternFill(
-    start_color = "FFFACD", end_color = "FFFACD", fill_type="solid"
-  )
-  last_total_row = 2
+  return jobs
 
-  for i, row in enumerate(ws.iter_rows(min_row = 2), start = 2):
-    total_text = None
-    for cell in row:
-      if "TOTAL:" in str(cell.value):
-        total_text = str(cell.value)
-        break
-    if total_text:
-      # merging columns B - I for this row
-      ws.merge_cells(f"B{i}:J{i}") 
 
-      top_left = ws[f"B{i}"]
-      top_left.value = total_text
 
-      # determine the excel range for EST_PRICE (column I = 9)
-      start_row = last_total_row + 1
-      end_row = i - 1
-      if end_row >= start_row:
-        formula = f"=SUM(J{start_row}:J{end_row})"
-      else:
-        formula = "=0"
+def write_job(job, cache = None):
+  # write one (path, sections) workbook, see deliverable_jobs
+  path, sections = job
+  os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+  sw.write_inventory_sheet(path, sections, cache)
+  return path
 
-      total_cell = ws[f"K{i}"]
-      total_cell.value = formula
-      total_cell.number_format = pyxl.styles.numbers.FORMAT_CURRENCY_USD_SIMPLE
 
 
+def write_deliverables(jobs, cache = None, max_workers = None):
+  """
+  Writes every workbook of deliverable_jobs, in parallel across a pool of
+  processes when there is more than one.
 
-      # highlight & format the total row
-      for cell in row:
-        cell.fill = total_fill
-        cell.font = pyxl.styles.Font(bold = True)
-        cell.alignment = pyxl.styles.Alignment(
-          horizontal = "center", vertical = "center")
+  :param jobs: A list of (path, sections) pairs.
+  :param cache: An optional render_cache.SectionCache shared by all writers.
+  :param max_workers: Number of worker processes (default: one per CPU).
+  :return: The paths written.
+  """
+  if len(jobs) < 2:
+    return [write_job(job, cache) for job in jobs]
 
-      last_total_row = i
+  with ProcessPoolExecutor(max_workers = max_workers) as pool:
+    return list(pool.map(write_job, jobs, repeat(cache)))
 
 
-  ## ADD BORDER AROUND EACH ITEM
-  thin_border = pyxl.styles.Border(
-    left = pyxl.styles.Side(style = 'thin', color = '000000'),
-    right = pyxl.styles.Side(style = 'thin', color = '000000'),
-    top = pyxl.styles.Side(style = 'thin', color = '000000'),
-    bottom = pyxl.styles.Side(style = 'thin', color = '000000')
-  )
 
-  for row in ws.iter_rows(
-    min_row = 1, max_row = ws.max_row,
-    min_col = 1, max_col = ws.max_column):
-    for cell in row:
-      cell.border = thin_border
+def create_deliverables(
+  schema, master_list, by_section = False, by_account = False, max_workers = None,
+  cache = None):
+  """
+  Writes the printable inventory sheet (and optionally the per section / per
+  account workbooks) for a layout and a master list already in memory.
 
+  :param schema: The InventorySchema of the old inventory.
+  :param master_list: The typed master list, see master_list.load_master.
+  :param cache: An optional render_cache.SectionCache.
+  :return: The paths written.
+  """
+  deliverable = resolve_items(schema, master_code_index(master_list))
 
+  # the full sheet, plus a workbook per section / per account if asked for
+  jobs = deliverable_jobs(
+    deliverable, schema.sections, DELIVERABLE_PATH, by_section, by_account)
 
-  ## FORMATTING PRICE, EST_PRICE, TOTAL EST VALUE AS ACCOUNTING COLS
-  for col in [headers["PRICE"], headers["EST_PRICE"]]:
-    col_letter = pyxl.utils.get_column_letter(col)
-    for cell in ws[col_letter]:
-      cell.number_format = pyxl.styles.numbers.FORMAT_CURRENCY_USD_SIMPLE
+  return write_deliverables(jobs, cache, max_workers)
 
-  ## FORMATTING QUANTITY TO BE NUMERIC COLUMN
-  col_letter = pyxl.utils.get_column_letter(headers["QUANTITY"])
-  for cell in ws[col_letter]:
-    cell.number_format = pyxl.styles.numbers.FORMAT_NUMBER
 
-  ## FORMATTING VENDOR_CODE TO BE TEXT TO PRESERVE LEADING ZEROS
 
+def main(by_section = False, by_account = False, max_workers = None):
 
-  ## ADDING TOTAL OF TOTAL_EST_VALUE FOR TOTAL VALUE ACROSS INVENTORY
-  last_row = ws.max_row
-  
-  ws["K2"].value = f"=SUM(K3:K{last_row})"
-  ws["K2"].number_format = pyxl.styles.numbers.FORMAT_CURRENCY_USD_SIMPLE
-  ws["K2"].font = pyxl.styles.Font(bold = True)
 
+  # layout of the old inventory, with integer vendor codes
+  schema = ss.load_current_schema(ss.SCHEMA_PATH)
 
+  # the current master list, with this run's prices
+  master_list = ml.load_master(ml.MASTER_PATH)
 
+  # only sections that changed since the last run are rendered again
+  cache = rc.SectionCache(rc.CACHE_DIR)
 
-  ## ADJUST COLUMN WIDTHS AND HEADER ROW HEIGHT
-  ws.column_dimensions["B"].width = 20
-  ws.column_dimensions["C"].width = 15
-  ws.column_dimensions["D"].width = 40
-  ws.column_dimensions["K"].width = 15
-  for col in range(5, 11):
-    col_letter = pyxl.utils.get_column_letter(col)
-    ws.column_dimensions[col_letter].width = 10
-
-  ws.row_dimensions[1].height = 35
-  
   try:
-    printed.save(deliverable_path)
-    print(f"File saved successfully in {deliverable_path}")
+    for path in create_deliverables(
+      schema, master_list, by_section, by_account, max_workers, cache):
+      print(f"File saved successfully in {path}")
   except Exception as e:
     print(f"An unexpected error occurred while saving the file: {e}")
 
@@ -0,0 +1,365 @@
+"""
+Canonical loader and schema for the master inventory list.
+
+The master list lives on disk as a csv so that it can be filled out by hand
+(prices are stored like "$24.95 ", dates as text, and vendor / brand / unit /
+account are free text repeated on every row). Every stage that reads it wants
+the same typed frame, so this module parses the csv once into:
+
+  - VENDOR_CODE as an integer
+  - PRICE_CENTS as an integer number of cents (replacing the PRICE text)
+  - VENDOR, BRAND, UNIT, ACCOUNT and FLAG as categoricals
+  - LAST_UPDATE as a datetime
+  - UNIT as one of CASE, LB, EACH or HALF, plus the pack size, per each and
+    per pound columns derived from it (see units.py)
+
+and caches that typed frame in the shared table cache (see table_cache.py).
+The cache is keyed by the csv's contents, so hand edits to the csv
+invalidate it.
+
+Several programs (a scheduled invoice ingest, a manual run, ...) may update
+the master list at the same time, so writes go through master_lock (an
+advisory lock file next to the csv), are written to a temporary file that is
+atomically renamed over the csv, and can be checked against the version
+(content hash) of the csv that was originally loaded.
+"""
+
+
+
+import pandas as pd
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+
+from master import table_cache as tc
+from master import units
+
+try:
+  import msvcrt
+except ImportError:
+  msvcrt = None
+  import fcntl
+
+
+
+MASTER_PATH = "deliverables\\master_inventory_list.csv"
+
+# column order of the master list as it is written to disk
+MASTER_COLUMNS = [
+  "ITEM_DESC", "VENDOR", "BRAND", "VENDOR_CODE", "UNIT", "PACK", "PER_PACK",
+  "PRICE", "LAST_UPDATE", "ACCOUNT", "FLAG"
+]
+
+# older copies of the master list (see master\\archive) use these headers
+LEGACY_COLUMN_NAMES = {
+  "ITEM": "ITEM_DESC",
+  "ITEM_NAME": "ITEM_DESC",
+  "UNIT_TYPE": "UNIT",
+  "SUBUNIT": "PACK",
+  "SUBUNIT_SIZE": "PER_PACK",
+  "UNIT_PRICE": "PRICE",
+}
+
+CATEGORY_COLUMNS = ["VENDOR", "BRAND", "UNIT", "ACCOUNT", "FLAG"]
+
+# dtypes of the typed (in memory) master list, PRICE is held as PRICE_CENTS
+MASTER_DTYPES = {
+  "ITEM_DESC": "string",
+  "VENDOR_CODE": "int64",
+  "PACK": "float64",
+  "PER_PACK": "string",
+  "PRICE_CENTS": "Int64",
+  "LAST_UPDATE": "datetime64[ns]",
+  **{col: "category" for col in CATEGORY_COLUMNS},
+}
+
+# bumped whenever the typed frame changes shape, so older caches are rebuilt
+SCHEMA_VERSION = 2
+
+
+
+class StaleMasterError(Exception):
+  """
+  Raised when the master csv on disk is no longer the version that was
+  loaded, meaning someone else updated it in the meantime.
+  """
+
+
+
+def parse_price_dollars(prices):
+  """
+  Converts a column of prices into (unrounded) dollars.
+
+  Handles the excel accounting text found in the master csv ("$24.95 ",
+  "$1,024.00 ", " $-   " for zero, "($5.00)" for negatives) as well as plain
+  floats coming from the invoice reader.
+
+  :param prices: A pandas Series of price strings and / or numbers.
+  :return: A float Series of prices in dollars, NaN where there is no price.
+  """
+  text = prices.astype("string").str.strip()
+  text = text.str.replace(r"^\((.*)\)$", r"-\1", regex = True)
+  text = text.str.replace(r"[$,\s]", "", regex = True)
+  text = text.replace({"-": "0", "": pd.NA})
+
+  return pd.to_numeric(text, errors = "coerce").astype("float64")
+
+
+
+def parse_price_cents(prices):
+  """
+  Converts a column of prices into integer cents, see parse_price_dollars.
+
+  :param prices: A pandas Series of price strings and / or numbers.
+  :return: A nullable integer ("Int64") Series of prices in cents.
+  """
+  dollars = parse_price_dollars(prices)
+
+  return (dollars * 100).round().astype("Int64")
+
+
+
+def parse_vendor_codes(codes):
+  """
+  Converts a column of vendor codes as typed into a sheet (4184453,
+  4184453.0, "4184453", "0417-445", ...) into integers.
+
+  :param codes: A pandas Series of vendor codes.
+  :return: A nullable integer ("Int64") Series, <NA> where there is no 
+           usable code.
+  """
+  numeric = pd.to_numeric(codes, errors = "coerce")
+  digits = codes.astype("string").str.replace(r"\D", "", regex = True)
+  numeric = numeric.fillna(pd.to_numeric(digits, errors = "coerce"))
+  # two codes typed into one cell read back as numbers like 5.5E+27
+  numeric = numeric.where(numeric.abs() < 10**15)
+
+  return numeric.round().astype("Int64")
+
+
+
+def format_price(cents):
+  """
+  Converts a column of integer cents back into the accounting text used by
+  the master csv, so a load / save round trip leaves the csv unchanged.
+
+  :param cents: A nullable integer Series of prices in cents.
+  :return: A Series of strings like "$24.95 ", " $-   " for zero and "" for
+           missing prices.
+  """
+  text = pd.Series("", index = cents.index, dtype = object)
+
+  has_price = cents.notna()
+  text[has_price] = (cents[has_price] / 100).map("${:,.2f} ".format)
+  text[cents.eq(0).fillna(False)] = " $-   "
+
+  return text
+
+
+
+def to_master_schema(master):
+  """
+  Coerces a raw or partially typed master frame onto the canonical schema.
+
+  :param master: A DataFrame read from any version of the master csv, or a
+                 typed master frame that has had rows appended to it.
+  :return: A new DataFrame with MASTER_DTYPES column types, in the canonical
+           column order, followed by the units.DERIVED_COLUMNS.
+  """
+  master = master.rename(columns = LEGACY_COLUMN_NAMES)
+  master = master.drop(
+    columns = [col for col in master.columns if str(col).startswith("Unnamed")])
+
+  # prices are only ever held in memory as integer cents
+  if "PRICE" in master.columns:
+    cents = parse_price_cents(master["PRICE"])
+    if "PRICE_CENTS" in master.columns:
+      cents = master["PRICE_CENTS"].astype("Int64").fillna(cents)
+    master = master.drop(columns = ["PRICE"])
+    master["PRICE_CENTS"] = cents
+
+  for col in MASTER_COLUMNS:
+    if col == "PRICE":
+      col = "PRICE_CENTS"
+    if col not in master.columns:
+      master[col] = pd.NA
+
+  # every spelling of a unit ("cs", "lbs", "ea", ...) as one canonical name
+  master["UNIT"] = units.normalize_units(master["UNIT"])
+
+  master["LAST_UPDATE"] = pd.to_datetime(
+    master["LAST_UPDATE"], errors = "coerce", format = "mixed")
+  master = master.astype(
+    {col: dtype for col, dtype in MASTER_DTYPES.items() if col != "LAST_UPDATE"})
+
+  typed_columns = [
+    "PRICE_CENTS" if col == "PRICE" else col for col in MASTER_COLUMNS]
+  master = master[typed_columns].reset_index(drop = True)
+
+  # pack sizes and per each / per pound prices, never written to the csv
+  derived = units.unit_conversions(
+    master["UNIT"], master["PACK"], master["PER_PACK"], master["PRICE_CENTS"])
+
+  return pd.concat([master, derived], axis = 1)
+
+
+
+def file_digest(path):
+  # content hash of a file, used to decide if a cache is still valid
+  with open(path, "rb") as file:
+    return hashlib.sha256(file.read()).hexdigest()
+
+
+
+def parse_master_csv(csv_path):
+  # the typed master frame of a csv, as kept in the table cache
+  return to_master_schema(pd.read_csv(csv_path))
+
+
+
+def load_master(csv_path = MASTER_PATH, use_cache = True):
+  """
+  Loads the master inventory list as a typed DataFrame.
+
+  The typed frame is read from the table cache when the csv's current
+  contents were parsed before, otherwise the csv is parsed and cached.
+
+  :param csv_path: Path to the master csv.
+  :param use_cache: If False, always parse the csv and leave the cache alone.
+  :return: The master list as a DataFrame following MASTER_DTYPES.
+  """
+  digest = file_digest(csv_path)
+
+  if use_cache:
+    master = tc.TableCache(tc.CACHE_DIR).load(
+      csv_path, parse_master_csv, version = SCHEMA_VERSION, digest = digest)
+  else:
+    master = parse_master_csv(csv_path)
+
+  master.attrs["source_sha256"] = digest
+
+  return master
+
+
+
+def master_version(csv_path = MASTER_PATH):
+  """
+  Returns the version of the master csv currently on disk, which is the
+  content hash stored in a loaded master's attrs["source_sha256"].
+  """
+  return file_digest(csv_path) if os.path.exists(csv_path) else None
+
+
+
+@contextlib.contextmanager
+def master_lock(csv_path = MASTER_PATH, timeout = 120, poll = 0.25):
+  """
+  Holds an exclusive advisory lock on the master csv for the duration of a
+  with block, so that a read / modify / write of the master list cannot
+  interleave with another program doing the same.
+
+  The lock is taken on a "<csv>.lock" file next to the csv, with msvcrt on
+  Windows and fcntl everywhere else, so it is released by the OS if the
+  holding program crashes.
+
+  :param csv_path: Path to the master csv to lock.
+  :param timeout: Seconds to wait for another holder before giving up.
+  :param poll: Seconds between attempts to take the lock.
+  :raises TimeoutError: If the lock could not be taken within timeout.
+  """
+  lock_path = "".join([csv_path, ".lock"])
+  deadline = time.time() + timeout
+
+  with open(lock_path, "a+b") as lock_file:
+    while True:
+      try:
+        lock_file.seek(0)
+        if msvcrt:
+          msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+          fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        break
+      except OSError:
+        if time.time() > deadline:
+          raise TimeoutError(f"Timed out waiting for lock on {csv_path}")
+        time.sleep(poll)
+
+    try:
+      yield
+    finally:
+      lock_file.seek(0)
+      if msvcrt:
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+      else:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+  return
+
+
+
+def atomic_write(path, write):
+  """
+  Writes a file by calling write(temp_path) on a temporary file in the same
+  directory and then renaming it over path, so that readers only ever see
+  the old or the new file and never a partially written one.
+  """
+  directory = os.path.dirname(os.path.abspath(path))
+  name, ext = os.path.splitext(os.path.basename(path))
+  fd, temp_path = tempfile.mkstemp(prefix = f".{name}_", suffix = ext, dir = directory)
+  os.close(fd)
+
+  try:
+    write(temp_path)
+    os.replace(temp_path, path)
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+    raise
+
+  return
+
+
+
+def save_master(
+  master, csv_path = MASTER_PATH, use_cache = True, expected_version = None):
+  """
+  Writes a typed master frame back to the csv in its hand editable format
+  and caches the typed frame for the csv's new contents.
+
+  The csv is replaced atomically. Callers doing a read / modify / write
+  should hold master_lock and pass the version they loaded, so that an
+  update made by someone else in between is reported instead of lost.
+
+  :param master: A typed (or partially typed) master DataFrame.
+  :param csv_path: Path of the master csv to write.
+  :param use_cache: If False, the table cache is left alone.
+  :param expected_version: The attrs["source_sha256"] of the master as it
+                           was loaded. If given and the csv on disk no longer
+                           matches, nothing is written.
+  :raises StaleMasterError: If expected_version does not match the csv.
+  :return: The typed master frame that was written.
+  """
+  if expected_version is not None:
+    current_version = master_version(csv_path)
+    if current_version != expected_version:
+      raise StaleMasterError(
+        f"{csv_path} was modified since it was loaded, reload and retry")
+
+  master = to_master_schema(master)
+
+  out = master.drop(columns = ["PRICE_CENTS"])
+  out["PRICE"] = format_price(master["PRICE_CENTS"])
+  out["LAST_UPDATE"] = master["LAST_UPDATE"].dt.strftime("%Y-%m-%d")
+  atomic_write(csv_path, lambda temp: out[MASTER_COLUMNS].to_csv(temp, index = False))
+
+  master.attrs["source_sha256"] = file_digest(csv_path)
+  if use_cache:
+    try:
+      tc.TableCache(tc.CACHE_DIR).prime(
+        csv_path, parse_master_csv, master, version = SCHEMA_VERSION)
+    except Exception as e:
+      print(f"Could not cache {csv_path}: {e}")
+
+  return master
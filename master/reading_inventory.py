@@ -9,12 +9,21 @@ This is a program that will read in our current excel document that we're
 
 
 import pandas as pd
-import json
 
 import os
+import re
 import shutil
 import datetime
 
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from master import master_list as ml
+from master import schema_diff as sd
+from master import schema_store as ss
+from master import valuation as vl
+from master import workbook_reader as wr
+
 def move_and_archive_document(filename, origin_dir, destination_dir, remove = False):
     """
     Copies a specified file from the origin directory to the destination directory,
@@ -75,160 +84,335 @@ def move_and_archive_document(filename, origin_dir, destination_dir, remove = Fa
 
 
 
-# initializing dictionaries
-master_dict = {}
-misc_dict = {}
-
-
-def update_master(master_key, row, curr_section, order):
-  # have we seen this item code before?
-  if master_key not in master_dict:
-    # if not, add this as a new item to master_dict
-    master_dict[master_key] = {
-      "ITEM_DESC": [str(row["ITEM_DESC"]).upper()],
-      "SECTIONS": [[curr_section, order]],
-      "PRICES": [row["PRICE"]],
-      "UNITS": [row["UNIT"]],
-      "QUANTITY": [row["QUANTITY"]],
-    }
-
-  else: 
-    # we have seen this item code before, append it's information
-    vcode_info = master_dict[master_key]
-    vcode_info['ITEM_DESC'].append(str(row["ITEM_DESC"]).upper())
-    vcode_info['SECTIONS'].append([curr_section, order])
-    vcode_info['PRICES'].append(row["PRICE"])
-    vcode_info['UNITS'].append(row["UNIT"])
-    vcode_info['QUANTITY'].append(row["QUANTITY"])
-  
-  return
+# column names of the inventory sheet, in order
+INVENTORY_COLUMNS = [
+  "INDEX", "VENDOR/BRAND", "VENDOR_CODE", "ITEM_DESC", "UNIT", "PACK", 
+  "PER_PACK", "PRICE", "QUANTITY", "EST_PRICE", "TOTAL_EST_VALUE"
+  ]
 
-def update_misc(misc_key, row, curr_section, order):
-  # check to see if this item description is in misc_dict
-  if misc_key not in misc_dict:
-    # add new item description to dict
-    misc_dict[misc_key] = {
-      "SECTIONS": [[curr_section, order]],
-      "PRICES": [row["PRICE"]],
-      "UNITS": [row["UNIT"]],
-      "QUANTITY": [row["QUANTITY"]],
-    }
-
-  else:
-    # we've seen this item desc before, append info
-    item_info = misc_dict[misc_key]
-    item_info['SECTIONS'].append([curr_section, order])
-    item_info['PRICES'].append(row["PRICE"])
-    item_info['UNITS'].append(row["UNIT"])
-    item_info['QUANTITY'].append(row["QUANTITY"])
+SECTION_AREAS = [
+  "MK WALK IN", "MK BLUE RACK", "MK 4 DOOR FREEZER", "MK HOT LINE", 
+  "MK HOT LINE FREEZER", "MK BACK SHELF", "UPSTAIRS ICE CREAM FREEZER", 
+  "GARDE MANGER COOLER", "GARDE MANGER STATION", "BASEMENT FREEZER", 
+  "BASEMENT WALK IN", "BASEMENT ICE CREAM FREEZER", "BASEMENT PROTEIN FREEZER",
+  "STOREROOM", "HENRY CENTER FREEZER - SPEED RACK", "HENRY CENTER FREEZER"
+]
+
+FIRST_SECTION = "MK WALK IN" # first section read with excel sheet
+
+# column names of the older "Kitchen Inventory" workbooks, which came before
+# the printable inventory sheet and had no vendor/brand or pack columns
+LEGACY_INVENTORY_COLUMNS = [
+  "ITEM_DESC", "VENDOR/BRAND", "VENDOR_CODE", "UNIT", "PRICE", "QUANTITY",
+  "EST_PRICE", "TOTAL_EST_VALUE", "NOTE"
+  ]
 
-  return
+# new inventories wait in the first folder, already read ones in the second
+INVENTORY_FOLDERS = [
+  "inputs\\inventories\\", "inputs\\inventories\\processed_inventories\\"]
+INVENTORY_FOLDER = INVENTORY_FOLDERS[0]
 
 
 
-def main():
+def segment_inventory(df, section_areas = SECTION_AREAS, first_section = FIRST_SECTION):
+  """
+  Splits an inventory sheet into its sections and items, without walking 
+  the sheet row by row.
+
+  Section header rows are the rows whose ITEM_DESC (or, when there is no 
+  ITEM_DESC, VENDOR/BRAND) is one of section_areas, 
+  every row after a header belongs to that section until the next header, 
+  and an item's order is its 1 based position within that header's block. 
+  Empty rows and repeated "ITEM_DESC" column header rows are not items.
+
+  :param df: The inventory sheet as a DataFrame with INVENTORY_COLUMNS.
+  :param section_areas: The names of all sections, in order.
+  :param first_section: The section of any items above the first header.
+  :return: The layout of the sheet as an InventorySchema.
+  """
+  desc = df["ITEM_DESC"]
+
+  # the printable sheet has its section names in VENDOR/BRAND (merged across
+  # the row, with no ITEM_DESC), older sheets have them in ITEM_DESC
+  header_name = desc.where(desc.notna(), df["VENDOR/BRAND"])
+
+  # is this row in fact a section name?
+  is_section = header_name.isin(section_areas)
+  # is this not an item, either an empty row or a column header name "ITEM_DESC"
+  is_item = ~is_section & desc.notna() & (desc != "ITEM_DESC")
+
+  # every row belongs to the last section header above it
+  block = is_section.cumsum()
+  section = header_name.where(is_section).ffill().fillna(first_section)
+  section = section.astype(object).map(str).str.strip()
+
+  rows = df[is_item].astype(object)
+  vendor = rows["VENDOR/BRAND"]
+
+  items = pd.DataFrame({
+    "SECTION": section[is_item],
+    # order restarts at 1 after every section header
+    "ORDER": rows.groupby(block[is_item]).cumcount() + 1,
+    "VENDOR": vendor.where(vendor.isna(), vendor.map(str).str.upper()),
+    "VENDOR_CODE": ml.parse_vendor_codes(rows["VENDOR_CODE"]),
+    "ITEM_DESC": rows["ITEM_DESC"].map(str).str.upper(),
+    "UNIT": rows["UNIT"],
+    "PRICE": rows["PRICE"],
+    "QUANTITY": pd.to_numeric(rows["QUANTITY"], errors = "coerce"),
+  }, columns = ss.LAYOUT_COLUMNS).reset_index(drop = True)
+
+  return ss.InventorySchema(list(section_areas), items)
+
+
+
+def section_name_key(name):
+  # section names as typed ("BASEMENT WALK-IN", "Mk walk in ") compare equal
+  return re.sub(r"[\s-]+", " ", str(name)).strip().upper()
+
+
+
+def from_legacy_sheet(df, section_areas = SECTION_AREAS):
+  """
+  Converts an older "Kitchen Inventory" workbook (see
+  LEGACY_INVENTORY_COLUMNS) to the columns of the printable sheet, so it can
+  be segmented like any other inventory.
+
+  Its section names are matched to section_areas however they were typed,
+  and its repeated "Item" column header rows and "<section> TOTAL:" rows,
+  which sit in the item column, are dropped.
+
+  :param df: The workbook's values with LEGACY_INVENTORY_COLUMNS.
+  :param section_areas: The names of all sections, in order.
+  :return: A DataFrame with INVENTORY_COLUMNS.
+  """
+  text = df["ITEM_DESC"].astype("string").str.strip()
+  areas = {section_name_key(area): area for area in section_areas}
+  section = text.map(section_name_key, na_action = "ignore").map(areas)
+
+  not_item = text.str.upper().eq("ITEM") | text.str.upper().str.endswith("TOTAL:")
+  desc = section.fillna(df["ITEM_DESC"].where(~not_item.fillna(False)))
+
+  out = df.reindex(columns = INVENTORY_COLUMNS)
+  out["ITEM_DESC"] = desc
+
+  return out
+
+
+
+@dataclass
+class InventoryLayout:
+  """
+  The layout schema read from one inventory workbook.
+
+  error is None when the workbook was read successfully, otherwise it holds 
+  the reason the workbook could not be read and schema is None.
+  """
+  source: str
+  schema: ss.InventorySchema
+  error: str = None
+
+
+
+class InventoryReader:
+  """
+  Reads inventory workbooks into their layout schema (sections and their 
+  ordered items, items with vendor codes, items without).
+
+  A reader holds nothing but its configuration, so one reader can read any 
+  number of workbooks, and can be handed to worker processes to read many 
+  workbooks in parallel.
+  """
+
+  def __init__(
+    self, section_areas = SECTION_AREAS, first_section = FIRST_SECTION, 
+    use_cache = True):
+    self.section_areas = list(section_areas)
+    self.first_section = first_section
+    self.use_cache = use_cache
+
+
+  def read_sheet(self, path):
+    # the inventory sheet with our column names, see INVENTORY_COLUMNS
+    # only the values of those columns are streamed in (and cached)
+    df = wr.read_sheet_values(
+      path, len(INVENTORY_COLUMNS), use_cache = self.use_cache)
+    if df.shape[1] == len(LEGACY_INVENTORY_COLUMNS):
+      # an older "Kitchen Inventory" workbook
+      df.columns = LEGACY_INVENTORY_COLUMNS
+      return from_legacy_sheet(df, self.section_areas)
+    if df.shape[1] != len(INVENTORY_COLUMNS):
+      raise ValueError(
+        f"expected {len(INVENTORY_COLUMNS)} columns, found {df.shape[1]}")
+    df.columns = INVENTORY_COLUMNS
+
+    return df
+
+
+  def read(self, path):
+    """
+    Reads one inventory workbook.
+
+    :param path: Path to the '.xlsx' inventory workbook.
+    :return: An InventoryLayout for the workbook.
+    """
+    schema = segment_inventory(
+      self.read_sheet(path), self.section_areas, self.first_section)
+
+    return InventoryLayout(path, schema)
 
 
+  def try_read(self, path):
+    # read, but report a bad workbook in the result instead of raising
+    try:
+      return self.read(path)
+    except Exception as e:
+      return InventoryLayout(path, None, error = f"{type(e).__name__}: {e}")
+
+
+  def read_many(self, paths, max_workers = None):
+    """
+    Reads many inventory workbooks across a pool of processes.
+
+    :param paths: Paths to '.xlsx' inventory workbooks.
+    :param max_workers: Number of worker processes (default: one per CPU).
+    :return: A list with one InventoryLayout per path, in the order given. 
+             Workbooks that could not be read have their error set.
+    """
+    paths = list(paths)
+    if len(paths) < 2:
+      return [self.try_read(path) for path in paths]
+
+    with ProcessPoolExecutor(max_workers = max_workers) as pool:
+      return list(pool.map(self.try_read, paths))
+
+
+
+def find_inventories(folders = INVENTORY_FOLDERS):
+  # every '.xlsx' workbook directly inside the given folders
+  paths = []
+  for folder in folders:
+    if os.path.isdir(folder):
+      paths.extend(
+        os.path.join(folder, f) for f in sorted(os.listdir(folder)) 
+        if f.endswith(".xlsx") and not f.startswith("~$"))
+
+  return paths
+
+
+
+def read_all_inventories(folders = INVENTORY_FOLDERS, max_workers = None):
+  """
+  Batch mode: reads every inventory workbook waiting in inputs\\inventories 
+  as well as every workbook already in processed_inventories (to backfill 
+  their layouts), in parallel. Nothing is moved or written.
+
+  :param folders: Folders to look for '.xlsx' workbooks in.
+  :param max_workers: Number of worker processes (default: one per CPU).
+  :return: A list with one InventoryLayout per workbook found.
+  """
+  layouts = InventoryReader().read_many(
+    find_inventories(folders), max_workers = max_workers)
+
+  for layout in layouts:
+    if layout.error:
+      print(f"Could not read {layout.source}: {layout.error}")
+
+  return layouts
+
+
+
+def read_new_inventory(input_folder = INVENTORY_FOLDER):
+  """
+  Reads the layout of the first counted inventory found in input_folder.
+
+  :param input_folder: Folder holding newly counted ".xlsx" inventories.
+  :return: (layout, filename) of the inventory read, or None when there is
+           no new inventory.
+  """
   # read in file
   # focus only on first 8 columns
   # look for files in inputs/inventories
-  input_folder = "inputs\\inventories\\"
   input_files = [f for f in os.listdir(input_folder) if f.endswith(".xlsx")]
   # if xlsx file is found in inventories, open that filename and run
   if len(input_files) < 1:
-    return 0
+    return None
 
   ## FILE OPENING
-  df = pd.read_excel("".join([input_folder, input_files[0]]))
-
-  df.columns = [
-    "INDEX", "VENDOR/BRAND", "VENDOR_CODE", "ITEM_DESC", "UNIT", "PACK", 
-    "PER_PACK", "PRICE", "QUANTITY", "EST_PRICE", "TOTAL_EST_VALUE"
-    ]
-
-  section_areas = [
-    "MK WALK IN", "MK BLUE RACK", "MK 4 DOOR FREEZER", "MK HOT LINE", 
-    "MK HOT LINE FREEZER", "MK BACK SHELF", "UPSTAIRS ICE CREAM FREEZER", 
-    "GARDE MANGER COOLER", "GARDE MANGER STATION", "BASEMENT FREEZER", 
-    "BASEMENT WALK IN", "BASEMENT ICE CREAM FREEZER", "BASEMENT PROTEIN FREEZER",
-    "STOREROOM", "HENRY CENTER FREEZER - SPEED RACK", "HENRY CENTER FREEZER"
-  ]
+  layout = InventoryReader().read("".join([input_folder, input_files[0]]))
 
-  curr_section = "MK WALK IN" # first section read with excel sheet
+  return layout, input_files[0]
 
-  all_sections_info = {section: [] for section in section_areas}
 
-  order = 0
 
-  for i in range(df.shape[0]):
+def save_schema(schema):
+  """
+  Replaces the current layout schema with schema, recording what changed
+  since the previous one and archiving it first.
+  """
+  # record what changed since the previous schema, for the later stages
+  if sd.has_schema(ss.SCHEMA_PATH):
+    changeset = sd.diff_schemas(ss.load_current_schema(ss.SCHEMA_PATH), schema)
+    sd.write_changeset(changeset, sd.CHANGESET_PATH)
+    print(f"Layout changes: {changeset.summary()}")
+    print("")
 
-    row = df.iloc[i, :]
-    # creation of keys for dictionaries
-    master_key = "".join([
-      str(row["VENDOR/BRAND"]), ", ", str(row["VENDOR_CODE"])]).upper()
-    misc_key = "".join([
-      str(row["VENDOR/BRAND"]), ", ", str(row["ITEM_DESC"])]).upper()
-    
-    # is this item in fact a section name?
-    if row["ITEM_DESC"] in section_areas:
-      curr_section = row["ITEM_DESC"]
-      curr_section = curr_section.strip()
-      order = 0
+  # archive the previous schema
+  move_and_archive_document(
+    "inventory_schema.sqlite", "master\\schemas\\", 
+    "master\\schemas\\archive\\inventory_schema")
 
-      continue
+  # save the new schema, replacing the old one in a single step
+  ss.write_schema(schema, ss.SCHEMA_PATH)
 
-    
+  return
 
-    # is this not an item, either an empty row or a column header name "ITEM_DESC"
-    elif row["ITEM_DESC"] == "ITEM_DESC" or pd.isna(row["ITEM_DESC"]):
-      # ignore this non-item row
-      continue
 
 
-    # if the row made it past this point, it is an item
-    # regardless if the item code is valid or not, add the keys of the item to the 
-    all_sections_info[curr_section].append([master_key, misc_key])
-    order += 1
-    
-    # is the item code valid?
-    if pd.isna(row["VENDOR_CODE"]):
-      # valid item, invalid item code, add to misc_dict
-      update_misc(misc_key, row, curr_section, order)
-        
-    else:
-      update_master(master_key, row, curr_section, order)
-
-
-
-  for filename in [
-    "sections_order_info.json",
-    "misc_item_locs.json",
-    "vcode_locs.json"]:
-    folder_name = filename.split(".")[0]
-    move_and_archive_document(
-      filename, "master\\schemas\\", 
-      "".join(["master\\schemas\\archive\\", folder_name]))
-
-  # save all_sections_info
-  with open("master\\archive\\sections_order_info.json", "w") as file:
-    json.dump(all_sections_info, file, indent = 2, ensure_ascii = False)
-  
-  # vcode info
-  with open("master\\archive\\vcode_locs.json", "w") as file:
-    json.dump(master_dict, file, indent = 2, ensure_ascii = False)
-
-  # misc items
-  with open("master\\archive\\misc_item_locs.json", "w") as file:
-    json.dump(misc_dict, file, indent = 2, ensure_ascii = False)
+def save_totals(layout, valuations_dir = vl.VALUATIONS_DIR):
+  """
+  Values a counted inventory from its own prices and counts, without Excel,
+  and saves its line, section and overall totals as json for reporting.
+
+  :param layout: The InventoryLayout read from the counted inventory.
+  :param valuations_dir: Folder the "<inventory>_totals.json" is saved in.
+  :return: The inventory's valuation.Valuation.
+  """
+  valuation = vl.value_schema(layout.schema)
+
+  name = os.path.splitext(os.path.basename(layout.source))[0]
+  os.makedirs(valuations_dir, exist_ok = True)
+  vl.write_totals(valuation, os.path.join(valuations_dir, f"{name}_totals.json"))
+  print(f"Inventory total: ${valuation.total_cents / 100:,.2f}")
+  print("")
+
+  return valuation
 
+
+
+def archive_inventory(filename, input_folder = INVENTORY_FOLDER):
   # move and archive the read inventory into processed_inventories
   move_and_archive_document(
-    input_files[0],
+    filename,
     input_folder,
     "inputs\\inventories\\processed_inventories\\",
     remove = True
   )
 
+  return
+
+
+
+def main():
+
+  new_inventory = read_new_inventory(INVENTORY_FOLDER)
+  if new_inventory is None:
+    return 0
+
+  layout, filename = new_inventory
+  save_totals(layout)
+  save_schema(layout.schema)
+  archive_inventory(filename, INVENTORY_FOLDER)
+
 
 
 
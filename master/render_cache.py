@@ -0,0 +1,95 @@
+"""
+Cache of rendered inventory sections.
+
+Regenerating a deliverable renders every section from its resolved items,
+even when only a few prices changed since the last run. A rendered section
+(see sheet_writer.SectionBlock) does not depend on where it ends up in the
+output, so it can be kept and reused as long as the section itself did not
+change. Sections are cached under a hash of the output format and its
+version, the section name and the section's resolved rows in order (which
+hold each item's identity and the master list information it resolved to),
+so a rerun only renders the sections that changed.
+
+The cache is not tied to one output, any renderer can store its blocks here
+under its own format name. Sections that stop being rendered (a price or
+the layout changed) are left behind, so like the table cache it is kept
+under a size limit by removing the least recently used entries.
+"""
+
+
+
+import pandas as pd
+import hashlib
+import os
+
+from master import table_cache as tc
+from master.master_list import atomic_write
+
+
+
+CACHE_DIR = "master\\cache\\sections\\"
+
+# the cache is trimmed back to this many bytes after every new section
+MAX_BYTES = 64 * 1024 * 1024
+
+
+
+def section_key(section, items, format_name, format_version):
+  """
+  The cache key of a section: a sha256 over the output format and its
+  version, the section name, and the section's rows (columns and values, in
+  order).
+  """
+  digest = hashlib.sha256()
+  for part in [format_name, str(format_version), section, *map(str, items.columns)]:
+    digest.update(part.encode("utf-8"))
+    digest.update(b"\0")
+
+  # one stable 64 bit hash per row, in row order
+  row_hashes = pd.util.hash_pandas_object(items.astype(object), index = False)
+  digest.update(row_hashes.to_numpy().tobytes())
+
+  return digest.hexdigest()
+
+
+
+class SectionCache:
+  """
+  Keeps rendered sections on disk, one pickle per section key, and counts
+  how many sections were reused (hits) and rendered (misses).
+  """
+
+  def __init__(self, cache_dir = CACHE_DIR, max_bytes = MAX_BYTES):
+    self.cache_dir = cache_dir
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+
+
+  def render(self, section, items, render, format_name, format_version):
+    """
+    Returns the rendered section, from the cache when the same section was
+    rendered before, otherwise by calling render(section, items) and caching
+    the result.
+    """
+    key = section_key(section, items, format_name, format_version)
+    path = os.path.join(self.cache_dir, f"{key}.pkl")
+
+    if os.path.exists(path):
+      try:
+        block = pd.read_pickle(path)
+        # a read counts as a use, for evicting the least recently used
+        os.utime(path)
+        self.hits += 1
+        return block
+      except Exception as e:
+        print(f"Ignoring unreadable section cache {path}: {e}")
+
+    block = render(section, items)
+    self.misses += 1
+
+    os.makedirs(self.cache_dir, exist_ok = True)
+    atomic_write(path, lambda temp: pd.to_pickle(block, temp))
+    tc.evict(self.cache_dir, self.max_bytes, [".pkl"])
+
+    return block
@@ -0,0 +1,280 @@
+"""
+Compares successive inventory layouts.
+
+Every time reading_inventory reads a newly counted sheet, it replaces the
+layout schema. This module works out what changed between the two layouts
+(items added, items dropped, items that moved to other sections, sections
+whose contents or order changed) as a SchemaChangeset, saved to
+schema_changes.json as the record of what a new count changed. It can also
+replay the archived schemas in master\\schemas\\archive to report layout
+churn over time (run this module, see main).
+
+The changeset doesn't pick which sections deliverable_creation renders
+again: a section also has to be rendered again when a price in it changed,
+which a layout diff can't see. The section cache (see render_cache) keys
+every section by its resolved rows, layout and prices both, so it already
+renders exactly the sections either of them changed.
+
+An item is identified by its vendor code when it has one, otherwise by its
+vendor and description.
+"""
+
+
+
+import pandas as pd
+import json
+import os
+import re
+
+from dataclasses import dataclass, field
+
+from master import schema_store as ss
+
+
+
+CHANGESET_PATH = "master\\schemas\\schema_changes.json"
+ARCHIVE_DIR = "master\\schemas\\archive\\"
+
+
+
+@dataclass
+class SchemaChangeset:
+  """
+  The differences between an old and a new inventory layout.
+
+  added / dropped hold the layout rows (see schema_store.LAYOUT_COLUMNS, plus
+  KEY) of items only in the new / old layout. moved has one row per item
+  found in both layouts but in different sections, with FROM_SECTIONS and
+  TO_SECTIONS. affected_sections lists, in the new layout's order, every
+  section whose items or their order changed (followed by removed ones).
+  """
+  added: pd.DataFrame
+  dropped: pd.DataFrame
+  moved: pd.DataFrame
+  sections_added: list = field(default_factory = list)
+  sections_removed: list = field(default_factory = list)
+  affected_sections: list = field(default_factory = list)
+
+
+  def is_empty(self):
+    return not self.affected_sections
+
+
+  def summary(self):
+    return {
+      "ADDED": len(self.added),
+      "DROPPED": len(self.dropped),
+      "MOVED": len(self.moved),
+      "SECTIONS_CHANGED": len(self.affected_sections),
+    }
+
+
+  def to_dict(self):
+    # plain python values only, ready for json
+    def records(frame):
+      frame = frame.astype(object).where(frame.notna(), None)
+      return frame.to_dict(orient = "records")
+
+    return {
+      "summary": self.summary(),
+      "affected_sections": self.affected_sections,
+      "sections_added": self.sections_added,
+      "sections_removed": self.sections_removed,
+      "added": records(self.added),
+      "dropped": records(self.dropped),
+      "moved": records(self.moved),
+    }
+
+
+
+def item_keys(items):
+  """
+  Identity of each layout row: "CODE:<vendor code>" for items with a vendor
+  code, "ITEM:<vendor>|<description>" for items without.
+  """
+  by_code = "CODE:" + items["VENDOR_CODE"].astype("string")
+  by_desc = "ITEM:" + items["VENDOR"].fillna("").astype("string") \
+    + "|" + items["ITEM_DESC"].fillna("").astype("string")
+
+  return by_code.where(items["VENDOR_CODE"].notna(), by_desc)
+
+
+
+def diff_schemas(old, new):
+  """
+  Works out what changed between two inventory layouts.
+
+  :param old: The previous InventorySchema.
+  :param new: The new InventorySchema.
+  :return: A SchemaChangeset.
+  """
+  old_items = old.items.assign(KEY = item_keys(old.items))
+  new_items = new.items.assign(KEY = item_keys(new.items))
+
+  old_keys = set(old_items["KEY"])
+  new_keys = set(new_items["KEY"])
+
+  added = new_items[~new_items["KEY"].isin(old_keys)].reset_index(drop = True)
+  dropped = old_items[~old_items["KEY"].isin(new_keys)].reset_index(drop = True)
+
+  # items in both layouts whose set of sections changed
+  def section_sets(items):
+    shared = items[items["KEY"].isin(old_keys & new_keys)]
+    return shared.groupby("KEY", sort = False)["SECTION"] \
+      .agg(lambda s: tuple(sorted(s)))
+
+  from_sections = section_sets(old_items)
+  to_sections = section_sets(new_items).reindex(from_sections.index)
+  moved_keys = from_sections.index[from_sections != to_sections]
+
+  moved = new_items.drop_duplicates("KEY").set_index("KEY").loc[
+    moved_keys, ["VENDOR", "VENDOR_CODE", "ITEM_DESC"]].reset_index()
+  moved["FROM_SECTIONS"] = [list(from_sections[k]) for k in moved_keys]
+  moved["TO_SECTIONS"] = [list(to_sections[k]) for k in moved_keys]
+
+  # a section is affected when its ordered list of items is any different
+  old_order = old_items.groupby("SECTION", sort = False)["KEY"].agg(list)
+  new_order = new_items.groupby("SECTION", sort = False)["KEY"].agg(list)
+
+  sections_added = [s for s in new.sections if s not in old.sections]
+  sections_removed = [s for s in old.sections if s not in new.sections]
+  affected_sections = [
+    s for s in new.sections
+    if s in sections_added or old_order.get(s, []) != new_order.get(s, [])]
+  affected_sections += sections_removed
+
+  return SchemaChangeset(
+    added, dropped, moved, sections_added, sections_removed, affected_sections)
+
+
+
+def has_schema(path = ss.SCHEMA_PATH):
+  # is there a current schema, either the store or the old json files
+  return os.path.exists(path) or all(
+    os.path.exists(p) for p in ss.LEGACY_SCHEMA_PATHS)
+
+
+
+def write_changeset(changeset, path = CHANGESET_PATH):
+  # saves the changeset as json for downstream stages
+  with open(path, "w", encoding = "utf-8") as file:
+    json.dump(changeset.to_dict(), file, indent = 2, ensure_ascii = False)
+
+  return
+
+
+
+def snapshot_time(filename):
+  # archived files are named <name>_YYYYMMDD_HHMMSS.<ext>
+  match = re.search(r"(\d{8}_\d{6})", filename)
+  return pd.to_datetime(match.group(1), format = "%Y%m%d_%H%M%S") if match else None
+
+
+
+def archived_schemas(archive_dir = ARCHIVE_DIR):
+  """
+  Finds every archived layout, both the SQLite schema store and the older
+  three json file format.
+
+  :param archive_dir: The schema archive directory.
+  :return: A list of (timestamp, loader) pairs sorted by time, where calling
+           loader() returns that snapshot's InventorySchema.
+  """
+  snapshots = {}
+
+  store_dir = os.path.join(archive_dir, "inventory_schema")
+  if os.path.isdir(store_dir):
+    for f in os.listdir(store_dir):
+      when = snapshot_time(f)
+      if when is not None and f.endswith(".sqlite"):
+        path = os.path.join(store_dir, f)
+        snapshots[when] = lambda path = path: ss.load_schema(path)
+
+  # old json snapshots are the three files archived with the same timestamp
+  legacy = {}
+  for name in ["sections_order_info", "vcode_locs", "misc_item_locs"]:
+    folder = os.path.join(archive_dir, name)
+    if not os.path.isdir(folder):
+      continue
+    for f in os.listdir(folder):
+      when = snapshot_time(f)
+      if when is not None and f.endswith(".json"):
+        legacy.setdefault(when, {})[name] = os.path.join(folder, f)
+
+  for when, paths in legacy.items():
+    if len(paths) == 3 and when not in snapshots:
+      snapshots[when] = lambda paths = paths: ss.schema_from_json(
+        paths["sections_order_info"], paths["vcode_locs"], paths["misc_item_locs"])
+
+  return sorted(snapshots.items(), key = lambda pair: pair[0])
+
+
+
+def read_changeset(path = CHANGESET_PATH):
+  # the last changeset written by write_changeset, as saved, or None
+  if not os.path.exists(path):
+    return None
+  with open(path, encoding = "utf-8") as file:
+    return json.load(file)
+
+
+
+def layout_churn(archive_dir = ARCHIVE_DIR, current_path = ss.SCHEMA_PATH):
+  """
+  Reports how much the inventory layout changed from one snapshot to the
+  next, over every archived schema (and the current one, if there is one).
+
+  :param archive_dir: The schema archive directory.
+  :param current_path: Path of the current schema store.
+  :return: A DataFrame with one row per snapshot after the first: SNAPSHOT
+           time, ITEMS in that layout, ADDED, DROPPED, MOVED,
+           SECTIONS_CHANGED and CHURN (added + dropped + moved over items).
+  """
+  snapshots = archived_schemas(archive_dir)
+  if has_schema(current_path):
+    snapshots.append(
+      (pd.Timestamp.now(), lambda: ss.load_current_schema(current_path)))
+
+  rows = []
+  previous = None
+  for when, loader in snapshots:
+    schema = loader()
+    if previous is not None:
+      summary = diff_schemas(previous, schema).summary()
+      changed = summary["ADDED"] + summary["DROPPED"] + summary["MOVED"]
+      rows.append({
+        "SNAPSHOT": when,
+        "ITEMS": len(schema.items),
+        **summary,
+        "CHURN": changed / max(len(schema.items), 1),
+      })
+    previous = schema
+
+  return pd.DataFrame(rows, columns = [
+    "SNAPSHOT", "ITEMS", "ADDED", "DROPPED", "MOVED", "SECTIONS_CHANGED", "CHURN"])
+
+
+
+def main():
+
+  # what the latest count changed
+  changeset = read_changeset(CHANGESET_PATH)
+  if changeset is not None:
+    print(f"Latest layout changes: {changeset['summary']}")
+    if changeset["affected_sections"]:
+      print(f"Sections changed: {', '.join(changeset['affected_sections'])}")
+    print("")
+
+  # and how much every count changed the layout before it
+  churn = layout_churn(ARCHIVE_DIR, ss.SCHEMA_PATH)
+  if churn.empty:
+    print("Not enough archived layouts to report layout churn")
+  else:
+    print(churn.to_string(index = False))
+
+  return
+
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,232 @@
+"""
+Compact, indexed store for the layout schema of an inventory sheet.
+
+The layout read from an old inventory (which sections exist, in what order,
+which items are in each section, in what order, and the vendor, vendor code,
+unit, price and count each row had) is kept in a single SQLite file instead
+of three pretty-printed json files keyed by strings like "SYSCO, 4184453.0".
+
+  - sections: one row per section, in sheet order
+  - items: one row per item, in sheet order, with an integer (or NULL)
+           vendor_code, indexed by section and by vendor_code
+
+load_schema returns the whole layout as an InventorySchema whose items are a
+typed DataFrame, so nothing downstream has to split, strip or pad keys.
+"""
+
+
+
+import pandas as pd
+import numpy as np
+import json
+import os
+import sqlite3
+
+from dataclasses import dataclass
+
+from master import master_list as ml
+from master.master_list import atomic_write
+
+
+
+SCHEMA_PATH = "master\\schemas\\inventory_schema.sqlite"
+
+# the three json files the schema used to be saved as
+LEGACY_SCHEMA_PATHS = [
+  "master\\schemas\\sections_order_info.json",
+  "master\\schemas\\vcode_locs.json",
+  "master\\schemas\\misc_item_locs.json",
+]
+
+# columns of InventorySchema.items, in order
+LAYOUT_COLUMNS = [
+  "SECTION", "ORDER", "VENDOR", "VENDOR_CODE", "ITEM_DESC", "UNIT", "PRICE",
+  "QUANTITY"
+]
+
+SCHEMA_SQL = """
+CREATE TABLE sections (
+  position INTEGER PRIMARY KEY,
+  name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE items (
+  seq INTEGER PRIMARY KEY,
+  section TEXT NOT NULL REFERENCES sections (name),
+  position INTEGER NOT NULL,
+  vendor TEXT,
+  vendor_code INTEGER,
+  item_desc TEXT,
+  unit TEXT,
+  price,
+  quantity REAL
+);
+CREATE INDEX items_by_section ON items (section, position);
+CREATE INDEX items_by_vendor_code ON items (vendor_code);
+"""
+
+
+
+@dataclass
+class InventorySchema:
+  """
+  The layout of an inventory sheet.
+
+  sections is the list of section names in sheet order, and items is a
+  DataFrame with LAYOUT_COLUMNS, one row per item in sheet order, where
+  VENDOR_CODE is a nullable integer.
+  """
+  sections: list
+  items: pd.DataFrame
+
+
+  def section_items(self):
+    # (section, items of that section) for every section, in sheet order
+    grouped = dict(tuple(self.items.groupby("SECTION", sort = False)))
+    empty = self.items.iloc[0:0]
+    return [(section, grouped.get(section, empty)) for section in self.sections]
+
+
+  def vendor_code_info(self):
+    # first sighting of every vendor code, indexed by VENDOR_CODE
+    coded = self.items[self.items["VENDOR_CODE"].notna()]
+    return coded.drop_duplicates("VENDOR_CODE").set_index("VENDOR_CODE")
+
+
+  def misc_item_info(self):
+    # first sighting of every item without a vendor code, by VENDOR + ITEM_DESC
+    # (items without a vendor are under VENDOR "")
+    misc = self.items[self.items["VENDOR_CODE"].isna()]
+    misc = misc.assign(VENDOR = misc["VENDOR"].fillna(""))
+    return misc.drop_duplicates(["VENDOR", "ITEM_DESC"]) \
+      .set_index(["VENDOR", "ITEM_DESC"])
+
+
+
+def sql_value(value):
+  # sqlite only takes plain python values, and NULL for anything missing
+  if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+    return None
+  if isinstance(value, np.generic):
+    return value.item()
+  return value
+
+
+
+def write_schema(schema, path = SCHEMA_PATH):
+  """
+  Saves an InventorySchema, atomically replacing any schema already at path.
+
+  :param schema: The InventorySchema to save.
+  :param path: Path of the SQLite schema file.
+  """
+  items = schema.items[LAYOUT_COLUMNS].astype(object)
+  item_rows = [tuple(sql_value(v) for v in row) for row in items.itertuples(index = False)]
+
+  def write(temp_path):
+    # the (empty) temp file is a valid, empty sqlite database
+    with sqlite3.connect(temp_path) as conn:
+      conn.executescript(SCHEMA_SQL)
+      conn.executemany(
+        "INSERT INTO sections (position, name) VALUES (?, ?)",
+        list(enumerate(schema.sections)))
+      conn.executemany(
+        "INSERT INTO items (section, position, vendor, vendor_code, item_desc, "
+        "unit, price, quantity) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", item_rows)
+    conn.close()
+
+  atomic_write(path, write)
+
+  return
+
+
+
+def load_schema(path = SCHEMA_PATH):
+  """
+  Loads the InventorySchema saved at path.
+
+  :param path: Path of the SQLite schema file.
+  :return: The saved InventorySchema.
+  """
+  conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri = True)
+  try:
+    sections = [
+      name for (name,) in conn.execute("SELECT name FROM sections ORDER BY position")]
+    items = pd.read_sql_query(
+      "SELECT section AS SECTION, position AS \"ORDER\", vendor AS VENDOR, "
+      "vendor_code AS VENDOR_CODE, item_desc AS ITEM_DESC, unit AS UNIT, "
+      "price AS PRICE, quantity AS QUANTITY FROM items ORDER BY seq", conn)
+  finally:
+    conn.close()
+
+  items["VENDOR_CODE"] = items["VENDOR_CODE"].astype("Int64")
+  items["QUANTITY"] = items["QUANTITY"].astype("float64")
+
+  return InventorySchema(sections, items)
+
+
+
+def read_legacy_json(path):
+  # the old files were written in the platform's default encoding, which on
+  # the kitchen machines is cp1252 rather than utf-8
+  with open(path, "rb") as file:
+    raw = file.read()
+  try:
+    return json.loads(raw.decode("utf-8"))
+  except UnicodeDecodeError:
+    return json.loads(raw.decode("cp1252"))
+
+
+
+def schema_from_json(
+  sections_path = LEGACY_SCHEMA_PATHS[0], vcode_path = LEGACY_SCHEMA_PATHS[1],
+  misc_path = LEGACY_SCHEMA_PATHS[2]):
+  """
+  Converts a schema saved in the old three json file format (including the
+  ones in master\\schemas\\archive) into an InventorySchema.
+
+  :return: The equivalent InventorySchema.
+  """
+  all_sections_info = read_legacy_json(sections_path)
+  vcode_locs = read_legacy_json(vcode_path)
+  misc_item_locs = read_legacy_json(misc_path)
+
+  def occurrence(info, section, order):
+    # the price / unit / count recorded for this item at this spot
+    sightings = [tuple(s) for s in info.get("SECTIONS", [])]
+    i = sightings.index((section, order)) if (section, order) in sightings else 0
+    return [info.get(col, [None])[i] for col in ["PRICES", "UNITS", "QUANTITY"]]
+
+  rows = []
+  for section, keys in all_sections_info.items():
+    for order, (master_key, misc_key) in enumerate(keys, start = 1):
+      # the keys were "VENDOR, VENDOR_CODE" and "VENDOR, ITEM_DESC"
+      vendor, vcode = master_key.rsplit(", ", 1)
+      item_desc = misc_key[len(vendor) + 2:]
+
+      if master_key in vcode_locs and vcode != "NAN":
+        info = vcode_locs[master_key]
+      else:
+        vcode = None
+        info = misc_item_locs.get(misc_key, {})
+
+      price, unit, quantity = occurrence(info, section, order)
+      rows.append([
+        section, order, None if vendor == "NAN" else vendor, vcode,
+        item_desc, unit, price, quantity])
+
+  items = pd.DataFrame(rows, columns = LAYOUT_COLUMNS)
+  items["VENDOR_CODE"] = ml.parse_vendor_codes(items["VENDOR_CODE"])
+  items["QUANTITY"] = pd.to_numeric(items["QUANTITY"], errors = "coerce")
+
+  return InventorySchema(list(all_sections_info), items)
+
+
+
+def load_current_schema(path = SCHEMA_PATH):
+  """
+  Loads the current schema, falling back on (and converting) the old json
+  files when no schema store has been written yet.
+  """
+  if os.path.exists(path):
+    return load_schema(path)
+  return schema_from_json(*LEGACY_SCHEMA_PATHS)
@@ -0,0 +1,476 @@
+"""
+Single pass writer for the printable inventory sheet.
+
+The sheet used to be written with DataFrame.to_excel, loaded back with
+openpyxl, and then walked over cell by cell once per kind of formatting
+(wrapping, centering, borders, currency, merges), with insert_rows shifting
+the whole sheet once per section to make room for blank counting rows. This
+module instead lays out every row (section headers, items, blank rows and
+section totals) with its values, formulas and styles already decided, and
+streams the rows once into the sheet, so the time and memory it takes only
+grow with the number of rows written.
+
+Each section is rendered on its own into sheet xml that does not depend on
+where the section ends up (row numbers are filled in as it is written), so
+a render_cache.SectionCache can keep it and a rerun only renders the
+sections that changed. openpyxl writes everything else about the workbook
+(styles, columns, merges, the header row), and the sections' rows are
+spliced into its worksheet.
+
+Every dollar figure (EST_PRICE, section totals, the inventory total) is
+worked out by valuation.py and written into the sheet, either as the
+result of the formula that is kept in the cell, or on its own.
+"""
+
+
+
+import pandas as pd
+import openpyxl as pyxl
+import io
+import numbers
+import re
+import zipfile
+
+from dataclasses import dataclass
+from xml.sax.saxutils import escape
+
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.numbers import FORMAT_CURRENCY_USD_SIMPLE, FORMAT_NUMBER
+from openpyxl.utils import get_column_letter
+
+from master import valuation as vl
+from master.master_list import atomic_write
+
+
+
+# column headers of the sheet, column A is the row index
+SHEET_COLUMNS = [
+  None, "VENDOR/BRAND", "VENDOR_CODE", "ITEM_DESC", "UNIT", "PACK", "PER_PACK",
+  "PRICE", "QUANTITY", "EST_PRICE", "TOTAL_EST_VALUE"
+]
+
+# blank rows left at the bottom of every section for items written in by hand
+N_BLANKS = 10
+
+# section headers and totals are merged across these columns
+MERGED_COLUMNS = ("B", "J")
+
+COLUMN_WIDTHS = {
+  "B": 20, "C": 15, "D": 40, "E": 10, "F": 10, "G": 10, "H": 10, "I": 10,
+  "J": 10, "K": 15
+}
+HEADER_HEIGHT = 35
+
+THIN_SIDE = Side(style = "thin", color = "000000")
+THIN_BORDER = Border(
+  left = THIN_SIDE, right = THIN_SIDE, top = THIN_SIDE, bottom = THIN_SIDE)
+WRAP_ALIGNMENT = Alignment(wrap_text = True, vertical = "center")
+CENTER_ALIGNMENT = Alignment(horizontal = "center", vertical = "center")
+SECTION_FILL = PatternFill(
+  start_color = "CCE5FF", end_color = "CCE5FF", fill_type = "solid")
+TOTAL_FILL = PatternFill(
+  start_color = "FFFACD", end_color = "FFFACD", fill_type = "solid")
+
+
+
+def inventory_styles():
+  """
+  The named styles of the printable inventory sheet. Every cell refers to
+  one of these by name, so each style is stored in the workbook once.
+  """
+  def style(name, font = None, fill = None, alignment = WRAP_ALIGNMENT,
+    number_format = "General"):
+    return NamedStyle(
+      name = name, font = font or Font(name = "Calibri", size = 11),
+      fill = fill or PatternFill(),
+      border = THIN_BORDER, alignment = alignment, number_format = number_format)
+
+  bold = Font(name = "Calibri", size = 11, bold = True)
+
+  return [
+    style("inventory"),
+    style("inventory centered", alignment = CENTER_ALIGNMENT),
+    style("inventory currency", number_format = FORMAT_CURRENCY_USD_SIMPLE),
+    style("inventory number", number_format = FORMAT_NUMBER),
+    style("inventory bold", font = bold),
+    style("inventory header", font = bold),
+    style("inventory header centered", font = bold, alignment = CENTER_ALIGNMENT),
+    style(
+      "inventory header currency", font = bold,
+      number_format = FORMAT_CURRENCY_USD_SIMPLE),
+    style("inventory header number", font = bold, number_format = FORMAT_NUMBER),
+    style(
+      "section header", font = Font(name = "Calibri", size = 24, bold = True), fill = SECTION_FILL,
+      alignment = CENTER_ALIGNMENT),
+    style("section total", font = bold, fill = TOTAL_FILL, alignment = CENTER_ALIGNMENT),
+    style(
+      "section total value", font = bold, fill = TOTAL_FILL,
+      alignment = CENTER_ALIGNMENT, number_format = FORMAT_CURRENCY_USD_SIMPLE),
+    style(
+      "inventory total", font = bold, number_format = FORMAT_CURRENCY_USD_SIMPLE),
+  ]
+
+
+
+# the named style of each column's cells, and of its header
+COLUMN_STYLES = {
+  "VENDOR_CODE": "inventory centered",
+  "UNIT": "inventory centered",
+  "PACK": "inventory centered",
+  "PER_PACK": "inventory centered",
+  "PRICE": "inventory currency",
+  "QUANTITY": "inventory number",
+  "EST_PRICE": "inventory currency",
+}
+HEADER_STYLES = {
+  "inventory": "inventory header",
+  "inventory centered": "inventory header centered",
+  "inventory currency": "inventory header currency",
+  "inventory number": "inventory header number",
+}
+
+
+
+def column_letter(name):
+  # the sheet column holding name, see SHEET_COLUMNS
+  return get_column_letter(SHEET_COLUMNS.index(name) + 1)
+
+
+
+def cell_value(value):
+  # blanks (NaN, <NA>, "") are written as empty cells
+  if isinstance(value, str):
+    return value if value != "" else None
+  return None if pd.isna(value) else value
+
+
+
+# bump whenever the rendered xml of a section changes (render_section,
+# block_xml or the styles), so sections cached by an older version are not
+# reused
+FORMAT_VERSION = 2
+
+
+
+@dataclass
+class SectionBlock:
+  """
+  A rendered section (header, items, blank rows and total), independent of
+  where in the sheet it ends up.
+
+  rows holds one list per row of (value, style name, kind) cells. kind is
+  None for plain values, "index" for a row index (value is the offset from
+  the block's first index) and "formula" for a (formula template, result)
+  pair, whose {row}, {first} and {last} are filled in with the row itself,
+  the first item row and the last row before the total when the block is
+  written, and whose result is the formula's value as worked out in python.
+  The first row (header) and last row (total) are merged across
+  MERGED_COLUMNS.
+  """
+  section: str
+  rows: list
+
+
+
+def item_quantities(items):
+  # the counts of a section's items, none if it hasn't been counted
+  if "QUANTITY" in items:
+    return items["QUANTITY"]
+  return pd.Series(None, index = items.index, dtype = object)
+
+
+
+def render_section(section, items, formulas = True):
+  """
+  Renders a section into a SectionBlock.
+
+  :param section: The section name.
+  :param items: A DataFrame of the section's items, with the columns of
+                SHEET_COLUMNS from VENDOR/BRAND through PRICE, and
+                optionally QUANTITY (the counts).
+  :param formulas: If False, the dollar figures are written as values only,
+                   without the formulas that work them out.
+  :return: The SectionBlock of the section.
+  """
+  def column(name, value, kind = None):
+    return (value, COLUMN_STYLES.get(name, "inventory"), kind)
+
+  quantities = item_quantities(items)
+  # dollars, the value of every line and of the whole section
+  line_values = vl.line_values(items["PRICE"], quantities) / 100
+  section_value = float(line_values.sum())
+
+  est_col = column_letter("EST_PRICE")
+  # EST_PRICE is the row's PRICE times its counted QUANTITY
+  est_formula = "".join([
+    "=", column_letter("PRICE"), "{row}*", column_letter("QUANTITY"), "{row}"])
+
+  def est_price(value, counted):
+    if formulas:
+      return column("EST_PRICE", (est_formula, value), "formula")
+    return column("EST_PRICE", value if counted else None)
+
+  header = [(0, "inventory bold", "index"), (section, "section header", None)]
+  header += [column(name, None) for name in SHEET_COLUMNS[2:-1]]
+  header.append((None, "inventory", None))
+  rows = [header]
+
+  rendered = zip(
+    items[SHEET_COLUMNS[1:-3]].itertuples(index = False), quantities, line_values)
+  for i, (item, quantity, value) in enumerate(rendered, 1):
+    quantity = cell_value(quantity)
+    row = [(i, "inventory bold", "index")]
+    row += [
+      column(name, cell_value(value)) for name, value in zip(SHEET_COLUMNS[1:-3], item)]
+    row += [
+      column("QUANTITY", quantity), est_price(value, quantity is not None),
+      (None, "inventory", None)]
+    rows.append(row)
+
+  for _ in range(N_BLANKS):
+    row = [column(name, None) for name in SHEET_COLUMNS]
+    row[SHEET_COLUMNS.index("EST_PRICE")] = est_price(0.0, False)
+    rows.append(row)
+
+  # the section total sums the EST_PRICE of every row of the section
+  total = [(None, "section total", None) for name in SHEET_COLUMNS[:-1]]
+  total[1] = (f"{section} TOTAL:", "section total", None)
+  if formulas:
+    total.append((
+      (f"=SUM({est_col}{{first}}:{est_col}{{last}})", section_value),
+      "section total value", "formula"))
+  else:
+    total.append((section_value, "section total value", None))
+  rows.append(total)
+
+  return SectionBlock(section, rows)
+
+
+
+class BlockNumbers(dict):
+  """
+  Fills in the numbers of a rendered section's xml, see block_xml: {r<n>}
+  is the row n rows below the section's first row, {i<n>} the row index n
+  after the section's first index, and {first} / {last} are its first item
+  row and its last row before the total.
+  """
+
+  def __init__(self, start, n_rows, index, **fields):
+    super().__init__(first = start + 1, last = start + n_rows - 2, **fields)
+    self.start = start
+    self.index = index
+
+
+  def __missing__(self, key):
+    base = self.index if key[0] == "i" else self.start
+    return base + int(key[1:])
+
+
+
+def cell_xml(value, style_id, result = None):
+  # a single <c> element, no reference so it simply follows the previous cell
+  # (result is the value of a formula, stored with it)
+  if value is None:
+    return f'<c s="{style_id}"/>'
+  if isinstance(value, bool):
+    return f'<c s="{style_id}" t="b"><v>{int(value)}</v></c>'
+  if isinstance(value, numbers.Number):
+    value = int(value) if isinstance(value, numbers.Integral) else float(value)
+    return f'<c s="{style_id}" t="n"><v>{value!r}</v></c>'
+  if isinstance(value, str) and value.startswith("="):
+    return f'<c s="{style_id}"><f>{escape(value[1:])}</f>{result_xml(result)}</c>'
+
+  text = escape(str(value))
+  return f'<c s="{style_id}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+
+def result_xml(result):
+  # the stored value of a formula cell
+  return "" if result is None else f"<v>{float(result)!r}</v>"
+
+
+
+def block_xml(block, style_ids):
+  """
+  Renders a SectionBlock into the <row> elements of the sheet, as a
+  template for str.format_map with BlockNumbers, so that the same xml can
+  be written anywhere in the sheet.
+
+  :param block: The SectionBlock to render.
+  :param style_ids: The workbook's cell style id of every named style.
+  :return: The xml template of the block.
+  """
+  def placeholders(text):
+    # every literal brace in the values has to survive str.format
+    return text.replace("{", "{{").replace("}", "}}")
+
+  rows = []
+  for offset, row in enumerate(block.rows):
+    cells = []
+    for i, (value, style, kind) in enumerate(row):
+      if offset == 0 and i == len(row) - 1:
+        # the header's last cell may hold the inventory total, see write
+        cells.append("{header_total}")
+      elif kind == "index":
+        cells.append(f'<c s="{style_ids[style]}" t="n"><v>{{i{value}}}</v></c>')
+      elif kind == "formula":
+        formula, result = value
+        formula = placeholders(escape(formula[1:])) \
+          .replace("{{row}}", f"{{r{offset}}}") \
+          .replace("{{first}}", "{first}").replace("{{last}}", "{last}")
+        cells.append(
+          f'<c s="{style_ids[style]}"><f>{formula}</f>{result_xml(result)}</c>')
+      else:
+        cells.append(placeholders(cell_xml(value, style_ids[style])))
+    rows.append(f'<row r="{{r{offset}}}">{"".join(cells)}</row>')
+
+  return "".join(rows)
+
+
+
+def named_style_ids(ws):
+  """
+  Registers the cell style of every named style with the workbook, in the
+  fixed order of inventory_styles, and returns the style id of each. The
+  ids are part of the rendered (and cached) xml, which is why the order is
+  fixed and why FORMAT_VERSION has to change with the styles.
+  """
+  ids = {}
+  for style in inventory_styles():
+    cell = WriteOnlyCell(ws, value = None)
+    cell.style = style.name
+    ids[style.name] = cell.style_id
+  return ids
+
+
+
+def section_length(items):
+  # rows a section takes up: header, items, blank rows and total
+  return len(items) + N_BLANKS + 2
+
+
+
+def write_inventory_sheet(path, sections, cache = None, formulas = True):
+  """
+  Writes the printable inventory sheet in a single pass.
+
+  :param path: Path of the '.xlsx' file to write.
+  :param sections: A list of (section name, items DataFrame) pairs, in
+                   sheet order, see render_section.
+  :param cache: An optional render_cache.SectionCache, sections whose
+                contents are unchanged since they were last rendered are
+                then taken from it instead of rendered again.
+  :param formulas: If False, the dollar figures are written as values only,
+                   see render_section.
+  """
+  workbook = pyxl.Workbook(write_only = True)
+  styles = {style.name: style for style in inventory_styles()}
+  for style in styles.values():
+    workbook.add_named_style(style)
+  ws = workbook.create_sheet()
+  style_ids = named_style_ids(ws)
+
+  # everything about the columns and the header has to be set before any row
+  for letter, width in COLUMN_WIDTHS.items():
+    ws.column_dimensions[letter].width = width
+  # whole columns carry their number format and alignment, so anything
+  # written in below the printed rows is formatted like the rest
+  for name, style in COLUMN_STYLES.items():
+    dimension = ws.column_dimensions[column_letter(name)]
+    dimension.number_format = styles[style].number_format
+    dimension.alignment = styles[style].alignment
+  ws.row_dimensions[1].height = HEADER_HEIGHT
+  ws.freeze_panes = "A2"
+  ws.print_title_rows = "1:1"
+
+  header = []
+  for name in SHEET_COLUMNS:
+    cell = WriteOnlyCell(ws, value = name)
+    cell.style = HEADER_STYLES[COLUMN_STYLES.get(name, "inventory")]
+    header.append(cell)
+  ws.append(header)
+
+  # where every section starts, and its header and total rows are merged
+  starts = []
+  row = 2
+  for _, items in sections:
+    starts.append(row)
+    row += section_length(items)
+    for merged_row in [starts[-1], row - 1]:
+      ws.merged_cells.add(f"{MERGED_COLUMNS[0]}{merged_row}:{MERGED_COLUMNS[1]}{merged_row}")
+  last_row = row - 1
+
+  # the inventory total sits in the first section header, above everything
+  # it adds up
+  total_col = column_letter("TOTAL_EST_VALUE")
+  total_value = sum(
+    vl.line_values(items["PRICE"], item_quantities(items)).sum()
+    for _, items in sections) / 100
+  if formulas:
+    grand_total = cell_xml(
+      f"=SUM({total_col}3:{total_col}{last_row})", style_ids["inventory total"],
+      total_value)
+  else:
+    grand_total = cell_xml(total_value, style_ids["inventory total"])
+  no_total = cell_xml(None, style_ids["inventory"])
+
+  def render(section, items):
+    return block_xml(render_section(section, items, formulas), style_ids)
+
+  format_name = "inventory_sheet" if formulas else "inventory_sheet_values"
+
+  def sheet_rows():
+    # the xml of every section, with its row numbers filled in
+    index = 0
+    for i, ((section, items), start) in enumerate(zip(sections, starts)):
+      if cache is not None:
+        xml = cache.render(section, items, render, format_name, FORMAT_VERSION)
+      else:
+        xml = render(section, items)
+      yield xml.format_map(BlockNumbers(
+        start, section_length(items), index,
+        header_total = grand_total if i == 0 else no_total))
+      index += len(items) + 1
+
+  buffer = io.BytesIO()
+  workbook.save(buffer)
+
+  def write(temp_path):
+    splice_rows(buffer, temp_path, ws, sheet_rows(), last_row)
+
+  atomic_write(path, write)
+
+  return
+
+
+
+def splice_rows(workbook_file, path, ws, rows, last_row):
+  """
+  Copies the workbook saved by openpyxl to path, adding the given <row>
+  elements to the end of the worksheet's sheetData.
+  """
+  sheet_name = f"xl/worksheets/{ws.path.split('/')[-1]}"
+  last_col = get_column_letter(len(SHEET_COLUMNS))
+
+  with zipfile.ZipFile(workbook_file) as source, \
+    zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+    for info in source.infolist():
+      data = source.read(info.filename)
+      if info.filename != sheet_name:
+        target.writestr(info, data)
+        continue
+
+      sheet = data.decode("utf-8")
+      sheet = re.sub(
+        r'<dimension ref="[^"]*"', f'<dimension ref="A1:{last_col}{last_row}"', sheet)
+      before, after = sheet.split("</sheetData>", 1)
+      with target.open(info.filename, "w") as out:
+        out.write(before.encode("utf-8"))
+        for xml in rows:
+          out.write(xml.encode("utf-8"))
+        out.write(b"</sheetData>")
+        out.write(after.encode("utf-8"))
+
+  return
@@ -0,0 +1,184 @@
+"""
+Shared cache of parsed tables (csv files, excel worksheets).
+
+Parsing the master csv's accounting text, or streaming the cells of an
+inventory workbook, is the slow part of reading either, and the same
+unchanged files are read again on every run. Any stage can read a file
+through this cache instead: the first read parses it as usual and keeps the
+parsed DataFrame as a '.parquet' file, and later reads of a file with the
+same contents, read the same way, load that instead.
+
+Entries are keyed by a sha256 of the file's contents, the reader, its
+options and the reader's version, so editing the file, reading it with
+other options or changing the reader simply misses the old entry. Frames
+parquet can't hold exactly (columns mixing numbers and text, as a
+worksheet's cells do) are kept as a pickle instead. The cache is kept under
+a size limit by removing the least recently used entries.
+"""
+
+
+
+import pandas as pd
+import hashlib
+import os
+
+from master import master_list as ml
+
+
+
+CACHE_DIR = "master\\cache\\tables\\"
+
+# the cache is trimmed back to this many bytes after every new entry
+MAX_BYTES = 256 * 1024 * 1024
+
+CACHE_FORMATS = [".parquet", ".pkl"]
+
+
+
+def cache_key(digest, reader_name, options, version):
+  """
+  The cache key of a file read one way: a sha256 over the file's content
+  hash, the reader's name and version, and its options (sorted by name).
+  """
+  key = hashlib.sha256()
+  parts = [digest, reader_name, str(version)]
+  parts += [f"{name}={options[name]!r}" for name in sorted(options)]
+  for part in parts:
+    key.update(part.encode("utf-8"))
+    key.update(b"\0")
+
+  return key.hexdigest()
+
+
+
+def parquet_safe(frame):
+  # parquet would change a column of mixed values (or of ints and NaN) into
+  # another type, only plain text object columns come back the same
+  return all(
+    pd.api.types.infer_dtype(frame[col], skipna = True) in ("string", "empty")
+    for col in frame.columns[frame.dtypes == object])
+
+
+
+class TableCache:
+  """
+  Keeps parsed tables on disk, one file per key, and counts how many reads
+  were served from the cache (hits) and parsed (misses).
+  """
+
+  def __init__(self, cache_dir = CACHE_DIR, max_bytes = MAX_BYTES):
+    self.cache_dir = cache_dir
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+
+
+  def entry_path(self, key):
+    # the file an entry is kept in, if there is one
+    for ext in CACHE_FORMATS:
+      path = os.path.join(self.cache_dir, f"{key}{ext}")
+      if os.path.exists(path):
+        return path
+    return None
+
+
+  def load(self, path, reader, options = None, version = 1, digest = None):
+    """
+    Reads a file through the cache.
+
+    :param path: Path of the file to read.
+    :param reader: A function reader(path, **options) returning a DataFrame.
+    :param options: The reader's keyword options, part of the key.
+    :param version: The reader's version, bump it when its output changes.
+    :param digest: The file's content hash, if already known.
+    :return: The DataFrame reader returns (or returned) for this file.
+    """
+    options = options or {}
+    digest = digest or ml.file_digest(path)
+    key = cache_key(digest, reader.__qualname__, options, version)
+
+    cached = self.entry_path(key)
+    if cached is not None:
+      try:
+        frame = pd.read_parquet(cached) if cached.endswith(".parquet") \
+          else pd.read_pickle(cached)
+        # a read counts as a use, for evicting the least recently used
+        os.utime(cached)
+        self.hits += 1
+        return frame
+      except Exception as e:
+        print(f"Ignoring unreadable table cache {cached}: {e}")
+
+    frame = reader(path, **options)
+    self.misses += 1
+    self.store(key, frame)
+
+    return frame
+
+
+  def prime(self, path, reader, frame, options = None, version = 1):
+    # stores frame as what reader would return for the file now at path
+    options = options or {}
+    key = cache_key(ml.file_digest(path), reader.__qualname__, options, version)
+    self.store(key, frame)
+    return
+
+
+  def store(self, key, frame):
+    os.makedirs(self.cache_dir, exist_ok = True)
+
+    try:
+      if not parquet_safe(frame):
+        raise TypeError("columns of mixed types")
+      ml.atomic_write(
+        os.path.join(self.cache_dir, f"{key}.parquet"),
+        lambda temp: frame.to_parquet(temp, index = False))
+    except Exception:
+      # no pyarrow, or a frame parquet can't hold exactly
+      ml.atomic_write(os.path.join(self.cache_dir, f"{key}.pkl"), frame.to_pickle)
+
+    evict(self.cache_dir, self.max_bytes)
+
+    return
+
+
+
+def evict(cache_dir, max_bytes, formats = CACHE_FORMATS):
+  """
+  Removes a cache's least recently used entries (the files last modified 
+  longest ago, a read touches its entry) until it is within max_bytes.
+
+  :param cache_dir: The cache's directory.
+  :param max_bytes: The cache's size limit.
+  :param formats: Extensions of the cache's entries, other files are left.
+  """
+  entries = []
+  for name in os.listdir(cache_dir):
+    path = os.path.join(cache_dir, name)
+    if os.path.splitext(name)[1] in formats and os.path.isfile(path):
+      stat = os.stat(path)
+      entries.append((stat.st_mtime, stat.st_size, path))
+
+  total = sum(size for _, size, _ in entries)
+  # oldest first, never the entry just written
+  for _, size, path in sorted(entries)[:-1]:
+    if total <= max_bytes:
+      break
+    try:
+      os.remove(path)
+      total -= size
+    except OSError:
+      pass
+
+  return
+
+
+
+def read_csv(path, cache = None, **options):
+  """
+  pd.read_csv(path, **options) through the table cache.
+
+  :param cache: The TableCache to use (default: one on CACHE_DIR).
+  """
+  cache = cache or TableCache(CACHE_DIR)
+  return cache.load(path, pd.read_csv, options)
@@ -0,0 +1,163 @@
+"""
+Unit normalization and pack size conversion for the master inventory list.
+
+Units are typed into the master list and the old inventories in several
+ways ("cs", "CS", "case", "lbs", "ea", ...), and a case's contents are only
+described as text: PACK packs of PER_PACK each ("6" x "32 OZ", "4" x
+"100 CT", "1" x "5 LB"). This module works on whole columns at once to
+
+  - map every spelling of a unit onto CASE, LB, EACH or HALF (half a case)
+  - split PER_PACK into a number and a canonical unit of measure
+  - work out how many eaches and how many pounds one UNIT holds
+  - derive the price per each and the price per pound from PRICE_CENTS
+
+master_list applies it when the master list is loaded, so every stage reads
+the canonical units and derived prices from the typed master frame.
+"""
+
+
+
+import pandas as pd
+import numpy as np
+
+
+
+# every spelling of a unit seen in the sheets, lower case
+UNIT_ALIASES = {
+  "cs": "CASE", "case": "CASE", "cases": "CASE",
+  "lb": "LB", "lbs": "LB", "pound": "LB", "pounds": "LB",
+  "ea": "EACH", "each": "EACH",
+  "half": "HALF",
+}
+
+# fraction of a case each unit is, for units that hold packs
+CASE_FRACTIONS = {"CASE": 1.0, "HALF": 0.5}
+
+# units of measure a PER_PACK can be given in, onto their canonical name
+MEASURE_ALIASES = {
+  "LB": "LB", "LBS": "LB", "#": "LB",
+  "OZ": "OZ",
+  "KG": "KG",
+  "G": "G",
+  "CT": "CT", "PC": "CT", "EA": "CT",
+  "DZ": "DZ",
+  "GAL": "GAL",
+  "QT": "QT",
+  "LTR": "L", "L": "L",
+  "ML": "ML",
+}
+
+# pounds in one of each weight measure
+POUNDS_PER = {"LB": 1.0, "OZ": 1 / 16, "KG": 2.20462, "G": 1 / 453.592}
+
+# eaches in one of each count measure
+EACHES_PER = {"CT": 1.0, "DZ": 12.0}
+
+# columns added to the master list, see unit_conversions
+DERIVED_COLUMNS = [
+  "PER_PACK_QTY", "PER_PACK_UOM", "EACH_PER_UNIT", "LB_PER_UNIT",
+  "PRICE_PER_EACH_CENTS", "PRICE_PER_LB_CENTS"
+]
+
+DERIVED_DTYPES = {
+  "PER_PACK_QTY": "Float64",
+  "PER_PACK_UOM": "category",
+  "EACH_PER_UNIT": "Float64",
+  "LB_PER_UNIT": "Float64",
+  "PRICE_PER_EACH_CENTS": "Float64",
+  "PRICE_PER_LB_CENTS": "Float64",
+}
+
+
+
+def normalize_units(units):
+  """
+  Maps every spelling of a unit onto its canonical name.
+
+  :param units: A pandas Series of units as typed ("cs", "LBS", "Each", ...).
+  :return: A Series of CASE, LB, EACH, HALF, or the stripped original value
+           for anything that isn't a known unit (missing stays missing).
+  """
+  text = units.astype("string").str.strip()
+  canonical = text.str.lower().map(UNIT_ALIASES)
+
+  return canonical.fillna(text).astype(object).where(units.notna(), np.nan)
+
+
+
+def parse_per_pack(per_pack):
+  """
+  Splits PER_PACK text like "32 OZ", "2.5 LB", "100 CT" or "5#" into a
+  quantity and a canonical unit of measure. Sizes that aren't a quantity
+  and unit ("#10" cans, "TRAYS", ...) are left missing.
+
+  :param per_pack: A pandas Series of PER_PACK text.
+  :return: A DataFrame with PER_PACK_QTY (float) and PER_PACK_UOM.
+  """
+  parts = per_pack.astype("string").str.upper().str.extract(
+    r"^\s*(?P<qty>\d*\.?\d+)\s*(?P<uom>[A-Z#]+)\s*$")
+
+  uom = parts["uom"].map(MEASURE_ALIASES)
+  qty = pd.to_numeric(parts["qty"], errors = "coerce").where(uom.notna())
+
+  return pd.DataFrame({
+    "PER_PACK_QTY": qty.astype("Float64"),
+    "PER_PACK_UOM": uom.astype("category"),
+  }, index = per_pack.index)
+
+
+
+def unit_conversions(units, packs, per_pack, price_cents):
+  """
+  Works out the contents of one UNIT of every item, and its price per each
+  and per pound.
+
+    - a CASE (or HALF) holds PACK packs (half as many for HALF), each being
+      one each, or PER_PACK eaches when PER_PACK is a count ("100 CT"), and
+      weighing PER_PACK when it is a weight
+    - an EACH is one each, weighing PER_PACK when that is a weight
+    - a LB is one pound
+
+  Anything that can't be worked out from the sheet is left missing.
+
+  :param units: Canonical units, see normalize_units.
+  :param packs: The PACK column (packs per case).
+  :param per_pack: The PER_PACK column.
+  :param price_cents: The PRICE_CENTS column (price of one UNIT).
+  :return: A DataFrame with DERIVED_COLUMNS.
+  """
+  sizes = parse_per_pack(per_pack)
+  qty = sizes["PER_PACK_QTY"].astype("float64")
+  uom = sizes["PER_PACK_UOM"].astype(object)
+  units = units.astype(object)
+
+  eaches_per_pack = (qty * uom.map(EACHES_PER)).fillna(1.0)
+  pounds_per_pack = qty * uom.map(POUNDS_PER)
+
+  case_packs = pd.to_numeric(packs, errors = "coerce") * units.map(CASE_FRACTIONS)
+
+  each_per_unit = pd.Series(np.nan, index = units.index)
+  each_per_unit = each_per_unit.mask(units.eq("EACH"), 1.0)
+  each_per_unit = each_per_unit.fillna(case_packs * eaches_per_pack)
+
+  lb_per_unit = pd.Series(np.nan, index = units.index)
+  lb_per_unit = lb_per_unit.mask(units.eq("LB"), 1.0)
+  lb_per_unit = lb_per_unit.mask(units.eq("EACH"), pounds_per_pack)
+  lb_per_unit = lb_per_unit.fillna(case_packs * pounds_per_pack)
+
+  # nothing sensible to divide by
+  each_per_unit = each_per_unit.where(each_per_unit > 0)
+  lb_per_unit = lb_per_unit.where(lb_per_unit > 0)
+
+  price = price_cents.astype("Float64").astype("float64")
+
+  derived = pd.DataFrame({
+    "PER_PACK_QTY": sizes["PER_PACK_QTY"],
+    "PER_PACK_UOM": sizes["PER_PACK_UOM"],
+    "EACH_PER_UNIT": each_per_unit,
+    "LB_PER_UNIT": lb_per_unit,
+    "PRICE_PER_EACH_CENTS": (price / each_per_unit).round(2),
+    "PRICE_PER_LB_CENTS": (price / lb_per_unit).round(2),
+  }, index = units.index)
+
+  return derived.astype(DERIVED_DTYPES)
@@ -28,6 +28,10 @@ import os
 import shutil
 import datetime
 
+from master import code_index as ci
+from master import master_list as ml
+from master import table_cache as tc
+
 
 
 
@@ -92,12 +96,100 @@ def move_and_archive_document(filename, origin_dir, destination_dir, remove = Fa
 
 
 
-def main():
+def apply_pricing(master, new_pricing, code_index = None):
+  """
+  Applies the prices read from invoices to the typed master list.
+
+  Known vendor codes get the invoice price and date if the invoice is newer
+  than the master's LAST_UPDATE, and always get the invoice's ACCOUNT. An 
+  unknown code one digit away from a single known code with a similar price 
+  is taken as a misreading of that code (see code_index). Other new vendor 
+  codes are added and flagged "Needs Review".
+
+  :param master: The typed master list, see master_list.load_master.
+  :param new_pricing: A DataFrame with VENDOR_CODE, PRICE, LAST_UPDATE and
+                      ACCOUNT columns (others are ignored), as returned by
+                      reading_sysco_invoice.read_invoices.
+  :param code_index: The master's CodeIndex, built from master if not given 
+                     (pass the same one to apply several invoices).
+  :return: The updated typed master list.
+  """
+  if code_index is None:
+    code_index = ci.CodeIndex.from_master(master)
+
+  new_pricing = new_pricing[["VENDOR_CODE", "PRICE", "LAST_UPDATE", "ACCOUNT"]].copy()
+  new_pricing["VENDOR_CODE"] = new_pricing["VENDOR_CODE"].astype(int)
+  new_pricing["LAST_UPDATE"] = pd.to_datetime(new_pricing["LAST_UPDATE"], errors="coerce")
+  # the typed master holds prices as integer cents
+  new_pricing["PRICE_CENTS"] = ml.parse_price_cents(new_pricing.pop("PRICE"))
+
+  # accounts not seen before need to be valid categories before assignment
+  new_accounts = set(new_pricing["ACCOUNT"].dropna()) \
+    - set(master["ACCOUNT"].cat.categories)
+  master["ACCOUNT"] = master["ACCOUNT"].cat.add_categories(sorted(new_accounts))
+
+  # Loop through each row (new item)
+  for _, item in new_pricing.iterrows():
+    vendor_code = item["VENDOR_CODE"]
+
+    if vendor_code not in master["VENDOR_CODE"].values:
+      # most likely a known code with a digit misread
+      known_code = code_index.snap(vendor_code, item["PRICE_CENTS"])
+      if known_code is not None:
+        print(f"Reading vendor code {vendor_code} as {known_code}, one digit away at a similar price")
+        vendor_code = known_code
+
+    if vendor_code in master["VENDOR_CODE"].values:
+      # Get index of master row
+      idx = master.index[master["VENDOR_CODE"] == vendor_code][0]
+      new_date = item["LAST_UPDATE"]
+      old_date = master.loc[idx, "LAST_UPDATE"]
+
+      # Compare dates
+      if new_date > old_date:
+        # update
+        master.loc[idx, "PRICE_CENTS"] = item["PRICE_CENTS"]
+        master.loc[idx, "LAST_UPDATE"] = new_date
+      
+      master.loc[idx, "ACCOUNT"] = item["ACCOUNT"]
+
+    else:
+      # New item → add to master + flag
+      item_dict = item.to_dict()
+      item_dict["FLAG"] = "Needs Review"
+      master = pd.concat([master, pd.DataFrame([item_dict])], ignore_index=True)
+
+  # appending new items loosens the dtypes, put them back on the schema
+  return ml.to_master_schema(master)
+
+
+
+def archive_master():
+  # copy the current master list into master\\archive before it is replaced
+  if not os.path.exists("master\\archive\\"):
+    # Create destination and any necessary parent directories
+    os.makedirs("master\\archive\\", exist_ok=True)
+    print(f"Created destination directory: {"master\\archive\\"}")
+
+  # move master list from master file to the archive
+  move_and_archive_document(
+    "master_inventory_list.csv",
+    "deliverables\\",
+    "master\\archive\\")
+
+  return
 
-  # Read in master list from deliverables
-  master = pd.read_csv("deliverables\\master_inventory_list.csv", dtype={'VENDOR_CODE': int})
-  # make sure LAST_UPDATE is datetime
-  master["LAST_UPDATE"] = pd.to_datetime(master["LAST_UPDATE"])  
+
+
+def update_master():
+
+  # Read in master list from deliverables as a typed frame
+  # (integer vendor codes, prices in cents, LAST_UPDATE as datetime)
+  master = ml.load_master(ml.MASTER_PATH)
+  # version of the master we started from, checked again before saving
+  loaded_version = master.attrs["source_sha256"]
+  # the codes known before any invoice, kept for all of them
+  code_index = ci.CodeIndex.from_master(master)
 
   # --- Read in all new input files ---
   input_folder = "master\\inputs"
@@ -105,52 +197,17 @@ def main():
   input_files = [f for f in os.listdir(input_folder) if f.endswith(".csv")]
 
   for file in input_files:
-    new_pricing = pd.read_csv(os.path.join(input_folder, file), dtype={'VENDOR_CODE': int})
-    new_pricing["LAST_UPDATE"] = pd.to_datetime(new_pricing["LAST_UPDATE"], errors="coerce")
-    new_pricing = new_pricing.drop(["Unnamed: 0","PAGE"], axis = 1)
-
-    # Loop through each row (new item)
-    for _, item in new_pricing.iterrows():
-      vendor_code = item["VENDOR_CODE"]
-
-      if vendor_code in master["VENDOR_CODE"].values:
-        # Get index of master row
-        idx = master.index[master["VENDOR_CODE"] == vendor_code][0]
-        new_date = item["LAST_UPDATE"]
-        old_date = master.loc[idx, "LAST_UPDATE"]
-
-        # Compare dates
-        if new_date > old_date:
-          # update
-          master.loc[idx, "PRICE"] = item["PRICE"]
-          master.loc[idx, "LAST_UPDATE"] = new_date
-        
-        master.loc[idx, "ACCOUNT"] = item["ACCOUNT"]
-
-      else:
-        # New item → add to master + flag
-        item_dict = item.to_dict()
-        item_dict["FLAG"] = "Needs Review"
-        master = pd.concat([master, pd.DataFrame([item_dict])], ignore_index=True)
+    new_pricing = tc.read_csv(os.path.join(input_folder, file), dtype={'VENDOR_CODE': int})
+    master = apply_pricing(master, new_pricing, code_index)
 
     # move invoice
     move_and_archive_document(file, input_folder, output_folder)
 
-  
-    # --- 2. ENSURE DESTINATION DIRECTORY EXISTS ---
-  if not os.path.exists("master\\archive\\"):
-    # Create destination and any necessary parent directories
-    os.makedirs("master\\archive\\", exist_ok=True)
-    print(f"Created destination directory: {"master\\archive\\"}")
-
-  # move master list from master file to the archive
-  move_and_archive_document(
-    "master_inventory_list.csv",
-    "deliverables\\",
-    "master\\archive\\")
+  archive_master()
 
-  # Save updated master list 
-  master.to_csv("deliverables\\master_inventory_list.csv", index=False)
+  # Save updated master list (and refresh its typed cache)
+  # refuses to overwrite the csv if it was changed by hand since we loaded it
+  ml.save_master(master, ml.MASTER_PATH, expected_version = loaded_version)
   
 
 
@@ -162,6 +219,18 @@ def main():
 
 
 
+def main():
+
+  # hold the master list's lock for the whole read / modify / write, so that
+  # overlapping runs (e.g. a scheduled ingest and a manual run) wait their
+  # turn instead of silently dropping each other's updates
+  with ml.master_lock(ml.MASTER_PATH):
+    update_master()
+
+  return
+
+
+
 
 
 if __name__ == "__main__":
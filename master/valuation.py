@@ -0,0 +1,134 @@
+"""
+Values an inventory: every line, every section and the whole inventory.
+
+The printable sheet works its dollar figures out with Excel formulas
+(EST_PRICE is PRICE times QUANTITY, a section's TOTAL: sums its EST_PRICE,
+the inventory total sums the sections), so they used to only be known once
+someone opened the file in Excel. This module works the same figures out
+from the prices and counts directly, on whole columns at once, so they can
+be written into the sheet and reported on from a counted sheet without
+Excel.
+
+Figures follow the sheet's formulas: a line without a count (or without a
+usable price) is worth 0.
+"""
+
+
+
+import pandas as pd
+import json
+
+from dataclasses import dataclass
+
+from master import master_list as ml
+from master.master_list import atomic_write
+
+
+
+VALUATIONS_DIR = "deliverables\\valuations\\"
+
+
+
+@dataclass
+class Valuation:
+  """
+  The value of an inventory.
+
+  lines has one row per item (SECTION, VENDOR_CODE, ITEM_DESC, PRICE_CENTS,
+  QUANTITY, VALUE_CENTS), sections one row per section in sheet order
+  (SECTION, ITEMS, COUNTED, VALUE_CENTS) and total_cents is the value of
+  the whole inventory. Values are in (fractional) cents.
+  """
+  lines: pd.DataFrame
+  sections: pd.DataFrame
+  total_cents: float
+
+
+  def to_dict(self):
+    # dollars, rounded to the cent, ready for json
+    def dollars(cents):
+      return round(float(cents) / 100, 2)
+
+    return {
+      "TOTAL": dollars(self.total_cents),
+      "ITEMS": int(self.sections["ITEMS"].sum()),
+      "COUNTED": int(self.sections["COUNTED"].sum()),
+      "SECTIONS": [
+        {
+          "SECTION": row.SECTION,
+          "ITEMS": int(row.ITEMS),
+          "COUNTED": int(row.COUNTED),
+          "TOTAL": dollars(row.VALUE_CENTS),
+        }
+        for row in self.sections.itertuples(index = False)],
+    }
+
+
+
+def line_values(prices, quantities):
+  """
+  The value of every line, its price times its count.
+
+  :param prices: A Series of prices, as numbers or as the master csv's
+                 accounting text (see master_list.parse_price_dollars).
+  :param quantities: A Series of counts (anything not a number is no count).
+  :return: A float Series of values in cents, 0 where there is no price or
+           no count. Prices are not rounded to the cent first, like Excel.
+  """
+  dollars = ml.parse_price_dollars(prices)
+  counts = pd.to_numeric(quantities, errors = "coerce").astype("float64")
+
+  return (dollars * counts * 100).fillna(0)
+
+
+
+def value_items(items, sections):
+  """
+  Values the items of an inventory.
+
+  :param items: A DataFrame with SECTION, PRICE and QUANTITY columns (and
+                optionally VENDOR_CODE and ITEM_DESC), one row per item.
+  :param sections: The section names, in sheet order.
+  :return: The Valuation of the items.
+  """
+  quantities = items["QUANTITY"] if "QUANTITY" in items else \
+    pd.Series(pd.NA, index = items.index)
+
+  lines = pd.DataFrame({
+    "SECTION": items["SECTION"],
+    "VENDOR_CODE": items.get("VENDOR_CODE"),
+    "ITEM_DESC": items.get("ITEM_DESC"),
+    "PRICE_CENTS": ml.parse_price_cents(items["PRICE"]),
+    "QUANTITY": pd.to_numeric(quantities, errors = "coerce"),
+    "VALUE_CENTS": line_values(items["PRICE"], quantities),
+  }).reset_index(drop = True)
+
+  grouped = lines.groupby("SECTION", sort = False)
+  totals = pd.DataFrame({
+    "ITEMS": grouped.size(),
+    "COUNTED": grouped["QUANTITY"].count(),
+    "VALUE_CENTS": grouped["VALUE_CENTS"].sum(),
+  }).reindex(sections).fillna(0)
+  totals = totals.astype({"ITEMS": int, "COUNTED": int})
+  totals = totals.rename_axis("SECTION").reset_index()
+
+  return Valuation(lines, totals, float(totals["VALUE_CENTS"].sum()))
+
+
+
+def value_schema(schema):
+  # the value of a counted inventory, from its layout (prices and counts)
+  items = schema.items[schema.items["SECTION"].isin(schema.sections)]
+  return value_items(items, schema.sections)
+
+
+
+def write_totals(valuation, path):
+  # saves the inventory's totals as json for automated reporting
+  def write(temp_path):
+    with open(temp_path, "w", encoding = "utf-8") as file:
+      json.dump(valuation.to_dict(), file, indent = 2, ensure_ascii = False)
+
+  atomic_write(path, write)
+
+  return
@@ -0,0 +1,136 @@
+"""
+Streaming, read-only parser for the values of an excel worksheet.
+
+pd.read_excel loads every cell and style of a workbook through openpyxl's
+full object model, while reading_inventory only ever needs the values of the
+first 11 columns of the first sheet. This module streams just those values,
+using python-calamine when it is installed and openpyxl's read_only /
+data_only mode otherwise, and caches the parsed result in the shared table
+cache (see table_cache.py) keyed by the workbook's content hash, so
+re-reading an unchanged inventory (which happens on every
+generate_inventory_sheet rerun) skips parsing the workbook at all.
+"""
+
+
+
+import pandas as pd
+import numpy as np
+import openpyxl as pyxl
+
+from master import table_cache as tc
+
+try:
+  from python_calamine import CalamineWorkbook
+except ImportError:
+  CalamineWorkbook = None
+
+
+
+CACHE_DIR = tc.CACHE_DIR
+
+# bump when the parsed output changes, so older cache entries are ignored
+READER_VERSION = 1
+
+
+
+def typed_value(value):
+  """
+  Normalizes a cell value the same way across engines: empty cells become
+  None and whole number floats become ints (4184453.0 -> 4184453), which is
+  also what pd.read_excel does before inferring column types.
+  """
+  if value == "":
+    return None
+  if isinstance(value, float) and value.is_integer():
+    return int(value)
+  return value
+
+
+
+def iter_sheet_rows(path, n_cols, sheet_index = 0):
+  """
+  Streams the rows of a worksheet as tuples of cell values, never building
+  cell or style objects.
+
+  :param path: Path to the '.xlsx' workbook.
+  :param n_cols: Number of leading columns to keep, rows are padded or
+                 truncated to exactly this many values.
+  :param sheet_index: Zero based index of the worksheet to read.
+  :return: A generator of tuples of typed cell values (see typed_value).
+  """
+  padding = (None,) * n_cols
+
+  if CalamineWorkbook is not None:
+    workbook = CalamineWorkbook.from_path(path)
+    sheet = workbook.get_sheet_by_index(sheet_index)
+    for row in sheet.iter_rows():
+      yield tuple(typed_value(v) for v in (tuple(row[:n_cols]) + padding)[:n_cols])
+    return
+
+  workbook = pyxl.load_workbook(path, read_only = True, data_only = True)
+  try:
+    sheet = workbook.worksheets[sheet_index]
+    # stored dimensions are not always right, read every row actually there
+    sheet.reset_dimensions()
+    for row in sheet.iter_rows(max_col = n_cols, values_only = True):
+      yield tuple(typed_value(v) for v in (tuple(row) + padding)[:n_cols])
+  finally:
+    workbook.close()
+
+  return
+
+
+
+def rows_to_frame(rows):
+  # first row is the header, like pd.read_excel(header = 0)
+  if not rows:
+    return pd.DataFrame()
+
+  # drop empty columns on the right and empty rows at the bottom
+  width = max(
+    (max(i for i, v in enumerate(row) if v is not None) + 1
+    for row in rows if any(v is not None for v in row)), default = 0)
+  rows = [row[:width] for row in rows]
+  while len(rows) > 1 and all(v is None for v in rows[-1]):
+    rows.pop()
+
+  header = [
+    f"Unnamed: {i}" if name is None else name for i, name in enumerate(rows[0])]
+  frame = pd.DataFrame(rows[1:], columns = header).infer_objects()
+
+  # empty cells are NaN (not None) in mixed columns too, as with pd.read_excel
+  mixed = frame.columns[frame.dtypes == object]
+  frame[mixed] = frame[mixed].where(frame[mixed].notna(), np.nan)
+
+  return frame
+
+
+
+def read_sheet_values(
+  path, n_cols, sheet_index = 0, use_cache = True, cache_dir = CACHE_DIR):
+  """
+  Reads the values of a worksheet into a DataFrame, like
+  pd.read_excel(path, usecols = range(n_cols)), through the streaming reader
+  and the parsed result cache.
+
+  :param path: Path to the '.xlsx' workbook.
+  :param n_cols: Number of leading columns to read.
+  :param sheet_index: Zero based index of the worksheet to read.
+  :param use_cache: If False, always parse the workbook and skip the cache.
+  :param cache_dir: Directory the parsed results are cached in.
+  :return: A DataFrame of the sheet's values, using the first row as header.
+  """
+  options = {"n_cols": n_cols, "sheet_index": sheet_index}
+  if not use_cache:
+    return parse_sheet_values(path, **options)
+
+  # keyed by the workbook's content hash (see master_list.file_digest),
+  # identical workbooks share a cache entry
+  return tc.TableCache(cache_dir).load(
+    path, parse_sheet_values, options, version = READER_VERSION)
+
+
+
+def parse_sheet_values(path, n_cols, sheet_index = 0):
+  # the values of a worksheet, parsed without any cache
+  return rows_to_frame(list(iter_sheet_rows(path, n_cols, sheet_index)))
@@ -0,0 +1,203 @@
+"""
+Runs the invoice -> master -> inventory -> deliverable stages in one process.
+
+Each stage hands its result to the next one in memory: the prices read from
+the invoices as a DataFrame, the master list as a typed DataFrame and the
+layout as an InventorySchema. Nothing is written to disk just so that the
+next stage can read it back in.
+
+What the stages produce is still saved, once, as checkpoints (the invoice
+prices, the counted inventory's totals, the layout schema and its
+changeset). The checkpoints are written on a background thread, in the
+order they were made, while the later stages keep working, and finish()
+waits for all of them and reports any that failed.
+
+The updated master list is the exception: it is saved before update_master
+returns, without letting go of the master's lock it was loaded under, so a
+run that would overwrite someone else's update stops there, before any
+deliverable is built from a master list that could not be saved.
+
+The invoice prices are saved into master\\inputs, like any prices waiting to
+be applied, and only moved to processed_inputs along with them once the
+master list has been saved with them. The invoices themselves are already
+processed by then, so if the master couldn't be saved, the next run still
+finds their prices there.
+"""
+
+
+
+import os
+import datetime
+
+from concurrent.futures import ThreadPoolExecutor
+
+import sysco.reading_sysco_invoice as sysco_inv
+import master.deliverable_creation as create
+import master.reading_inventory as read_inv
+import master.update_pricing as update_pricing
+
+from master import code_index as ci
+from master import master_list as ml
+from master import render_cache as rc
+from master import schema_store as ss
+from master import table_cache as tc
+from master.master_list import atomic_write
+
+
+
+PRICING_INPUTS = "master\\inputs"
+PROCESSED_PRICING = "master\\inputs\\processed_inputs\\"
+
+
+
+class InventoryPipeline:
+  """
+  Holds what each stage hands to the next: the new invoice prices, the
+  typed master list and the inventory layout schema.
+  """
+
+  def __init__(self):
+    self.new_pricing = None
+    # the file the new prices are saved to in PRICING_INPUTS, and its write
+    self.pricing_file = None
+    self.pricing_checkpoint = None
+    self.master = None
+    self.schema = None
+
+    # a single thread, so checkpoints are written in the order they're made
+    self.checkpoints = ThreadPoolExecutor(max_workers = 1)
+    self.pending = []
+
+
+  def checkpoint(self, name, write, *args):
+    # save a stage's result in the background, returns the write's future
+    future = self.checkpoints.submit(write, *args)
+    self.pending.append((name, future))
+    return future
+
+
+  def read_invoices(self, input_folder = "inputs\\invoices"):
+    # STEP 1 / 2: prices, dates and accounts from any new invoices
+    self.new_pricing = sysco_inv.read_invoices(input_folder)
+
+    # waiting to be applied until the master is saved, see the module's 
+    # docstring
+    if self.new_pricing is not None:
+      timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+      self.pricing_file = f"sysco_info_{timestamp}.csv"
+      self.pricing_checkpoint = self.checkpoint(
+        "invoice prices", write_pricing, self.new_pricing,
+        os.path.join(PRICING_INPUTS, self.pricing_file))
+
+    return self.new_pricing
+
+
+  def update_master(self):
+    # STEP 3: apply the new prices (and any left over in master\inputs)
+    # the lock is held until the updated master is saved, see the module's 
+    # docstring
+    with ml.master_lock(ml.MASTER_PATH):
+      master = ml.load_master(ml.MASTER_PATH)
+      loaded_version = master.attrs["source_sha256"]
+      # the codes known before any invoice, kept for all of them
+      code_index = ci.CodeIndex.from_master(master)
+
+      # this run's prices are applied from memory, even once written there
+      leftover_files = [
+        f for f in os.listdir(PRICING_INPUTS)
+        if f.endswith(".csv") and f != self.pricing_file] \
+        if os.path.isdir(PRICING_INPUTS) else []
+      for file in leftover_files:
+        leftover = tc.read_csv(os.path.join(PRICING_INPUTS, file), dtype={'VENDOR_CODE': int})
+        master = update_pricing.apply_pricing(master, leftover, code_index)
+
+      if self.new_pricing is not None:
+        master = update_pricing.apply_pricing(master, self.new_pricing, code_index)
+
+      if leftover_files or self.new_pricing is not None:
+        applied_files = list(leftover_files)
+        # this run's prices are moved along with the leftovers, once written
+        if self.pricing_checkpoint is not None \
+          and self.pricing_checkpoint.exception() is None:
+          applied_files.append(self.pricing_file)
+        master = save_master(master, loaded_version, applied_files)
+
+    self.master = master
+
+    return self.master
+
+
+  def read_inventory(self, input_folder = read_inv.INVENTORY_FOLDER):
+    # STEP 4: the layout of a newly counted inventory, or the current one
+    new_inventory = read_inv.read_new_inventory(input_folder)
+
+    if new_inventory is None:
+      self.schema = ss.load_current_schema(ss.SCHEMA_PATH)
+      return self.schema
+
+    layout, filename = new_inventory
+    self.schema = layout.schema
+    self.checkpoint("inventory totals", read_inv.save_totals, layout)
+    self.checkpoint(
+      "inventory schema", save_schema, self.schema, filename, input_folder)
+
+    return self.schema
+
+
+  def create_deliverables(self, by_section = False, by_account = False, max_workers = None):
+    # STEP 5: the printable sheet, from this run's layout and master list
+    return create.create_deliverables(
+      self.schema, self.master, by_section, by_account, max_workers,
+      rc.SectionCache(rc.CACHE_DIR))
+
+
+  def finish(self):
+    """
+    Waits for every checkpoint to be written.
+
+    :raises RuntimeError: If any checkpoint could not be written.
+    """
+    self.checkpoints.shutdown(wait = True)
+
+    failed = []
+    for name, future in self.pending:
+      error = future.exception()
+      if error is not None:
+        print(f"Could not save the {name}: {error}")
+        failed.append(name)
+    self.pending = []
+
+    if failed:
+      raise RuntimeError(f"Checkpoints not saved: {', '.join(failed)}")
+
+    return
+
+
+
+def write_pricing(new_pricing, path):
+  # keep what was read from the invoices, already applied to the master
+  os.makedirs(os.path.dirname(path), exist_ok = True)
+  atomic_write(path, lambda temp: new_pricing.to_csv(temp))
+  return
+
+
+
+def save_master(master, loaded_version, applied_files):
+  # called holding the master's lock, see InventoryPipeline.update_master
+  update_pricing.archive_master()
+  # refuses to overwrite the csv if it was changed by hand since we loaded it
+  master = ml.save_master(master, ml.MASTER_PATH, expected_version = loaded_version)
+
+  # the inputs in PRICING_INPUTS are in the saved master now
+  for file in applied_files:
+    update_pricing.move_and_archive_document(
+      file, PRICING_INPUTS, PROCESSED_PRICING, remove = True)
+
+  return master
+
+
+
+def save_schema(schema, filename, input_folder):
+  read_inv.save_schema(schema)
+  read_inv.archive_inventory(filename, input_folder)
+  return
@@ -31,31 +31,35 @@ Then generate new deliverable inventory sheet
 
 # check if new invoice is in inputs/new_invoices
 
-import sysco.reading_sysco_invoice as sysco_inv
-import master.deliverable_creation as create
-import master.reading_inventory as read_inv
-import master.update_pricing as update_pricing
+from pipeline import InventoryPipeline
 
 
 
 def main():
 
+  # every stage hands its result to the next in memory, and saves it in the
+  # background as it goes
+  pipeline = InventoryPipeline()
 
   # run analysis of invoice
   print("Analyzing any sysco invoices")
-  sysco_inv.main()
+  pipeline.read_invoices()
 
   # update master pricing doc using info gathered from invoice analysis
   print("Updating the master pricing list with info from invoice")
-  update_pricing.main()
+  pipeline.update_master()
 
   # read old inventory to get a schema of how it's laid out
   print("Reading in old inventory information as structure for new sheet")
-  read_inv.main()
+  pipeline.read_inventory()
 
   # create new inventory using schema of old inventory updated with newer pricing
   print("Creating new inventory sheet")
-  create.main()
+  for path in pipeline.create_deliverables():
+    print(f"File saved successfully in {path}")
+
+  # wait for the stage results to be saved
+  pipeline.finish()
 
 
   return
@@ -8,6 +8,12 @@ It uses image processing (OpenCV), visual hashing, and Optical Character Recogni
 (Tesseract) to isolate key data points (Item Codes, Unit Prices, Invoice Date, Account). 
 The extracted data is then sanitized for consistency and stored in structured CSV files.
 
+Documents are read in two phases across a pool of worker processes: a cheap 
+scan of every document for its page count and invoice pages, then the OCR of 
+every invoice page from one queue over all documents, largest document first. 
+An invoice's date and account are only read once, from the first of its pages 
+to come in; its other pages are recognized by their invoice number.
+
 The pipeline ensures data quality through multiple checks:
 1. Invoice Page Verification: Uses perceptual hashing to identify actual invoice sheets.
 2. Temporal Validation: Sanitizes dates, ensuring chronological order and consistency.
@@ -37,15 +43,22 @@ Execution:
 ## SETUP
 import imagehash
 import fitz
+import numpy as np
 from PIL import Image
 import pytesseract as tess
 import pandas as pd
-import io
 import os
 import sysco_source as ss
 import time
 import warnings
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import repeat
+from sysco_source import digits
+from sysco_source import headers
+from sysco_source import layout
+from sysco_source import mosaic
+
 
 
 warnings.filterwarnings(
@@ -60,10 +73,296 @@ warnings.filterwarnings(
 
 
 
-def main():
+TESSERACT_CMD = r'C:\\Users\\fairbou2\\AppData\\Local\\Programs\\Tesseract-OCR\\tesseract.exe'
+REFERENCE_PATH = "sysco/references/sysco.png"
+
+# invoice headers read together, in one Tesseract call per field (see 
+# read_headers)
+HEADER_BATCH = 16
+
+
+
+# this process's digit recognizer for the numeric columns, see setup_ocr
+digit_recognizer = None
+# this process's layouts of the invoice templates it has seen, see setup_ocr
+layout_cache = None
+
+
+
+def setup_ocr(use_digits = True):
+  """
+  Points pytesseract at the Tesseract executable, loads the digit 
+  recognizer (see sysco_source.digits) if its templates have been trained, 
+  and starts an empty layout cache (see sysco_source.layout). Run in every 
+  worker process as well, since a spawned worker doesn't inherit any of 
+  them.
+
+  :param use_digits: If False, the numeric columns are read by Tesseract.
+  """
+  global digit_recognizer, layout_cache
+
+  tess.pytesseract.tesseract_cmd = TESSERACT_CMD
+  # every worker runs its own Tesseract, so each one gets a single thread 
+  # rather than all of them fighting over every core
+  os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+  digit_recognizer = digits.DigitRecognizer.load() if use_digits else None
+  layout_cache = layout.LayoutCache()
+
+  return
+
+
+
+def scan_document(file_path, ref_hash):
+  """
+  Phase 1: the cheap pass over a document. Counts its pages and finds which 
+  of them are invoices, hashing a small decode of each page (see 
+  sysco_source.page_thumbnail) instead of the full scan.
+
+  :param file_path: Path of the '.pdf' document.
+  :param ref_hash: The average hash of the reference invoice.
+  :return: (number of pages, zero-based numbers of the invoice pages)
+  """
+  with fitz.open(file_path) as doc:
+    invoice_pages = [
+      page_num for page_num in range(len(doc))
+      if ss.is_invoice(ss.page_thumbnail(doc, page_num), ref_hash)]
+    return len(doc), invoice_pages
+
 
-  # Set Tesseract path (Should ideally be in main or config file)
-  tess.pytesseract.tesseract_cmd = r'C:\\Users\\fairbou2\\AppData\\Local\\Programs\\Tesseract-OCR\\tesseract.exe'
+
+def schedule_pages(invoice_pages):
+  """
+  The global queue of every invoice page of every document, the documents 
+  with the most invoice pages first. The largest document is spread over all 
+  the workers from the start rather than being left to finish alone at the 
+  end of the batch, and the small ones fill in the tail.
+
+  :param invoice_pages: A dict of document name -> its invoice page numbers.
+  :return: A list of (document name, page number).
+  """
+  order = sorted(invoice_pages, key = lambda file: len(invoice_pages[file]), reverse = True)
+  return [(file, page_num) for file in order for page_num in invoice_pages[file]]
+
+
+
+def crop_regions(invoice):
+  """
+  Crops the regions read from a polished invoice page. The table's columns 
+  are cut straight from the page's layout, found from its ruled lines (see 
+  sysco_source.layout); only a page without one has them searched for 
+  around their proportional bounds by crop_image.
+
+  :param invoice: The polished page, see sysco_source.polish_image.
+  :return: A dict of the icup (item codes and unit prices), up (unit 
+           prices), date, account and invoice (number) crops.
+  """
+  page_layout = layout_cache.layout(invoice) if layout_cache is not None else None
+  if page_layout is not None:
+    boxes = page_layout["regions"]
+    region = lambda name: invoice[boxes[name][0]:boxes[name][1], boxes[name][2]:boxes[name][3]]
+    # the header fields are still found within their (moved) bounds
+    area = lambda name: [np.array(boxes[name][:2]), np.array(boxes[name][2:])]
+
+    return {
+      "icup": region("icup"),
+      "up": region("up"),
+      "date": ss.crop_image(invoice, area("date"), "LAST_UPDATE"),
+      "account": ss.crop_image(invoice, area("account"), "account"),
+      "invoice": ss.crop_image(invoice, area("invoice"), "invoice"),
+    }
+
+  height, width = invoice.shape
+
+  # calculating general boundaries for cropping
+  icup_area = [ss.table_bounds * height, ss.icup_bounds * width]
+  up_area = [ss.table_bounds * height, ss.up_bounds * width]
+  date_area = [ss.d_height * height, ss.d_width * width]
+  ac_area = [ss.ac_height * height, ss.ac_width * width]
+  in_area = [ss.in_height * height, ss.in_width * width]
+
+  return {
+    "icup": ss.crop_image(invoice, icup_area, "icup"),
+    "up": ss.crop_image(invoice, up_area, "up"),
+    "date": ss.crop_image(invoice, date_area, "LAST_UPDATE"),
+    "account": ss.crop_image(invoice, ac_area, "account"),
+    "invoice": ss.crop_image(invoice, in_area, "invoice"),
+  }
+
+
+
+def ocr_page(file_path, page_num):
+  """
+  Phase 2, in a worker: OCR of one invoice page. Only the raw matches are 
+  returned, sanitizing them depends on the pages before it and is done in 
+  page order once the whole document has been read (see sanitize_document).
+
+  The header (date and account) isn't read here: the page's invoice key is 
+  returned with the header's crops instead, and the header is only read 
+  (see read_headers) if no other page of the document has the same invoice.
+
+  :param file_path: Path of the '.pdf' document.
+  :param page_num: Zero-based number of the page.
+  :return: A dict with the page's icup_pairs, up_list, invoice_key (see 
+           sysco_source.headers) and header (its date and account crops).
+  """
+  with fitz.open(file_path) as doc:
+    page_img = ss.page_image(doc, page_num)
+
+  ## POLISHING UP IMAGE  
+  crops = crop_regions(ss.polish_image(page_img))
+
+  ## Both ItemCodes and UnitPrices (icup) 
+  icup_pairs = ss.extract_text(
+    crops["icup"], ss.icup_config, ss.icup_regex, digit_recognizer)
+  ## Unit Prices
+  up_list = ss.extract_text(crops["up"], ss.up_config, ss.up_regex, digit_recognizer)
+
+  return {
+    "icup_pairs": icup_pairs,
+    "up_list": up_list,
+    "invoice_key": headers.invoice_key(crops["invoice"]),
+    "header": {"date": crops["date"], "account": crops["account"]},
+  }
+
+
+
+def read_headers(pending):
+  """
+  Phase 2, in a worker: OCR of invoices' headers, each from the first of 
+  its invoice's pages to come in (see ocr_page). Every field is read from 
+  all the headers in one Tesseract call (see sysco_source.mosaic).
+
+  :param pending: The date and account crops of the pages whose headers 
+                  are read.
+  :return: A list with a dict of date_text and account_text per header.
+  """
+  ## Invoice Date
+  date_texts = mosaic.extract_texts(
+    [header["date"] for header in pending], ss.date_config, ss.date_regex)
+  ## Invoice Account
+  account_texts = mosaic.extract_texts(
+    [header["account"] for header in pending], ss.account_config, ss.account_regex)
+
+  return [
+    {"date_text": date_text, "account_text": account_text}
+    for date_text, account_text in zip(date_texts, account_texts)]
+
+
+
+def find_invoice(invoices, invoice_key):
+  """
+  The invoice of a document a page belongs to, by its invoice key.
+
+  :param invoices: The document's invoices so far, dicts with a "key".
+  :param invoice_key: The page's invoice key, see ocr_page.
+  :return: The invoice, or None if it's a new one.
+  """
+  # an invoice's pages are mostly scanned together, latest invoice first
+  for invoice in reversed(invoices):
+    if headers.same_invoice(invoice["key"], invoice_key):
+      return invoice
+  return None
+
+
+
+def sanitize_document(file, page_results):
+  """
+  Sanitizes the OCR of every invoice page of one document, in page order 
+  (a page's date is checked against the pages before it).
+
+  :param file: Name of the document.
+  :param page_results: A dict of page number -> what ocr_page returned for 
+                       it along with its invoice's header (see 
+                       read_headers), or None if the page couldn't be read.
+  :return: (pricing rows, error rows) of the document.
+  """
+  date_list = []
+  pricing_data = []
+  error_info = []
+
+  for page_num in sorted(page_results):
+    ocr = page_results[page_num]
+    if ocr is None:
+      error_info.append({"DOC": file, "PAGE": int(page_num + 1)})
+      continue
+
+    icup_pairs, up_list = ocr["icup_pairs"], ocr["up_list"]
+
+    # sanitizing pricing
+    pricing_error, new_pricing = ss.sanitize_pricing(icup_pairs, up_list)
+    # sanitizing and updating date_list
+    date_error, date_page, date_list = ss.sanitize_date(ocr["date_text"], date_list)
+    # sanitizing account
+    account_error, account_invoice = ss.sanitize_account(ocr["account_text"])
+
+    # checking for errors on this page
+    if any([pricing_error, date_error, account_error]):
+      error_print = [
+        f"--- ERROR in Document: {file} ---\n", 
+        f"Data mismatch on page {int(page_num + 1)}:\n",
+        f"\t- Pairs Detected: {len(icup_pairs)}\n",
+        f"\t- Prices Detected: {len(up_list)}\n",
+        f"\t- Invoice Date: {date_page}\n",
+        f"\t- Account: {account_invoice}\n"
+        ]
+      error_out = {
+        "DOC": file,
+        "PAGE": int(page_num + 1),
+        "PAIRS": len(icup_pairs),
+        "PRICES": len(up_list),
+        "DATE": date_page,
+        "ACCOUNT": account_invoice
+      }
+      error_info.append(error_out)
+      print("".join(error_print))
+      print("")
+
+    # add new_pricing to total 
+    for row in new_pricing:
+      pricing_data.append({
+        "VENDOR_CODE": row["VENDOR_CODE"], 
+        "PRICE": row["UNIT_PRICE"], 
+        "LAST_UPDATE": date_page, 
+        "ACCOUNT": account_invoice,
+        "PAGE": int(page_num + 1)
+      })
+
+  return pricing_data, error_info
+
+
+
+def read_invoices(
+  input_folder = "inputs\\invoices", max_workers = None, use_digits = True, 
+  header_batch = HEADER_BATCH):
+  """
+  Reads every '.pdf' invoice waiting in input_folder, moving each one into 
+  processed_invoices once it has been read.
+
+  The documents are read in two phases, across a pool of processes. First 
+  every document is scanned for its page count and which pages are invoices 
+  (see scan_document). Then only the invoice pages, from all documents at 
+  once, are OCR'd, largest document first (see schedule_pages), and each 
+  document is sanitized as soon as its last page is in. Progress and the 
+  time left are worked out from the real number of invoice pages.
+
+  The header of each invoice is read once: a page whose invoice number 
+  doesn't match that of any page of its document in so far has its header 
+  read (see read_headers), the others get that reading. Headers are read 
+  in batches of header_batch, or fewer when a document only waits on them.
+
+  :param input_folder: Folder the new invoices are in.
+  :param max_workers: Number of worker processes (default: one per CPU).
+  :param use_digits: If False, the item codes and prices are read by 
+                     Tesseract even when the digit recognizer has been 
+                     trained (see train_digit_recognizer).
+  :param header_batch: Number of invoice headers read together, 1 reads 
+                       every header on its own.
+  :return: A DataFrame with the newest VENDOR_CODE, PRICE, LAST_UPDATE, 
+           ACCOUNT and PAGE found for every vendor code, or None when there 
+           were no invoices to read.
+  """
+  setup_ocr(use_digits)
 
   # Confirm Tesseract is working
   try: 
@@ -72,143 +371,125 @@ def main():
       print(f"Tesseract Error: {tesseract_error}")
   
   # sysco reference sheet
-  ref_hash = imagehash.average_hash(Image.open(
-    "sysco/references/sysco.png"
-    ))
+  ref_hash = imagehash.average_hash(Image.open(REFERENCE_PATH))
 
   
   ## FILE OPENING
-  input_folder = "inputs\\invoices"
-  input_files = [f for f in os.listdir(input_folder) if f.endswith(".pdf")]
+  input_files = sorted(f for f in os.listdir(input_folder) if f.endswith(".pdf"))
 
   if len(input_files) < 1:
     print(f"No '.pdf' documents found in {input_folder}.")
-    return 0
+    return None
 
-  n_docs = len(input_files)
-  start_time = time.time()
+  processed_path = os.path.join(input_folder, 'processed_invoices')
+  file_paths = {file: os.path.join(input_folder, file) for file in input_files}
+  pricing_data = []
   error_info = []
 
-  for doc_num, file in enumerate(input_files):
-    # opening desired scanned file
-    file_path = os.path.join(input_folder, file)    
-    doc = fitz.open(
-      file_path
-    )
-
-    ## INITIALIZATION OF VARIABLES
-    date_list = []
-    pricing_data = []
-
-    n_pages = len(doc)
-
-    # start timer
-    print(f"Analyzing {n_pages} pages in doc {doc_num + 1}/{n_docs}, {file}")
-    
-    ## MAIN PROCESSING LOOP
-    for page_num in range(n_pages):
-      
-      ## EXTRACTING INDIVIDUAL SHEET FROM PDF FORMAT
-      img = doc[page_num].get_images(full = True)[0]
-      image_bytes = doc.extract_image(img[0])["image"]
-      img_pil = Image.open(io.BytesIO(image_bytes))
-
-
-      ## ADD ETL AND PROGRESS DISPLAY HERE
-      ss.display_time(doc_num, page_num, start_time, n_pages, n_docs)
-      
-
-      ## ANALYZE INDIVIDUAL SHEET
-      if ss.is_invoice(img_pil, ref_hash):
-
-        ## POLISHING UP IMAGE  
-        invoice = ss.polish_image(img_pil)
-        height, width = invoice.shape
-
-        # calculating general boundaries for cropping
-        icup_area = [ss.table_bounds * height, ss.icup_bounds * width]
-        up_area = [ss.table_bounds * height, ss.up_bounds * width]
-        date_area = [ss.d_height * height, ss.d_width * width]
-        ac_area = [ss.ac_height * height, ss.ac_width * width]
-
-        
-        ## Both ItemCodes and UnitPrices (icup) 
-        icup_img = ss.crop_image(invoice, icup_area, "icup")
-        icup_pairs = ss.extract_text(icup_img, ss.icup_config, ss.icup_regex)
-        ## Unit Prices
-        up_img = ss.crop_image(invoice, up_area, "up")
-        up_list = ss.extract_text(up_img, ss.up_config, ss.up_regex)
-        # sanitizing pricing
-        pricing_error, new_pricing = ss.sanitize_pricing(icup_pairs, up_list)
-
-        ## Invoice Date
-        date_img = ss.crop_image(invoice, date_area, "LAST_UPDATE")
-        date_text = ss.extract_text(date_img, ss.date_config, ss.date_regex)
-        # sanitizing and updating date_list
-        date_error, date_page, date_list = ss.sanitize_date(date_text, date_list)
-        
-        ## Invoice Account
-        account_img = ss.crop_image(invoice, ac_area, "account")
-        account_text = ss.extract_text(account_img, ss.account_config, ss.account_regex)
-        # sanitizing account
-        account_error, account_invoice = ss.sanitize_account(account_text)
-      
-
-        # checking for errors on this page
-        if any([pricing_error, date_error, account_error]):
-          error_print = [
-            f"--- ERROR in Document: {file} ---\n", 
-            f"Data mismatch on page {int(page_num + 1)}:\n",
-            f"\t- Pairs Detected: {len(icup_pairs)}\n",
-            f"\t- Prices Detected: {len(up_list)}\n",
-            f"\t- Invoice Date: {date_page}\n",
-            f"\t- Account: {account_invoice}\n"
-            ]
-          error_out = {
-            "DOC": file,
-            "PAGE": int(page_num + 1),
-            "PAIRS": len(icup_pairs),
-            "PRICES": len(up_list),
-            "DATE": date_page,
-            "ACCOUNT": account_invoice
-          }
-          error_info.append(error_out)
-          print("".join(error_print))
-          print("")
-
-        # add new_pricing to total 
-        for row in new_pricing:
-          pricing_data.append({
-            "VENDOR_CODE": row["VENDOR_CODE"], 
-            "UNIT_PRICE": row["UNIT_PRICE"], 
-            "LAST_UPDATE": date_page, 
-            "ACCOUNT": account_invoice,
-            "PAGE": int(page_num + 1)
-          })
-
-
-    ## if we have finished analyzing a document, move that document from 
-    # vendors/sysco/inputs into inputs\\processed
-    doc.close()
-    processed_path = os.path.join('inputs\\invoices','processed_invoices')
-    ss.move_analyzed_document(file, input_folder, processed_path)
-
+  with ProcessPoolExecutor(max_workers = max_workers, initializer = setup_ocr, 
+    initargs = (use_digits,)) as pool:
+
+    ## PHASE 1: page counts and invoice pages of every document
+    scans = list(pool.map(scan_document, file_paths.values(), repeat(ref_hash)))
+    invoice_pages = {file: pages for file, (_, pages) in zip(input_files, scans)}
+
+    n_pages = sum(n for n, _ in scans)
+    queue = schedule_pages(invoice_pages)
+    print(
+      f"Found {len(queue)} invoice pages among {n_pages} pages "
+      f"in {len(input_files)} documents")
+
+    # documents without any invoice pages are done already
+    for file in input_files:
+      if not invoice_pages[file]:
+        print(f"No invoice pages in {file}")
+        ss.move_analyzed_document(file, input_folder, processed_path)
+
+    ## PHASE 2: OCR of every invoice page, from the global queue, and of the 
+    ## header of every invoice, in batches, from its first page to come in
+    start_time = time.time()
+    page_futures = {
+      pool.submit(ocr_page, file_paths[file], page_num): (file, page_num)
+      for file, page_num in queue}
+    header_futures = {}
+    waiting_headers = []
+    results = {file: {} for file in input_files}
+    invoices = {file: [] for file in input_files}
+    pages_done = 0
+    n_headers = 0
+    n_batches = 0
+
+    pending = set(page_futures)
+    while pending:
+      done, pending = wait(pending, return_when = FIRST_COMPLETED)
+      for future in done:
+        if future in header_futures:
+          batch = header_futures.pop(future)
+          try:
+            batch_headers = future.result()
+          except Exception as e:
+            print(f"\nCould not read {len(batch)} invoice headers: {e}")
+            batch_headers = [{"date_text": [], "account_text": []} for _ in batch]
+          for (_, invoice), header in zip(batch, batch_headers):
+            invoice["header"] = header
+          files = sorted({file for file, _ in batch})
+
+        else:
+          file, page_num = page_futures.pop(future)
+          pages_done += 1
+          try:
+            ocr = future.result()
+          except Exception as e:
+            print(f"\nCould not read page {page_num + 1} of {file}: {e}")
+            ocr = None
+          results[file][page_num] = ocr
+
+          if ocr is not None:
+            invoice = find_invoice(invoices[file], ocr["invoice_key"])
+            if invoice is None:
+              # a new invoice, its header is read from this page
+              invoice = {"key": ocr["invoice_key"], "pages": [], "header": None}
+              invoices[file].append(invoice)
+              waiting_headers.append((file, invoice, ocr["header"]))
+              n_headers += 1
+            invoice["pages"].append(page_num)
+
+          ss.display_time(pages_done, len(queue), start_time, file)
+          files = [file]
+
+          # the waiting headers are read once there are enough of them, or 
+          # once this document's last page is in and it only waits on them
+          if waiting_headers and (len(waiting_headers) >= header_batch 
+            or len(results[file]) == len(invoice_pages[file])):
+            header_future = pool.submit(
+              read_headers, [header for _, _, header in waiting_headers])
+            header_futures[header_future] = [
+              (waiting_file, invoice) for waiting_file, invoice, _ in waiting_headers]
+            pending.add(header_future)
+            waiting_headers = []
+            n_batches += 1
+
+        # once a document's last page and headers are in, sanitize it and 
+        # move it along
+        for file in files:
+          if len(results[file]) == len(invoice_pages[file]) \
+            and all(invoice["header"] is not None for invoice in invoices[file]):
+            print("")
+            page_results = results.pop(file)
+            for invoice in invoices.pop(file):
+              for page_num in invoice["pages"]:
+                page_results[page_num].update(invoice["header"])
+            doc_pricing, doc_errors = sanitize_document(file, page_results)
+            pricing_data += doc_pricing
+            error_info += doc_errors
+            ss.move_analyzed_document(file, input_folder, processed_path)
+
+    print(
+      f"Read {n_headers} invoice headers in {n_batches} batches "
+      f"for {len(queue)} invoice pages")
 
 
   ## FINAL OUTPUT PROCESSING
-  info_directory = 'master\\inputs'
-  error_directory = 'master\\errors'
-
-
-  if not os.path.exists(info_directory):
-    os.makedirs(info_directory)
-  if not os.path.exists(error_directory):
-    os.makedirs(error_directory)
-  
-
-  info_path = os.path.join(info_directory, "sysco_info.csv")
-  # error_path = os.path.join(error_directory, "sysco_error.csv")
-  
   # save inventory info
   inv_info = pd.DataFrame(
     pricing_data,
@@ -223,6 +504,77 @@ def main():
     .sort_values(by='LAST_UPDATE', ascending=False) \
     .drop_duplicates(subset=['VENDOR_CODE'], keep='first')
 
+  return newest_prices
+
+
+
+def train_digit_recognizer(
+  input_folder = "inputs\\invoices\\processed_invoices", 
+  templates_path = digits.TEMPLATES_PATH, max_pages = None):
+  """
+  Learns the digit recognizer's templates from already processed invoices: 
+  the item code and unit price columns of every invoice page are read by 
+  Tesseract, and every glyph of a line read with one character per glyph 
+  becomes a labelled template (see sysco_source.digits).
+
+  :param input_folder: Folder of '.pdf' invoices to learn from.
+  :param templates_path: Where the templates are saved.
+  :param max_pages: Stop after this many invoice pages (default: all).
+  :return: The trained DigitRecognizer.
+  """
+  setup_ocr(use_digits = False)
+  ref_hash = imagehash.average_hash(Image.open(REFERENCE_PATH))
+
+  samples = []
+  n_pages = 0
+  for file in sorted(f for f in os.listdir(input_folder) if f.endswith(".pdf")):
+    file_path = os.path.join(input_folder, file)
+    _, invoice_pages = scan_document(file_path, ref_hash)
+
+    with fitz.open(file_path) as doc:
+      for page_num in invoice_pages:
+        if max_pages is not None and n_pages >= max_pages:
+          break
+        crops = crop_regions(ss.polish_image(ss.page_image(doc, page_num)))
+        for region, config in [("icup", ss.icup_config), ("up", ss.up_config)]:
+          text = tess.image_to_string(crops[region], config = config)
+          samples.append(digits.labelled_glyphs(crops[region], text))
+        n_pages += 1
+
+    print(f"Learned from {n_pages} invoice pages, up to {file}")
+    if max_pages is not None and n_pages >= max_pages:
+      break
+
+  recognizer = digits.fit(samples)
+  recognizer.save(templates_path)
+
+  chars, counts = np.unique(recognizer.labels, return_counts = True)
+  print(f"Saved {len(recognizer.labels)} templates to {templates_path}:")
+  print(", ".join(f"'{c}' {n}" for c, n in zip(chars, counts)))
+
+  return recognizer
+
+
+
+def main():
+
+  newest_prices = read_invoices("inputs\\invoices")
+  if newest_prices is None:
+    return 0
+
+  info_directory = 'master\\inputs'
+  error_directory = 'master\\errors'
+
+
+  if not os.path.exists(info_directory):
+    os.makedirs(info_directory)
+  if not os.path.exists(error_directory):
+    os.makedirs(error_directory)
+  
+
+  info_path = os.path.join(info_directory, "sysco_info.csv")
+  # error_path = os.path.join(error_directory, "sysco_error.csv")
+
   newest_prices.to_csv(info_path)
 
   # save error info
@@ -3,6 +3,7 @@
 
 
 
+import fitz
 import imagehash
 import matplotlib.pyplot as plt
 import pytesseract as tess
@@ -30,6 +31,9 @@ d_height = np.array([0.9, 1.6]) / 21.59
 ac_width = np.array([1, 6]) / 27.94
 ac_height = np.array([1.1, 2.1]) / 21.59
 
+in_width = np.array([20.3, 23.1]) / 27.94
+in_height = np.array([1.2, 2.35]) / 21.59
+
 
 # config for tesseract, detection of numbers from page into string format
 icup_config = r'--oem 3 --psm 4 -c tessedit_char_whitelist=0123456789.' 
@@ -48,27 +52,102 @@ account_regex = r'(BAKERY|SNACK BAR|MSU)'
 
 
 
-def polish_image(img_pil):
+def page_image(doc, page_num, flags = cv2.IMREAD_GRAYSCALE):
+  """
+  The scanned image of a page of a '.pdf' document, decoded straight into a 
+  single channel NumPy array.
+
+  The embedded image's bytes are handed to OpenCV's decoder as a NumPy view 
+  (no copy), and the decoder writes the grayscale page directly, so the only 
+  full page allocated is the decoded one. Images OpenCV can't decode are 
+  read through a fitz Pixmap of the same image instead.
+
+  :param doc: The open fitz (PyMuPDF) document.
+  :param page_num: Zero-based number of the page.
+  :param flags: cv2.imdecode flags, IMREAD_GRAYSCALE or one of the 
+                IMREAD_REDUCED_GRAYSCALE_* flags.
+  :return: The page's (first) embedded image as a 2D uint8 NumPy array.
+  """
+  xref = doc[page_num].get_images(full = True)[0][0]
+  image = doc.extract_image(xref)
+
+  # only JPEG is decoded at a reduced size, other formats would just be 
+  # subsampled after a full decode (and alias), so those are shrunk below
+  decode_flags = flags if image["ext"] in ("jpeg", "jpg") else cv2.IMREAD_GRAYSCALE
+  img = cv2.imdecode(np.frombuffer(image["image"], dtype = np.uint8), decode_flags)
+
+  if img is None:
+    # the pixmap's samples are wrapped as they are, one byte per pixel
+    pix = fitz.Pixmap(doc, xref)
+    if pix.n != 1 or pix.alpha:
+      pix = fitz.Pixmap(fitz.csGRAY, fitz.Pixmap(pix, 0) if pix.alpha else pix)
+    img = np.frombuffer(pix.samples, dtype = np.uint8).reshape(pix.height, pix.width)
+    decode_flags = cv2.IMREAD_GRAYSCALE
+
+  if decode_flags != flags:
+    # the reduced flags decode at 1/2, 1/4 or 1/8 of the size
+    scale = {
+      cv2.IMREAD_REDUCED_GRAYSCALE_2: 2,
+      cv2.IMREAD_REDUCED_GRAYSCALE_4: 4,
+      cv2.IMREAD_REDUCED_GRAYSCALE_8: 8}.get(flags, 1)
+    height, width = img.shape
+    img = cv2.resize(
+      img, (max(width // scale, 1), max(height // scale, 1)), 
+      interpolation = cv2.INTER_AREA)
+
+  return img
+
+
+
+def page_thumbnail(doc, page_num):
   """
-  Applies a series of image processing steps (rotation, grayscale conversion, 
-  and binary thresholding) to prepare a PIL Image object for text extraction 
-  via Tesseract/OCR.
+  A small grayscale decode of a page's scanned image, enough for is_invoice 
+  (its average hash is taken over 8x8 pixels anyway). JPEG scans are decoded 
+  straight at an eighth of their size, which is far cheaper than decoding 
+  the whole scan.
+
+  :param doc: The open fitz (PyMuPDF) document.
+  :param page_num: Zero-based number of the page.
+  :return: A 2D uint8 NumPy array.
+  """
+  return page_image(doc, page_num, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+
+
+
+def average_hash(img, hash_size = 8):
+  """
+  The average hash of a grayscale image, as imagehash.average_hash works it 
+  out (shrink to hash_size x hash_size, each bit is whether that pixel is 
+  brighter than the mean) but on a NumPy array, without a PIL image.
+
+  :param img: A 2D uint8 NumPy array.
+  :param hash_size: Width and height of the hash in bits.
+  :return: An imagehash.ImageHash.
+  """
+  small = cv2.resize(img, (hash_size, hash_size), interpolation = cv2.INTER_AREA)
+  return imagehash.ImageHash(small > small.mean())
+
 
-  The steps transform the image from a color Pillow object into a high-contrast, 
-  monochrome OpenCV format that is oriented correctly for analysis.
 
-  :param img_pil: The input image as a PIL Image object (expected to be an invoice page).
+def polish_image(img_gray):
+  """
+  Applies a series of image processing steps (rotation and binary 
+  thresholding) to prepare a grayscale page (see page_image) for text 
+  extraction via Tesseract/OCR.
+
+  The steps transform the page into a high-contrast, monochrome image that 
+  is oriented correctly for analysis. The rotation is the only new full page 
+  allocated, the threshold is applied to it in place.
+
+  :param img_gray: The input page as a 2D uint8 NumPy array (expected to be 
+                   an invoice page).
   :return: The processed image as a NumPy array (OpenCV format), 
-            which is rotated, grayscaled, and binarized.
+            which is rotated and binarized.
   """
-  # convert to cv image
-  img_cv = cv2.cvtColor((np.array(img_pil)), cv2.COLOR_RGB2BGR)
   # rotate to correct orientation so that cropping is less confusing
-  img_rotated = cv2.rotate(img_cv, cv2.ROTATE_90_COUNTERCLOCKWISE)
-  # grayscale
-  img_gray = cv2.cvtColor(img_rotated, cv2.COLOR_RGB2GRAY)
+  polished = cv2.rotate(img_gray, cv2.ROTATE_90_COUNTERCLOCKWISE)
   # contrast threshold
-  _, polished = cv2.threshold(img_gray, 150, 255, cv2.THRESH_BINARY)
+  cv2.threshold(polished, 150, 255, cv2.THRESH_BINARY, dst = polished)
 
   return polished
 
@@ -83,7 +162,8 @@ def is_invoice(img, ref_hash, threshold = 21):
   if the absolute difference between the two hashes is below a specified 
   threshold, indicating perceptual similarity.
 
-  :param img: The PIL Image object of the current page to be checked.
+  :param img: The current page to be checked, as a grayscale NumPy array 
+              (see page_thumbnail).
   :param ref_hash: The pre-calculated average hash (imagehash.ImageHash) 
                     of a known reference invoice template.
   :param threshold: The maximum allowed difference between the two hashes 
@@ -91,7 +171,7 @@ def is_invoice(img, ref_hash, threshold = 21):
   :return: True if the image is perceptually similar to the reference invoice 
             (i.e., hash difference is less than the threshold), False otherwise.
   """
-  h = imagehash.average_hash(img)
+  h = average_hash(img)
   return abs(h - ref_hash)  < threshold
 
 
@@ -133,6 +213,9 @@ def crop_image(invoice, bounds, crop_type, debug=False):
     "account": {
       "min_w": 0, "max_w": 0, "min_h": 0, 
       "max_h": 0, "action": "bypass"}, 
+    "invoice": {
+      "min_w": 0, "max_w": 0, "min_h": 0, 
+      "max_h": 0, "action": "bypass"}, 
     "default": {
       "min_w": 10, "max_w": 200, "min_h": 10, 
       "max_h": 50, "action": "single"},
@@ -272,7 +355,7 @@ def crop_image(invoice, bounds, crop_type, debug=False):
 
 
 
-def extract_text(img, tess_config, regex):
+def extract_text(img, tess_config, regex, recognizer = None):
   """
   Performs Optical Character Recognition (OCR) on a processed image segment 
   using Tesseract and then filters the raw output using a regular expression.
@@ -285,11 +368,17 @@ def extract_text(img, tess_config, regex):
                       the OCR engine, page segmentation mode, and character whitelist.
   :param regex: The regular expression string used to find and extract the 
                 final desired text pattern(s) from the raw Tesseract output.
+  :param recognizer: An optional digits.DigitRecognizer to read the image 
+                     with instead (numeric columns only), which falls back 
+                     on Tesseract for the lines it isn't sure of.
   :return: A list of strings, or tuples of strings, containing all matches 
            found by the regular expression.
   """
   # text analysis
-  text = tess.image_to_string(img, config = tess_config)
+  if recognizer is not None:
+    text = recognizer.read(img, tess_config)
+  else:
+    text = tess.image_to_string(img, config = tess_config)
   formatted = re.findall(regex, text)
 
   return formatted
@@ -473,19 +562,19 @@ def sanitize_account(account_text):
 
 
 
-def display_time(doc_num, page_num, start_time, n_pages, n_docs):
+def display_time(pages_done, total_pages, start_time, doc_name):
   """
   Calculates and displays the current processing progress, including 
-  percentage, elapsed time, and estimated time left (ETL), across multiple documents.
+  percentage, elapsed time, and estimated time left (ETL), over every 
+  invoice page of every document.
 
   The output is printed to the console and is updated on the same line 
   using the carriage return (\r) character.
 
-  :param doc_num: The zero-based index of the current document being processed.
-  :param page_num: The zero-based index of the current page within the document.
+  :param pages_done: The number of invoice pages processed so far.
+  :param total_pages: The number of invoice pages in all documents.
   :param start_time: The time (in sec since the epoch) when the processing loop started.
-  :param n_pages_per_doc: The number of pages in EACH document (since they are assumed equal).
-  :param n_docs: The total number of documents to be processed.
+  :param doc_name: The document the last processed page was from.
   :return: None. The function prints the progress directly to the console.
   """
 
@@ -503,41 +592,30 @@ def display_time(doc_num, page_num, start_time, n_pages, n_docs):
     if hours > 0:
       return f"{hours:02d}:{mins:02d}:{secs:02d}"
     return f"{mins:02d}:{secs:02d}"
-  
-  # --- UPDATED LOGIC FOR MULTI-DOCUMENT TRACKING ---
-    
-  # Calculate the total number of pages across ALL documents
-  total_pages = n_docs * n_pages
-  
-  # Calculate the total number of pages processed so far:
-  # Pages from completed documents + pages from the current document
-  completed_pages = doc_num * n_pages
-  curr_page_total = completed_pages + (page_num + 1) # page_num is 0-based
 
-  # calculate elapsed time and pages per second
+  # calculate elapsed time and the pages per second observed so far
   elapsed_time = time.time() - start_time
   # avoid division by zero
-  pages_per_sec = curr_page_total / elapsed_time if elapsed_time > 0 else 0
+  pages_per_sec = pages_done / elapsed_time if elapsed_time > 0 else 0
   
   # estimate time left (ETL)
-  remaining_pages = total_pages - curr_page_total
+  remaining_pages = total_pages - pages_done
   est_secs_left = remaining_pages / pages_per_sec if pages_per_sec > 0 else 0
   
   elapsed_formatted = format_time(elapsed_time)
   etl_formatted = format_time(est_secs_left)
   
   # Overall progress percentage
-  progress_percent = (curr_page_total / total_pages) * 100
+  progress_percent = (pages_done / total_pages) * 100 if total_pages else 100
 
   # --- DISPLAY UPDATE ---
-  
-  # Display the progress, including document and page context
   print(
-      f"Processing Document {doc_num + 1}/{n_docs} | Page {page_num + 1}/{n_pages} | "
-      f" - Total Pages: {curr_page_total}/{total_pages} | "
+      f"Invoice Pages: {pages_done}/{total_pages} | "
       f" - {progress_percent:.1f}% | "
+      f" - {pages_per_sec:.2f} pages/s | "
       f" - ETL: {etl_formatted} | "
-      f" - Elapsed: {elapsed_formatted}",
+      f" - Elapsed: {elapsed_formatted} | "
+      f" - Last: {doc_name}",
       end='\r'
   )
 
@@ -0,0 +1,326 @@
+"""
+Lightweight recognizer for the numeric columns of Sysco invoices.
+
+The item code and unit price columns are printed in one machine font with a
+tiny alphabet (0-9 and "."), so reading them doesn't need all of Tesseract.
+Here the binarized crops from crop_image are cut into text lines and glyphs
+by their ink projections, every glyph is scaled to a small fixed size and
+classified by its nearest neighbour among template glyphs, and the text
+comes out line by line, like Tesseract's, for the same regexes to parse.
+
+The templates are learned from our own processed invoices (see
+reading_sysco_invoice.train_digit_recognizer): wherever Tesseract's reading
+of a line has exactly as many characters as the line has glyphs, each glyph
+is labelled with its character.
+
+Glyphs that touch (one blob several glyphs wide) are cut apart at the
+font's fixed pitch. A glyph that doesn't look like any template (too far
+from all of them, or too close to two different characters) isn't guessed
+at: its whole line is read again by Tesseract instead.
+"""
+
+
+
+import numpy as np
+import pytesseract as tess
+import cv2
+import os
+import re
+
+
+
+TEMPLATES_PATH = "sysco\\references\\digit_templates.npz"
+
+# every glyph is scaled to this (width, height) before it is compared
+GLYPH_SIZE = (12, 20)
+ALPHABET = "0123456789."
+
+# at most this many templates are kept per character
+MAX_PER_CHAR = 200
+
+# a glyph is only trusted if it's this close to its nearest template, and
+# its nearest template of any other character is this much further away
+MAX_DISTANCE = 0.45
+MIN_MARGIN = 1.25
+# a blob this many times wider than the line's typical glyph is two or more
+MAX_WIDTH = 1.6
+
+# straight runs of ink at least this long (in pixels) are ruled lines
+RULE_LENGTH = 40
+
+# anything thinner or smaller than this (in pixels) is noise
+MIN_GLYPH_WIDTH = 3
+MIN_GLYPH_AREA = 6
+
+# tesseract config for re-reading a single line
+LINE_PSM = "--psm 7"
+
+
+
+def runs(mask):
+  """
+  The runs of True in a 1D boolean array.
+
+  :return: A list of (start, end) pairs, end exclusive.
+  """
+  padded = np.concatenate([[False], mask, [False]])
+  edges = np.flatnonzero(padded[1:] != padded[:-1])
+  return list(zip(edges[::2], edges[1::2]))
+
+
+
+def ink_mask(img, rule_length = RULE_LENGTH):
+  # black text on white, without the table's ruled lines: any straight run 
+  # of ink longer than a glyph is, opened out with a line shaped kernel
+  ink = (img < 128).astype(np.uint8)
+  rules = cv2.morphologyEx(
+    ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, rule_length)))
+  rules |= cv2.morphologyEx(
+    ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (rule_length, 1)))
+
+  ink &= ~rules
+
+  # what is left of broken rules, and specks, are too thin or too small to 
+  # be a glyph (a "." included)
+  n, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity = 8)
+  noise = (stats[:, cv2.CC_STAT_WIDTH] < MIN_GLYPH_WIDTH) \
+    | (stats[:, cv2.CC_STAT_AREA] < MIN_GLYPH_AREA)
+  noise[0] = False
+
+  return (ink > 0) & ~noise[labels]
+
+
+
+def segment(img, min_height = 5):
+  """
+  Cuts a binarized crop into text lines and glyphs.
+
+  :param img: A binarized crop (black text on white), see crop_image.
+  :param min_height: Lines with fewer rows of ink than this are noise.
+  :return: A list with a (top, bottom, glyphs) per line, top to bottom.
+           glyphs lists (x0, x1, y0, y1, space_before) boxes, left to right,
+           in coordinates of the crop.
+  """
+  ink = ink_mask(img)
+  lines = []
+
+  for top, bottom in runs(ink.any(axis = 1)):
+    if bottom - top < min_height:
+      continue
+    band = ink[top:bottom]
+    height = bottom - top
+
+    blobs = runs(band.any(axis = 0))
+    typical = np.median([x1 - x0 for x0, x1 in blobs])
+
+    glyphs = []
+    last_x1 = None
+    for x0, x1 in blobs:
+      # a gap wider than a whole glyph separates two words (the gaps either 
+      # side of a narrow "." are wide, but not that wide)
+      space = last_x1 is not None and x0 - last_x1 > typical
+      last_x1 = x1
+
+      # glyphs that touch make one blob, the font being monospaced it is cut
+      # into as many glyphs of the typical width as fit
+      n = int(round((x1 - x0) / typical)) if x1 - x0 > MAX_WIDTH * typical else 1
+      cuts = np.linspace(x0, x1, n + 1).round().astype(int)
+      for i, (g0, g1) in enumerate(zip(cuts[:-1], cuts[1:])):
+        rows = np.flatnonzero(band[:, g0:g1].any(axis = 1))
+        if len(rows):
+          glyphs.append((g0, g1, top + rows[0], top + rows[-1] + 1, space and i == 0))
+
+    if glyphs:
+      lines.append((top, bottom, glyphs))
+
+  return lines
+
+
+
+def is_dot(glyph, top, bottom):
+  # a "." is a small blob sitting on the line's baseline
+  x0, x1, y0, y1, _ = glyph
+  height = bottom - top
+  return (y1 - y0) < 0.35 * height and (x1 - x0) < 0.35 * height \
+    and y1 > top + 0.6 * height
+
+
+
+def features(img, glyphs):
+  """
+  Every glyph scaled to GLYPH_SIZE, as one row of unit length per glyph.
+
+  :param img: The binarized crop the glyphs are in.
+  :param glyphs: (x0, x1, y0, y1, ...) boxes, see segment.
+  :return: A float32 array with a row per glyph.
+  """
+  ink = (img < 128).astype(np.float32)
+  rows = np.empty((len(glyphs), GLYPH_SIZE[0] * GLYPH_SIZE[1]), dtype = np.float32)
+  for i, (x0, x1, y0, y1, *_) in enumerate(glyphs):
+    rows[i] = cv2.resize(
+      ink[y0:y1, x0:x1], GLYPH_SIZE, interpolation = cv2.INTER_AREA).ravel()
+
+  norms = np.linalg.norm(rows, axis = 1, keepdims = True)
+  return rows / np.maximum(norms, 1e-6)
+
+
+
+class DigitRecognizer:
+  """
+  Nearest neighbour classifier of glyphs, over labelled template glyphs
+  (see features). Counts how many lines it read itself (lines) and how many
+  it handed back to Tesseract (fallbacks).
+  """
+
+  def __init__(self, templates, labels):
+    self.templates = np.asarray(templates, dtype = np.float32)
+    self.labels = np.asarray(labels)
+    self.lines = 0
+    self.fallbacks = 0
+
+
+  @classmethod
+  def load(cls, path = TEMPLATES_PATH):
+    # the saved templates, or None when none have been trained yet
+    if not os.path.exists(path):
+      return None
+    with np.load(path) as saved:
+      return cls(saved["templates"], saved["labels"])
+
+
+  def save(self, path = TEMPLATES_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    np.savez_compressed(path, templates = self.templates, labels = self.labels)
+    return
+
+
+  def classify(self, rows):
+    """
+    Classifies glyphs.
+
+    :param rows: Glyph features, see features.
+    :return: (characters, trusted) arrays, one per row.
+    """
+    # squared distances to every template, all glyphs at once
+    dist = (rows ** 2).sum(axis = 1)[:, None] - 2 * rows @ self.templates.T \
+      + (self.templates ** 2).sum(axis = 1)[None, :]
+    dist = np.sqrt(np.maximum(dist, 0))
+
+    nearest = dist.argmin(axis = 1)
+    chars = self.labels[nearest]
+    best = dist[np.arange(len(rows)), nearest]
+
+    # the nearest template of any other character
+    other = np.where(self.labels[None, :] == chars[:, None], np.inf, dist).min(axis = 1)
+    trusted = (best <= MAX_DISTANCE) & (other >= MIN_MARGIN * best)
+
+    return chars, trusted
+
+
+  def read(self, img, tess_config):
+    """
+    Reads a binarized numeric crop.
+
+    :param img: The crop, see crop_image.
+    :param tess_config: The Tesseract config the crop would have been read
+                        with, used (with LINE_PSM) for lines read again.
+    :return: The text, one line per text line, like tess.image_to_string.
+    """
+    # the same characters the column allows, with a single line psm
+    line_config = re.sub(r"--psm \d+", LINE_PSM, tess_config)
+    lines = segment(img)
+
+    # every glyph of the crop is classified at once, dots by their size
+    dots = [[is_dot(glyph, top, bottom) for glyph in glyphs] for top, bottom, glyphs in lines]
+    others = [
+      glyph for (_, _, glyphs), line_dots in zip(lines, dots)
+      for glyph, dot in zip(glyphs, line_dots) if not dot]
+    chars, trusted = self.classify(features(img, others)) if others \
+      else (np.array([], dtype = str), np.array([], dtype = bool))
+
+    text_lines = []
+    start = 0
+    for (top, bottom, glyphs), line_dots in zip(lines, dots):
+      self.lines += 1
+      end = start + line_dots.count(False)
+      line_chars, line_trusted = chars[start:end], trusted[start:end]
+      start = end
+
+      if not line_trusted.all():
+        self.fallbacks += 1
+        text_lines.append(
+          tess.image_to_string(img[top:bottom], config = line_config).strip())
+        continue
+
+      read = iter(line_chars)
+      text = ""
+      for glyph, dot in zip(glyphs, line_dots):
+        text += (" " if glyph[4] else "") + ("." if dot else next(read))
+      text_lines.append(text)
+
+    return "\n".join(text_lines)
+
+
+
+def no_samples():
+  return np.empty((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), np.float32), np.array([], dtype = str)
+
+
+
+def labelled_glyphs(img, text):
+  """
+  Training samples from a crop Tesseract has read: the glyphs of every line
+  whose reading has exactly one character per glyph.
+
+  :param img: A binarized numeric crop.
+  :param text: Tesseract's text for the crop.
+  :return: (features, labels) of the glyphs, dots left out.
+  """
+  text_lines = [line.replace(" ", "") for line in text.splitlines() if line.strip()]
+  lines = segment(img)
+  if len(text_lines) != len(lines):
+    return no_samples()
+
+  glyphs, labels = [], []
+  for (top, bottom, line_glyphs), line_text in zip(lines, text_lines):
+    if len(line_glyphs) != len(line_text) or set(line_text) - set(ALPHABET):
+      continue
+    for glyph, char in zip(line_glyphs, line_text):
+      # dots are found by their size, they don't need templates
+      if char != "." and not is_dot(glyph, top, bottom):
+        glyphs.append(glyph)
+        labels.append(char)
+
+  if not glyphs:
+    return no_samples()
+
+  return features(img, glyphs), np.array(labels)
+
+
+
+def fit(samples, max_per_char = MAX_PER_CHAR, seed = 0):
+  """
+  A DigitRecognizer from labelled glyphs.
+
+  :param samples: (features, labels) pairs, see labelled_glyphs.
+  :param max_per_char: At most this many templates are kept per character
+                       (picked at random), so classifying stays fast.
+  :param seed: Seed of the random pick.
+  :return: The DigitRecognizer.
+  :raises ValueError: If there are no labelled glyphs at all.
+  """
+  rows = np.concatenate([no_samples()[0]] + [f for f, _ in samples])
+  labels = np.concatenate([no_samples()[1]] + [l for _, l in samples])
+  if not len(labels):
+    raise ValueError("No labelled glyphs to learn the templates from")
+
+  rng = np.random.default_rng(seed)
+  keep = []
+  for char in np.unique(labels):
+    index = np.flatnonzero(labels == char)
+    if len(index) > max_per_char:
+      index = rng.choice(index, size = max_per_char, replace = False)
+    keep.extend(index)
+  keep = np.sort(np.array(keep, dtype = int))
+
+  return DigitRecognizer(rows[keep], labels[keep])
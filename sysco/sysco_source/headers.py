@@ -0,0 +1,109 @@
+"""
+Tells the continuation pages of an invoice from the first page of the next
+one, without OCR.
+
+Every page of a Sysco invoice repeats the invoice's header (its date,
+account and invoice number), so reading the date and account on every page
+costs two Tesseract calls a page for values that only change when a new
+invoice starts. Here a page's invoice number is kept as the bitmaps of its
+glyphs (see digits.segment), and two pages belong to the same invoice when
+each glyph of one matches the other's: all of its ink lies within a pixel
+of the other glyph's ink, but for a stray pixel or two. The same number
+printed by the same printer and scanned by the same scanner matches
+exactly, while a single different digit (even an 8 for a 9) leaves several
+pixels unmatched.
+"""
+
+
+
+import numpy as np
+import cv2
+
+from sysco_source import digits
+
+
+
+# invoice numbers are nine digits, shorter words are something else
+MIN_GLYPHS = 5
+
+# a glyph matches another if at most this many of their ink pixels have no
+# ink of the other within a pixel
+MAX_STRAY = 2
+
+# glyph boxes of one number are compared shifted by up to this many pixels
+SHIFT = 1
+
+NEIGHBOURHOOD = np.ones((3, 3), np.uint8)
+
+
+
+def invoice_key(crop):
+  """
+  The key of a page's invoice: the glyphs of the longest word in the crop
+  of its invoice number (the crop can catch the ends of its neighbours).
+
+  :param crop: The binarized crop of the invoice number, see crop_image.
+  :return: A list with a 2D uint8 array (ink is 1) per glyph, or None if
+           no number was found.
+  """
+  ink = digits.ink_mask(crop).astype(np.uint8)
+
+  longest = []
+  for _, _, glyphs in digits.segment(crop):
+    word = []
+    for glyph in glyphs:
+      if glyph[4]:
+        longest = max(longest, word, key = len)
+        word = []
+      word.append(glyph)
+    longest = max(longest, word, key = len)
+
+  if len(longest) < MIN_GLYPHS:
+    return None
+
+  return [ink[y0:y1, x0:x1] for x0, x1, y0, y1, _ in longest]
+
+
+
+def stray_pixels(a, b):
+  """
+  How many ink pixels of two glyphs have no ink of the other within a
+  pixel, at the best of their relative shifts.
+
+  :param a, b: Glyph bitmaps, see invoice_key.
+  :return: The number of stray pixels.
+  """
+  height = max(a.shape[0], b.shape[0]) + 2 * SHIFT + 2
+  width = max(a.shape[1], b.shape[1]) + 2 * SHIFT + 2
+
+  padded_a = np.zeros((height, width), np.uint8)
+  padded_a[SHIFT + 1:SHIFT + 1 + a.shape[0], SHIFT + 1:SHIFT + 1 + a.shape[1]] = a
+  near_a = cv2.dilate(padded_a, NEIGHBOURHOOD)
+
+  best = None
+  for dy in range(2 * SHIFT + 1):
+    for dx in range(2 * SHIFT + 1):
+      padded_b = np.zeros((height, width), np.uint8)
+      padded_b[dy + 1:dy + 1 + b.shape[0], dx + 1:dx + 1 + b.shape[1]] = b
+      stray = np.count_nonzero(padded_a > cv2.dilate(padded_b, NEIGHBOURHOOD)) \
+        + np.count_nonzero(padded_b > near_a)
+      best = stray if best is None else min(best, stray)
+
+  return best
+
+
+
+def same_invoice(a, b):
+  """
+  Whether two pages' invoice keys are of the same invoice.
+
+  :param a, b: Invoice keys, see invoice_key. None never matches.
+  :return: True if every glyph of one matches the other's.
+  """
+  if a is None or b is None or len(a) != len(b):
+    return False
+
+  # invoice numbers run in sequence, so their last digits differ first
+  return all(
+    stray_pixels(glyph_a, glyph_b) <= MAX_STRAY
+    for glyph_a, glyph_b in zip(reversed(a), reversed(b)))
@@ -0,0 +1,280 @@
+"""
+Finds where the regions read from an invoice page are, from the page's own
+ruled lines.
+
+The regions used to be fixed proportions of a letter page (icup_bounds,
+table_bounds, ...), refined on every page by crop_image's contour search,
+so a scan shifted by a few millimetres sent that search hunting for the
+table. Here the table's long ruled lines are found instead (by opening the
+page with long, thin kernels, so only straight lines survive): the item code
+and unit price columns lie between the vertical rules nearest to their
+proportional bounds, and the table body between the rule under the column
+headers and the rule closing the table.
+
+A page's layout is cached per invoice template, keyed by the average hash
+of the page's header (everything above the table: the items below differ
+from page to page far more than templates do). A later page with a close
+hash is only checked for alignment: each of the template's rules is looked
+for within a few pixels of where it was, and if they are all found at the
+same offset, the template's regions are moved by that offset and used as
+they are. Only a page that doesn't line up is detected again from scratch.
+"""
+
+
+
+import numpy as np
+import cv2
+
+import sysco_source as ss
+from sysco_source.digits import runs
+
+
+
+# a ruled line runs at least this share of the height / width of the
+# window the table is looked for in
+RULE_FRACTION = 0.3
+
+# a rule is snapped to when it's within this share of the page's width /
+# height from the proportional bound
+SNAP_FRACTION = 0.025
+
+# the column headers' rules are at most this share of the height below the
+# table's proportional top
+HEADER_FRACTION = 0.04
+
+# pixels kept clear of a rule on either side of a region
+INSET = 4
+
+# largest shift, in pixels, looked for when aligning a page with a template
+MAX_SHIFT = 40
+# the template's rules must all be found within this many pixels of the
+# same offset (scans of one template are scaled a little differently, the
+# table's height varies by about 1%)
+SHIFT_TOLERANCE = 15
+# share of its length a rule must be inked for to count as found
+MIN_RULE_INK = 0.6
+
+# pages whose header hashes differ by at most this many bits are tried as
+# the same template (pages of one template differ by up to ~13, other pages
+# by 18 or more)
+HASH_DISTANCE = 14
+# at most this many templates are kept
+MAX_TEMPLATES = 16
+# headers are hashed from every HASH_STRIDE-th pixel, hashing all of them
+# takes longer than aligning the page
+HASH_STRIDE = 4
+
+
+
+def find_rules(ink, axis):
+  """
+  The positions of the long ruled lines of (part of) a page.
+
+  :param ink: The ink, a 2D uint8 array of 0 and 1.
+  :param axis: 0 for vertical rules (their x), 1 for horizontal ones (y).
+  :return: A list of the rules' centres, in pixels of ink.
+  """
+  height, width = ink.shape
+  if axis == 0:
+    kernel = (1, int(height * RULE_FRACTION))
+  else:
+    kernel = (int(width * RULE_FRACTION), 1)
+  lines = cv2.morphologyEx(
+    ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, kernel))
+
+  return [int(start + end) // 2 for start, end in runs(lines.any(axis = axis))]
+
+
+
+def nearest(rules, target, tolerance):
+  # the rule closest to target, if one is within tolerance
+  close = [rule for rule in rules if abs(rule - target) <= tolerance]
+  return min(close, key = lambda rule: abs(rule - target)) if close else None
+
+
+
+def detect_layout(invoice):
+  """
+  Finds the layout of a polished invoice page from its ruled lines.
+
+  :param invoice: The polished page, see polish_image.
+  :return: A dict with the page's "regions" ("icup", "up", "date",
+           "account" and "invoice", the invoice number's box, as (top,
+           bottom, left, right) pixel boxes) and the
+           rules they were found from ("v_rules" and "h_rules"). None if
+           the table's rules aren't where an invoice's would be.
+  """
+  height, width = invoice.shape
+  snap_x = width * SNAP_FRACTION
+  snap_y = height * SNAP_FRACTION
+
+  # only the window the table's columns can be in is searched, rules in
+  # pixels of the page
+  top = int(max(ss.table_bounds[0] * height - snap_y, 0))
+  left = int(max(ss.icup_bounds[0] * width - snap_x, 0))
+  window = invoice[
+    top:int(ss.table_bounds[1] * height + snap_y),
+    left:int(ss.icup_bounds[1] * width + snap_x)]
+  ink = (window < 128).astype(np.uint8)
+  v_rules = [left + rule for rule in find_rules(ink, 0)]
+  h_rules = [top + rule for rule in find_rules(ink, 1)]
+
+  code_left = nearest(v_rules, ss.icup_bounds[0] * width, snap_x)
+  price_left = nearest(v_rules, ss.up_bounds[0] * width, snap_x)
+  price_right = nearest(v_rules, ss.icup_bounds[1] * width, snap_x)
+
+  # the table body starts under the last of the column headers' rules
+  table_top = ss.table_bounds[0] * height
+  header = [
+    rule for rule in h_rules
+    if table_top - snap_y <= rule <= table_top + height * HEADER_FRACTION]
+  body_top = max(header) if header else None
+  body_bottom = nearest(h_rules, ss.table_bounds[1] * height, snap_y)
+
+  found = [code_left, price_left, price_right, body_top, body_bottom]
+  if any(rule is None for rule in found) \
+    or not code_left < price_left < price_right or not body_top < body_bottom:
+    return None
+
+  return page_layout(
+    invoice.shape, [code_left, price_left, price_right], [body_top, body_bottom])
+
+
+
+def page_layout(shape, v_rules, h_rules, dx = 0, dy = 0):
+  """
+  A page's layout from its table's rules.
+
+  :param shape: The page's (height, width).
+  :param v_rules: x of the item code column's left, the unit price column's
+                  left and its right rules.
+  :param h_rules: y of the table body's top and bottom rules.
+  :param dx, dy: The page's shift from its template, see align.
+  :return: The layout, see detect_layout.
+  """
+  height, width = shape
+  code_left, price_left, price_right = v_rules
+  top, bottom = h_rules[0] + INSET, h_rules[1] - INSET
+
+  # the header fields' boxes are too short to have long rules, they keep
+  # their proportional bounds and move with the page
+  def moved(heights, widths):
+    return (
+      heights[0] * height + dy, heights[1] * height + dy,
+      widths[0] * width + dx, widths[1] * width + dx)
+
+  return {
+    "regions": {
+      "icup": (top, bottom, code_left + INSET, price_right - INSET),
+      "up": (top, bottom, price_left + INSET, price_right - INSET),
+      "date": moved(ss.d_height, ss.d_width),
+      "account": moved(ss.ac_height, ss.ac_width),
+      "invoice": moved(ss.in_height, ss.in_width),
+    },
+    "v_rules": list(v_rules),
+    "h_rules": list(h_rules),
+  }
+
+
+
+def template_hash(invoice):
+  # the average hash of the page's header, see the module's docstring
+  header = invoice[:int(ss.table_bounds[0] * invoice.shape[0])]
+  return ss.average_hash(header[::HASH_STRIDE, ::HASH_STRIDE])
+
+
+
+def rule_offset(profile, position, length):
+  # where, within MAX_SHIFT of position, a rule of the given length is in an
+  # ink profile (ink per column or row), as an offset from position
+  lo = max(position - MAX_SHIFT, 0)
+  window = profile[lo:position + MAX_SHIFT + 1]
+  if not len(window) or window.max() < MIN_RULE_INK * length:
+    return None
+  return lo + int(window.argmax()) - position
+
+
+
+def align(invoice, layout):
+  """
+  The cheap check of whether a page matches a template: finds each of the
+  template's rules within MAX_SHIFT pixels of where it was.
+
+  :param invoice: The polished page.
+  :param layout: The template's layout, see detect_layout.
+  :return: The page's layout, from its rules where they were found, or 
+           None if they don't line up with the template's.
+  """
+  body_top, body_bottom = layout["h_rules"]
+  left, right = layout["v_rules"][0], layout["v_rules"][-1]
+
+  # the table's window, widened by the largest shift: vertical rules are
+  # looked for in its rows clear of the horizontal ones, and the other way
+  # round
+  top = max(body_top - MAX_SHIFT, 0)
+  start = max(left - MAX_SHIFT, 0)
+  ink = invoice[top:body_bottom + MAX_SHIFT, start:right + MAX_SHIFT] < 128
+  inner = ink[2 * MAX_SHIFT:body_bottom - body_top]
+  column_ink = np.count_nonzero(inner, axis = 0)
+  row_ink = np.count_nonzero(ink, axis = 1)
+
+  dx = [
+    rule_offset(column_ink, rule - start, len(inner)) for rule in layout["v_rules"]]
+  dy = [rule_offset(row_ink, rule - top, right - left) for rule in layout["h_rules"]]
+
+  for offsets in (dx, dy):
+    if any(offset is None for offset in offsets) \
+      or max(offsets) - min(offsets) > SHIFT_TOLERANCE:
+      return None
+
+  return page_layout(
+    invoice.shape,
+    [rule + offset for rule, offset in zip(layout["v_rules"], dx)],
+    [rule + offset for rule, offset in zip(layout["h_rules"], dy)],
+    int(np.median(dx)), int(np.median(dy)))
+
+
+
+class LayoutCache:
+  """
+  The layouts of the invoice templates seen so far, keyed by page hash (see
+  the module's docstring). Counts the pages that reused a template's layout
+  (hits), had theirs detected (misses) and had none found (failures).
+  """
+
+  def __init__(self):
+    self.templates = []
+    self.hits = 0
+    self.misses = 0
+    self.failures = 0
+
+
+  def layout(self, invoice):
+    """
+    The layout of a polished invoice page.
+
+    :param invoice: The polished page, see polish_image.
+    :return: The page's layout (see detect_layout), or None if it has none.
+    """
+    page_hash = template_hash(invoice)
+
+    # closest templates first
+    for key, template in sorted(
+      self.templates, key = lambda entry: entry[0] - page_hash):
+      if key - page_hash > HASH_DISTANCE:
+        break
+      layout = align(invoice, template)
+      if layout is not None:
+        self.hits += 1
+        return layout
+
+    layout = detect_layout(invoice)
+    if layout is None:
+      self.failures += 1
+      return None
+
+    self.misses += 1
+    self.templates.insert(0, (page_hash, layout))
+    del self.templates[MAX_TEMPLATES:]
+
+    return layout